@@ -1,9 +1,18 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, g, request
 from app.config import Config
 import logging
 import os
+import time
 from flask_bcrypt import Bcrypt
 from app.utils.database import init_db
+from app.utils.cache import availability_cache, image_digest_cache, counter_cache
+from app.utils.instrumentation import query_recorder
+from app.utils.metrics import (metrics, collect_pool_stats, collect_cache_stats, collect_activity_stats,
+                               collect_broker_stats)
+from app.utils.activity import activity_writer, recent_activity
+from app.utils.events import broker, publish_activity
+from app.utils.tracing import trace_recorder
+from app.utils import images
 
 bcrypt = Bcrypt()
 
@@ -31,8 +40,55 @@ def create_app(config_class=Config):
     # Initialize bcrypt
     bcrypt.init_app(app)
     
-    # Initialize database
-    init_db()
+    # Initialize database connection pools
+    init_db(app)
+    
+    # Size the availability cache
+    availability_cache.configure(
+        max_entries=app.config['AVAILABILITY_CACHE_SIZE'],
+        ttl=app.config['AVAILABILITY_CACHE_TTL']
+    )
+    counter_cache.configure(
+        max_entries=app.config['COUNTER_CACHE_SIZE'],
+        ttl=app.config['COUNTER_CACHE_TTL']
+    )
+    
+    if images.Image is None:
+        logger.warning('Pillow is not installed: doctor images are served at full size for every size. '
+                       'Install it with pip install -r requirements.txt')
+    
+    # Configure the slow query log
+    query_recorder.configure(
+        slow_threshold=app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000,
+        slow_log_path=app.config['SLOW_QUERY_LOG'],
+        explain=app.config['SLOW_QUERY_EXPLAIN']
+    )
+    
+    # Collect metrics, shared between worker processes through METRICS_DIR
+    metrics.configure(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+    metrics.add_collector(lambda registry: collect_pool_stats(registry, app.extensions['db_pools']))
+    metrics.add_collector(lambda registry: collect_cache_stats(registry, [availability_cache, image_digest_cache, counter_cache]))
+    metrics.add_collector(lambda registry: collect_activity_stats(registry, activity_writer))
+    metrics.add_collector(lambda registry: collect_broker_stats(registry, broker))
+    
+    # Write activity log events in batches from a background thread
+    activity_writer.configure(
+        pool=app.extensions['db_pools']['default'],
+        flush_size=app.config['ACTIVITY_BATCH_SIZE'],
+        flush_interval=app.config['ACTIVITY_FLUSH_INTERVAL'],
+        max_queue=app.config['ACTIVITY_QUEUE_SIZE'],
+        spill_path=app.config['ACTIVITY_SPILL_PATH'],
+        spill_max_bytes=app.config['ACTIVITY_SPILL_MAX_BYTES']
+    )
+    recent_activity.configure(
+        max_entries=app.config['ACTIVITY_FEED_BUFFER_SIZE'],
+        refresh_interval=app.config['ACTIVITY_FEED_REFRESH'],
+        reread_window=app.config['ACTIVITY_FEED_REREAD_WINDOW']
+    )
+    
+    # Push dashboard events to open event streams
+    broker.configure(max_connections=app.config['SSE_MAX_CONNECTIONS'], history=app.config['SSE_HISTORY'])
+    activity_writer.add_listener(publish_activity)
     
     # Ensure upload folder exists
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
@@ -53,6 +109,10 @@ def create_app(config_class=Config):
     app.register_blueprint(auth, url_prefix='/auth')
     app.register_blueprint(api, url_prefix='/api')
     
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
     # Add template filters
     @app.template_filter('b64encode')
     def b64encode_filter(data):
@@ -76,13 +136,55 @@ def create_app(config_class=Config):
     def internal_server_error(e):
         return render_template('errors/500.html'), 500
     
-    # Clean up database connections when app context ends
+    # Release the request's shared database connections when the app context ends
     @app.teardown_appcontext
     def close_db_connection(exception):
-        from app.utils.database import get_db_connection
-        db = getattr(app, '_database', None)
-        if db is not None:
-            db.close()
+        from app.utils.database import close_request_db
+        close_request_db(exception)
+    
+    # Report how many queries each request ran and how long they took
+    @app.after_request
+    def add_query_headers(response):
+        from app.utils.instrumentation import request_totals
+        totals = request_totals()
+        response.headers['X-DB-Query-Count'] = str(totals['count'])
+        response.headers['X-DB-Query-Time'] = f"{totals['time'] * 1000:.3f}"
+        return response
+    
+    # Request metrics
+    @app.before_request
+    def start_request_metrics():
+        g._request_started = time.perf_counter()
+        metrics.add_gauge('cims_http_requests_in_flight')
+    
+    @app.after_request
+    def record_request_metrics(response):
+        from app.utils.instrumentation import request_totals
+        started = g.get('_request_started')
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            totals = request_totals()
+            metrics.observe('cims_http_request_duration_seconds', {'endpoint': endpoint},
+                            time.perf_counter() - started)
+            metrics.inc('cims_http_requests_total',
+                        {'endpoint': endpoint, 'method': request.method, 'status': str(response.status_code)})
+            metrics.inc('cims_db_queries_total', {'endpoint': endpoint}, totals['count'])
+            metrics.inc('cims_db_query_seconds_total', {'endpoint': endpoint}, totals['time'])
+        return response
+    
+    # Record sanitized request traces for benchmarks/replay.py
+    trace_recorder.configure(app.config['TRACE_LOG'], app.config['TRACE_SAMPLE_RATE'])
+    
+    @app.after_request
+    def record_request_trace(response):
+        trace_recorder.record(response)
+        return response
+    
+    @app.teardown_request
+    def finish_request_metrics(exception):
+        if g.pop('_request_started', None) is not None:
+            metrics.add_gauge('cims_http_requests_in_flight', value=-1)
+        metrics.flush()
     
     # Log application startup
     logger.info('Application started')
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, session
 from app.auth.utils import validate_login, get_user_role
-from app.utils.database import get_db_connection
+from app.utils.database import get_db
 from app.auth.utils import get_session
 import bcrypt
 
@@ -14,7 +14,7 @@ def login():
         password = request.form.get('password')
         
         # Validate credentials
-        db = get_db_connection(db_name="cims")
+        db = get_db(db_name="cims")
         user = validate_login(db, username, password)
         
         if user:
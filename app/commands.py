@@ -0,0 +1,119 @@
+"""
+Flask CLI commands.
+
+Run with `flask --app run <command>`; each command runs inside an
+application context, so models and get_db() work as in a request.
+"""
+
+import time
+
+import click
+
+def register_commands(app):
+    """
+    Register the CLI commands of the application.
+
+    Args:
+        app: Flask application instance
+    """
+
+    @app.cli.command('import-roster')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+                  help='Roster format (default: from the file extension).')
+    @click.option('--batch-size', default=5000, show_default=True, help='Students per INSERT and commit.')
+    @click.option('--errors', 'error_path', default=None, help='Error report path (default: <path>.errors.csv).')
+    @click.option('--checkpoint', 'checkpoint_path', default=None,
+                  help='Checkpoint path (default: <path>.checkpoint).')
+    @click.option('--restart', is_flag=True, help='Ignore an existing checkpoint.')
+    @click.option('--dry-run', is_flag=True, help='Validate the roster without writing to the database.')
+    def import_roster(path, fmt, batch_size, error_path, checkpoint_path, restart, dry_run):
+        """Import or update students from a CSV or JSON Lines roster."""
+        from app.utils.roster import RosterImporter
+
+        importer = RosterImporter(
+            path,
+            fmt=fmt,
+            batch_size=batch_size,
+            checkpoint_path=checkpoint_path,
+            error_path=error_path,
+            dry_run=dry_run
+        )
+        stats = importer.run(resume=not restart)
+
+        click.echo(
+            f"Read {stats['read']} rows in {stats['elapsed']:.1f}s: "
+            f"{stats['imported']} imported, {stats['failed']} rejected, "
+            f"{stats['skipped']} skipped from checkpoint"
+        )
+        if stats['failed']:
+            click.echo(f"Rejected rows written to {importer.error_path}")
+
+    @app.cli.command('reconcile-counters')
+    @click.option('--fix', is_flag=True, help='Correct drifted counters and delete expired per-day counters.')
+    @click.option('--days', default=7, show_default=True, help='Past days of per-day counters to keep.')
+    def reconcile_counters(fix, days):
+        """Recompute the dashboard counters from the source tables and report drift."""
+        from app.utils.counters import reconcile
+
+        result = reconcile(fix=fix, days=days)
+
+        for key, stored, actual in result['drift']:
+            click.echo(f"{key}: stored {stored}, actual {actual}")
+        click.echo(
+            f"Checked {result['checked']} counters: {len(result['drift'])} drifted, "
+            f"{len(result['expired'])} expired"
+            + (" (fixed)" if fix and (result['drift'] or result['expired']) else "")
+        )
+
+    @app.cli.command('rebuild-timeline')
+    @click.option('--student-id', type=int, default=None, help='Rebuild only this student.')
+    @click.option('--batch-size', default=1000, show_default=True, help='Students per transaction.')
+    def rebuild_timeline(student_id, batch_size):
+        """Derive the students' medical timelines from the source tables."""
+        from app.utils.timeline import rebuild
+
+        started = time.perf_counter()
+        stats = rebuild(student_id=student_id, batch_size=batch_size)
+
+        click.echo(
+            f"Rebuilt {stats['events']} events for {stats['students']} students "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    @app.cli.command('generate-data')
+    @click.option('--students', default=50000, show_default=True, help='Students to create.')
+    @click.option('--doctors', default=200, show_default=True, help='Doctors to create.')
+    @click.option('--staff', default=50, show_default=True, help='Staff members to create.')
+    @click.option('--medications', default=300, show_default=True, help='Medications to create.')
+    @click.option('--appointments', default=2000000, show_default=True, help='Appointments to create.')
+    @click.option('--prescriptions', default=1000000, show_default=True,
+                  help='Prescriptions to create; most are dispensed.')
+    @click.option('--activity', default=500000, show_default=True, help='ActivityLog events to create.')
+    @click.option('--days', default=730, show_default=True,
+                  help='Days of history, ending two weeks after today.')
+    @click.option('--seed', default=42, show_default=True, help='Random seed; the same seed and sizes give the same data.')
+    @click.option('--batch-size', default=5000, show_default=True, help='Rows per INSERT and commit.')
+    def generate_data(students, doctors, staff, medications, appointments, prescriptions, activity, days, seed,
+                      batch_size):
+        """Append a reproducible synthetic dataset for scale testing."""
+        from app.utils.datagen import DatasetGenerator
+
+        generator = DatasetGenerator(
+            students=students,
+            doctors=doctors,
+            staff=staff,
+            medications=medications,
+            appointments=appointments,
+            prescriptions=prescriptions,
+            activity=activity,
+            days=days,
+            seed=seed,
+            batch_size=batch_size
+        )
+        stats = generator.run()
+
+        elapsed = stats.pop('elapsed')
+        for table, rows in stats.items():
+            click.echo(f"{table}: {rows} rows")
+        click.echo(f"Generated {sum(stats.values())} rows in {elapsed:.1f}s")
@@ -17,6 +17,65 @@ class Config:
     DB_NAME = os.environ.get('DB_NAME') or 'cs432g12'
     CIMS_DB_NAME = os.environ.get('CIMS_DB_NAME') or 'cs432cims'
     
+    # Database backend: 'mysql' for the campus server, 'sqlite' for local runs and benchmarks
+    DB_BACKEND = os.environ.get('DB_BACKEND') or 'mysql'
+    SQLITE_PATH = os.environ.get('SQLITE_PATH') or os.path.join('instance', 'cs432g12.db')  # ':memory:' for in-memory
+    SQLITE_CIMS_PATH = os.environ.get('SQLITE_CIMS_PATH') or os.path.join('instance', 'cs432cims.db')
+    SQLITE_SHARED_CACHE = (os.environ.get('SQLITE_SHARED_CACHE') or '0') != '0'  # always on for ':memory:'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)  # milliseconds
+    
+    # Connection pool configuration (per logical database)
+    DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE') or 1)
+    DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE') or 10)
+    DB_POOL_MAX_IDLE = int(os.environ.get('DB_POOL_MAX_IDLE') or 300)  # seconds
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 10)  # seconds
+    DB_POOL_PING_INTERVAL = int(os.environ.get('DB_POOL_PING_INTERVAL') or 30)  # seconds
+    
+    # Availability cache: slot bitmaps per (doctor, date)
+    AVAILABILITY_CACHE_SIZE = int(os.environ.get('AVAILABILITY_CACHE_SIZE') or 4096)
+    AVAILABILITY_CACHE_TTL = int(os.environ.get('AVAILABILITY_CACHE_TTL') or 30)  # seconds
+    
+    # Dashboard counters mirrored from DashboardCounters
+    COUNTER_CACHE_SIZE = int(os.environ.get('COUNTER_CACHE_SIZE') or 8192)
+    COUNTER_CACHE_TTL = int(os.environ.get('COUNTER_CACHE_TTL') or 5)  # seconds
+    
+    # Query instrumentation
+    SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS') or 200)
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG') or os.path.join('instance', 'slow_queries.log')
+    SLOW_QUERY_EXPLAIN = (os.environ.get('SLOW_QUERY_EXPLAIN') or '1') != '0'
+    
+    # Metrics: per-process snapshots are merged from METRICS_DIR when running several workers
+    METRICS_DIR = os.environ.get('METRICS_DIR') or None
+    METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL') or 5)  # seconds
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None  # when unset /metrics only answers loopback requests
+    
+    # Activity log: events are written in batches by a background thread
+    ACTIVITY_BATCH_SIZE = int(os.environ.get('ACTIVITY_BATCH_SIZE') or 200)
+    ACTIVITY_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_FLUSH_INTERVAL') or 1.0)  # seconds
+    ACTIVITY_QUEUE_SIZE = int(os.environ.get('ACTIVITY_QUEUE_SIZE') or 10000)
+    ACTIVITY_SPILL_PATH = os.environ.get('ACTIVITY_SPILL_PATH') or os.path.join('instance', 'activity_spill.jsonl')
+    ACTIVITY_SPILL_MAX_BYTES = int(os.environ.get('ACTIVITY_SPILL_MAX_BYTES') or 50 * 1024 * 1024)
+    
+    # Activity feed: newest ActivityLog rows kept in memory for the first page
+    ACTIVITY_FEED_BUFFER_SIZE = int(os.environ.get('ACTIVITY_FEED_BUFFER_SIZE') or 1000)
+    ACTIVITY_FEED_REFRESH = float(os.environ.get('ACTIVITY_FEED_REFRESH') or 1.0)  # seconds
+    ACTIVITY_FEED_REREAD_WINDOW = int(os.environ.get('ACTIVITY_FEED_REREAD_WINDOW') or 100)  # IDs re-read per refresh
+    
+    # Server-Sent Events: each open stream holds a worker thread, and events only reach
+    # the streams of the worker process that published them (see app/utils/events.py)
+    SSE_MAX_CONNECTIONS = int(os.environ.get('SSE_MAX_CONNECTIONS') or 50)  # per worker process
+    SSE_HEARTBEAT = int(os.environ.get('SSE_HEARTBEAT') or 15)  # seconds
+    SSE_MAX_DURATION = int(os.environ.get('SSE_MAX_DURATION') or 300)  # seconds before the client reconnects
+    SSE_HISTORY = int(os.environ.get('SSE_HISTORY') or 500)  # events kept for Last-Event-ID replay
+    
+    # Dispensing queue: how long a staff member's claim on a prescription lasts
+    DISPENSE_CLAIM_SECONDS = int(os.environ.get('DISPENSE_CLAIM_SECONDS') or 300)
+    
+    # Request traces for benchmarks/replay.py: JSON lines file, off when unset
+    TRACE_LOG = os.environ.get('TRACE_LOG') or None
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE') or 1.0)  # share of requests recorded
+    
     # Application configuration
     UPLOAD_FOLDER = os.path.join('app', 'static', 'uploads')
+    IMAGE_CACHE_FOLDER = os.environ.get('IMAGE_CACHE_FOLDER') or os.path.join('instance', 'image_cache')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload
@@ -0,0 +1,111 @@
+from app.utils.database import get_db
+from app.utils.activity import recent_activity
+from app.utils.pagination import KeysetKey, paginate, make_page, clamp_per_page, DEFAULT_PER_PAGE
+
+class ActivityLog:
+    """Activity feed read from the ActivityLog table."""
+
+    COLUMNS = "ActivityID, UserID, Role, ActivityType, Description, Timestamp"
+
+    PAGE_KEYS = [KeysetKey('ActivityID')]
+
+    # Roles whose members may see each other's activity
+    SHARED_ROLES = ('doctor', 'staff')
+
+    @staticmethod
+    def get_latest(limit):
+        """Get the newest activity rows, newest first"""
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+
+        query = f"""
+            SELECT {ActivityLog.COLUMNS}
+            FROM ActivityLog
+            ORDER BY ActivityID DESC
+            LIMIT %s
+        """
+
+        cursor.execute(query, (limit,))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        return rows
+
+    @staticmethod
+    def get_since(activity_id, limit):
+        """Get activity rows added after an ActivityID, oldest first"""
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+
+        query = f"""
+            SELECT {ActivityLog.COLUMNS}
+            FROM ActivityLog
+            WHERE ActivityID > %s
+            ORDER BY ActivityID
+            LIMIT %s
+        """
+
+        cursor.execute(query, (activity_id, limit))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        return rows
+
+    @staticmethod
+    def get_page(user_id=None, role=None, cursor=None, per_page=DEFAULT_PER_PAGE):
+        """Get one page of activity, optionally filtered by user and role"""
+        conditions = []
+        params = []
+
+        # Served by the (UserID, ActivityID) and (Role, ActivityID) indexes
+        if user_id is not None:
+            conditions.append("UserID = %s")
+            params.append(user_id)
+
+        if role is not None:
+            conditions.append("Role = %s")
+            params.append(role)
+
+        return paginate(
+            f"SELECT {ActivityLog.COLUMNS} FROM ActivityLog",
+            ActivityLog.PAGE_KEYS,
+            conditions,
+            params,
+            cursor=cursor,
+            per_page=per_page
+        )
+
+    @staticmethod
+    def get_feed(user_id=None, role=None, cursor=None, per_page=DEFAULT_PER_PAGE):
+        """
+        Get one page of the activity feed.
+
+        The first page comes from the in-memory buffer of recent activity
+        when it holds enough matching rows; older pages, and first pages
+        of users with little recent activity, are read from the database.
+        """
+        per_page = clamp_per_page(per_page)
+
+        if not cursor:
+            recent_activity.refresh(ActivityLog.get_latest, ActivityLog.get_since)
+
+            def matches(row):
+                return ((user_id is None or str(row['UserID']) == str(user_id))
+                        and (role is None or row['Role'] == role))
+
+            rows, complete = recent_activity.latest(matches, per_page + 1)
+            if complete:
+                return make_page(rows, ActivityLog.PAGE_KEYS, per_page)
+
+        return ActivityLog.get_page(user_id, role, cursor, per_page)
+
+    @staticmethod
+    def to_dict(row):
+        """Convert an activity row to the feed's JSON format"""
+        timestamp = row['Timestamp']
+        return {
+            'id': row['ActivityID'],
+            'type': row['ActivityType'],
+            'description': row['Description'],
+            'timestamp': int(timestamp.timestamp()) if timestamp else None
+        }
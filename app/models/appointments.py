@@ -1,7 +1,18 @@
-from app.utils.database import get_db_connection
+from app.utils.database import get_db, is_duplicate_key_error
+from app.models.doctors import DoctorAvailability
+from app.utils import slots
+from app.utils.pagination import KeysetKey, paginate, DEFAULT_PER_PAGE
+from app.utils import events, counters, timeline
 from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 class Appointment:
+    # Results of book() other than a new appointment ID
+    SLOT_TAKEN = -1
+    SLOT_UNAVAILABLE = -2
+    
     def __init__(self, appointment_id=None, student_id=None, doctor_id=None, 
                  appointment_date=None, appointment_time=None, status=None):
         self.appointment_id = appointment_id
@@ -14,9 +25,10 @@ class Appointment:
     @staticmethod
     def create(student_id, doctor_id, appointment_date, appointment_time, status='Scheduled'):
         """Create a new appointment."""
+        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            conn = get_db()
+            cursor = conn.cursor(dictionary=True)
             
             # Insert the new appointment
             cursor.execute(
@@ -28,22 +40,103 @@ class Appointment:
             # Get the ID of the inserted appointment
             appointment_id = cursor.lastrowid
             
+            touched = counters.apply(cursor, counters.appointment_deltas({
+                'DoctorID': doctor_id, 'StudentID': student_id,
+                'AppointmentDate': appointment_date, 'Status': status
+            }))
+            if status == 'Completed':
+                timeline.sync_appointment(cursor, appointment_id)
+            
             conn.commit()
-            conn.close()
+            
+            counters.invalidate(touched)
+            DoctorAvailability.invalidate_cache(doctor_id, appointment_date)
+            Appointment._publish_change(
+                doctor_id, student_id,
+                f'New appointment on {appointment_date} at {appointment_time}'
+            )
             
             return appointment_id
         except Exception as e:
-            print(f"Error creating appointment: {e}")
+            if conn is not None:
+                conn.rollback()
+            logger.error(f"Error creating appointment: {e}")
             return 0
     
+    @staticmethod
+    def book(student_id, doctor_id, appointment_date, appointment_time):
+        """
+        Atomically reserve a slot for a student.
+        
+        The slot is claimed by a single INSERT; the unique index on
+        (DoctorID, AppointmentDate, AppointmentTime, ActiveSlot) rejects
+        any concurrent booking of the same slot, so no lock is held
+        between checking and inserting.
+        
+        Returns:
+            int: New appointment ID, SLOT_TAKEN if someone else holds the
+                slot, SLOT_UNAVAILABLE if the doctor does not work then
+                or the slot has passed, or 0 on any other failure
+        """
+        try:
+            appointment_date = slots.normalize_date(appointment_date)
+            if slots.to_minutes(appointment_time) % slots.SLOT_MINUTES:
+                return Appointment.SLOT_UNAVAILABLE
+            appointment_time = slots.normalize_time(appointment_time)
+            index = slots.slot_index(appointment_time)
+        except (TypeError, ValueError):
+            return Appointment.SLOT_UNAVAILABLE
+        
+        conn = None
+        try:
+            masks = DoctorAvailability.get_day_masks([doctor_id], [appointment_date])
+            schedule, _ = masks[(int(doctor_id), appointment_date)]
+            open_slots = schedule & ~slots.past_mask(appointment_date)
+            if not open_slots >> index & 1:
+                return Appointment.SLOT_UNAVAILABLE
+            
+            conn = get_db()
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute(
+                'INSERT INTO Appointments (StudentID, DoctorID, AppointmentDate, AppointmentTime, Status) '
+                "VALUES (%s, %s, %s, %s, 'Scheduled')",
+                (student_id, doctor_id, appointment_date, appointment_time)
+            )
+            appointment_id = cursor.lastrowid
+            
+            touched = counters.apply(cursor, counters.appointment_deltas({
+                'DoctorID': doctor_id, 'StudentID': student_id,
+                'AppointmentDate': appointment_date, 'Status': 'Scheduled'
+            }))
+            cursor.close()
+            
+            conn.commit()
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+            if is_duplicate_key_error(e):
+                return Appointment.SLOT_TAKEN
+            logger.error(f"Error booking appointment: {e}")
+            return 0
+        
+        counters.invalidate(touched)
+        DoctorAvailability.invalidate_cache(doctor_id, appointment_date)
+        Appointment._publish_change(
+            doctor_id, student_id,
+            f'New appointment on {appointment_date} at {appointment_time}'
+        )
+        
+        return appointment_id
+    
     @staticmethod
     def get_all():
         """Get all appointments."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
         
         cursor.execute(
-            'SELECT a.*, s.FirstName || " " || s.LastName as StudentName, '
+            "SELECT a.*, CONCAT(s.FirstName, ' ', s.LastName) as StudentName, "
             'd.Name as DoctorName '
             'FROM Appointments a '
             'JOIN Students s ON a.StudentID = s.StudentID '
@@ -52,18 +145,57 @@ class Appointment:
         )
         
         appointments = cursor.fetchall()
-        conn.close()
         
         return appointments
     
+    # Keyset sort order shared by the paginated lists, newest first
+    PAGE_KEYS = [
+        KeysetKey('a.AppointmentDate'),
+        KeysetKey('a.AppointmentTime'),
+        KeysetKey('a.AppointmentID')
+    ]
+    
+    @staticmethod
+    def get_page(doctor_id=None, student_id=None, status=None, cursor=None,
+                 per_page=DEFAULT_PER_PAGE, include_total=False):
+        """Get one page of appointments, optionally filtered by doctor, student and status."""
+        conditions = []
+        params = []
+        
+        if doctor_id is not None:
+            conditions.append('a.DoctorID = %s')
+            params.append(doctor_id)
+        
+        if student_id is not None:
+            conditions.append('a.StudentID = %s')
+            params.append(student_id)
+        
+        if status:
+            conditions.append('a.Status = %s')
+            params.append(status)
+        
+        return paginate(
+            'SELECT a.*, s.FirstName as StudentFirstName, s.LastName as StudentLastName, '
+            'd.Name as DoctorName '
+            'FROM Appointments a '
+            'JOIN Students s ON a.StudentID = s.StudentID '
+            'JOIN cs432cims.G12_Doctors d ON a.DoctorID = d.DoctorID',
+            Appointment.PAGE_KEYS,
+            conditions,
+            params,
+            cursor=cursor,
+            per_page=per_page,
+            include_total=include_total
+        )
+    
     @staticmethod
     def get_by_id(appointment_id):
         """Get appointment by ID."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
         
         cursor.execute(
-            'SELECT a.*, s.FirstName || " " || s.LastName as StudentName, '
+            "SELECT a.*, CONCAT(s.FirstName, ' ', s.LastName) as StudentName, "
             'd.Name as DoctorName '
             'FROM Appointments a '
             'JOIN Students s ON a.StudentID = s.StudentID '
@@ -73,15 +205,14 @@ class Appointment:
         )
         
         appointment = cursor.fetchone()
-        conn.close()
         
         return appointment
     
     @staticmethod
     def get_by_student(student_id):
         """Get appointments by student ID."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
         
         cursor.execute(
             'SELECT a.*, d.Name as DoctorName, d.Specialization, d.Email, d.ContactNumber '
@@ -93,36 +224,45 @@ class Appointment:
         )
         
         appointments = cursor.fetchall()
-        conn.close()
         
         return appointments
     
     @staticmethod
-    def get_by_doctor(doctor_id):
-        """Get appointments by doctor ID."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+    def get_by_doctor(doctor_id, status=None, date=None):
+        """Get appointments by doctor ID, optionally filtered by status and date."""
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
+        
+        conditions = ['a.DoctorID = %s']
+        params = [doctor_id]
+        
+        if status:
+            conditions.append('a.Status = %s')
+            params.append(status)
+        
+        if date:
+            conditions.append('a.AppointmentDate = %s')
+            params.append(date)
         
         cursor.execute(
-            'SELECT a.*, s.FirstName || " " || s.LastName as StudentName, '
+            "SELECT a.*, CONCAT(s.FirstName, ' ', s.LastName) as StudentName, "
             's.Email as StudentEmail, s.ContactNumber as StudentContact '
             'FROM Appointments a '
             'JOIN Students s ON a.StudentID = s.StudentID '
-            'WHERE a.DoctorID = %s '
+            f'WHERE {" AND ".join(conditions)} '
             'ORDER BY a.AppointmentDate DESC, a.AppointmentTime DESC',
-            (doctor_id,)
+            tuple(params)
         )
         
         appointments = cursor.fetchall()
-        conn.close()
         
         return appointments
     
     @staticmethod
     def get_upcoming_by_student(student_id):
         """Get upcoming appointments by student ID."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
         
         today = datetime.now().strftime('%Y-%m-%d')
         
@@ -138,16 +278,19 @@ class Appointment:
         )
         
         appointments = cursor.fetchall()
-        conn.close()
         
         return appointments
     
     @staticmethod
     def update(appointment_id, data):
         """Update appointment details."""
+        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            conn = get_db()
+            cursor = conn.cursor(dictionary=True)
+            
+            # Remember the current slot so cached availability can be invalidated
+            current = Appointment._get_row(cursor, appointment_id)
             
             # Build the SQL query based on the provided data
             query_parts = []
@@ -169,30 +312,89 @@ class Appointment:
             # Check if any rows were affected
             affected_rows = cursor.rowcount
             
+            touched = set()
+            if current and affected_rows:
+                touched = counters.apply(cursor, counters.merge(
+                    counters.appointment_deltas(current, -1),
+                    counters.appointment_deltas(dict(current, **data))
+                ))
+                # Only completed appointments are part of the medical timeline
+                if 'Completed' in (current['Status'], data.get('Status', current['Status'])):
+                    timeline.sync_appointment(
+                        cursor, appointment_id, data.get('Status', current['Status']) == 'Completed'
+                    )
+            
             conn.commit()
-            conn.close()
+            
+            counters.invalidate(touched)
+            if current:
+                DoctorAvailability.invalidate_cache(current['DoctorID'], current['AppointmentDate'])
+                DoctorAvailability.invalidate_cache(
+                    data.get('DoctorID', current['DoctorID']),
+                    data.get('AppointmentDate', current['AppointmentDate'])
+                )
+                if affected_rows:
+                    if 'Status' in data:
+                        message = f"Appointment on {current['AppointmentDate']} is now {data['Status']}"
+                    else:
+                        message = (f"Appointment on {current['AppointmentDate']} moved to "
+                                   f"{data.get('AppointmentDate', current['AppointmentDate'])} at "
+                                   f"{data.get('AppointmentTime', current['AppointmentTime'])}")
+                    Appointment._publish_change(current['DoctorID'], current['StudentID'], message)
             
             return affected_rows
         except Exception as e:
-            print(f"Error updating appointment: {e}")
+            if conn is not None:
+                conn.rollback()
+            logger.error(f"Error updating appointment: {e}")
             return 0
     
     @staticmethod
     def delete(appointment_id):
         """Delete an appointment."""
+        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            conn = get_db()
+            cursor = conn.cursor(dictionary=True)
+            
+            current = Appointment._get_row(cursor, appointment_id)
             
             cursor.execute('DELETE FROM Appointments WHERE AppointmentID = %s', (appointment_id,))
             
             # Check if any rows were affected
             affected_rows = cursor.rowcount
             
+            touched = set()
+            if current and affected_rows:
+                touched = counters.apply(cursor, counters.appointment_deltas(current, -1))
+                if current['Status'] == 'Completed':
+                    timeline.sync_appointment(cursor, appointment_id, completed=False)
+            
             conn.commit()
-            conn.close()
+            
+            counters.invalidate(touched)
+            if current:
+                DoctorAvailability.invalidate_cache(current['DoctorID'], current['AppointmentDate'])
+                Appointment._publish_change(current['DoctorID'], current['StudentID'])
             
             return affected_rows
         except Exception as e:
-            print(f"Error deleting appointment: {e}")
+            if conn is not None:
+                conn.rollback()
+            logger.error(f"Error deleting appointment: {e}")
             return 0
+    
+    @staticmethod
+    def _publish_change(doctor_id, student_id, message=None):
+        """Push fresh counters and a notification to both sides of an appointment."""
+        events.push_stats('doctor', doctor_id)
+        events.push_stats('student', student_id)
+        if message:
+            events.notify('doctor', doctor_id, message)
+            events.notify('student', student_id, message)
+    
+    @staticmethod
+    def _get_row(cursor, appointment_id):
+        """Get the raw appointment row without joins."""
+        cursor.execute('SELECT * FROM Appointments WHERE AppointmentID = %s', (appointment_id,))
+        return cursor.fetchone()
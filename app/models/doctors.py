@@ -1,4 +1,7 @@
-from app.utils.database import get_db_connection
+from app.utils.database import get_db
+from app.utils import slots
+from app.utils.cache import availability_cache, image_digest_cache
+from app.utils.loader import load_grouped
 from datetime import datetime, timedelta
 
 class Doctor:
@@ -11,13 +14,16 @@ class Doctor:
         self.contact_number = contact_number
         self.image = image
     
+    # Every column except the Image BLOB, which is served by the image route
+    COLUMNS = "DoctorID, Name, Specialization, Email, ContactNumber, (Image IS NOT NULL) AS HasImage"
+    
     @staticmethod
     def get_all():
         """Get all doctors"""
-        db = get_db_connection('cims')
+        db = get_db('cims')
         cursor = db.cursor(dictionary=True)
         
-        query = "SELECT * FROM G12_Doctors"
+        query = f"SELECT {Doctor.COLUMNS} FROM G12_Doctors"
         
         cursor.execute(query)
         doctors = cursor.fetchall()
@@ -25,24 +31,75 @@ class Doctor:
         
         return doctors
     
+    @staticmethod
+    def get_by_specialization(specialization=None):
+        """Get doctor names and specializations, optionally for one specialization"""
+        db = get_db('cims')
+        cursor = db.cursor(dictionary=True)
+        
+        query = "SELECT DoctorID, Name, Specialization FROM G12_Doctors"
+        params = ()
+        
+        if specialization:
+            query += " WHERE Specialization = %s"
+            params = (specialization,)
+        
+        cursor.execute(query + " ORDER BY DoctorID", params)
+        doctors = cursor.fetchall()
+        cursor.close()
+        
+        return doctors
+    
     @staticmethod
     def get_by_id(doctor_id):
         """Get doctor details by ID."""
-        conn = get_db_connection('cims')
-        cursor = conn.cursor()
+        conn = get_db('cims')
+        cursor = conn.cursor(dictionary=True)
         
-        cursor.execute('SELECT * FROM Doctors WHERE DoctorID = %s', (doctor_id,))
+        cursor.execute(f'SELECT {Doctor.COLUMNS} FROM G12_Doctors WHERE DoctorID = %s', (doctor_id,))
         
         doctor = cursor.fetchone()
-        conn.close()
+        cursor.close()
         
         return doctor
     
+    @staticmethod
+    def get_image_digest(doctor_id):
+        """Get the SHA-1 digest of a doctor's image, or None if there is no image"""
+        digest = image_digest_cache.get(int(doctor_id))
+        if digest is not None:
+            return digest or None
+        
+        db = get_db('cims')
+        cursor = db.cursor(dictionary=True)
+        
+        # The digest is computed by the server so the BLOB never crosses the wire
+        cursor.execute('SELECT SHA1(Image) AS Digest FROM G12_Doctors WHERE DoctorID = %s', (doctor_id,))
+        row = cursor.fetchone()
+        cursor.close()
+        
+        digest = row['Digest'] if row else None
+        image_digest_cache.set(int(doctor_id), digest or '')
+        
+        return digest
+    
+    @staticmethod
+    def get_image(doctor_id):
+        """Get the raw image bytes of a doctor"""
+        db = get_db('cims')
+        cursor = db.cursor(dictionary=True)
+        
+        cursor.execute('SELECT Image FROM G12_Doctors WHERE DoctorID = %s', (doctor_id,))
+        row = cursor.fetchone()
+        cursor.close()
+        
+        return row['Image'] if row else None
+    
     @staticmethod
     def create(name, specialization, email, contact_number, image=None):
         """Create a new doctor"""
-        db = get_db_connection('cims')
-        cursor = db.cursor()
+        db = get_db('cims')
+        cursor = db.cursor(dictionary=True)
         
         if image:
             query = """
@@ -67,8 +124,8 @@ class Doctor:
     @staticmethod
     def update(doctor_id, data):
         """Update a doctor"""
-        db = get_db_connection('cims')
-        cursor = db.cursor()
+        db = get_db('cims')
+        cursor = db.cursor(dictionary=True)
         
         set_clause = ", ".join([f"{key} = %s" for key in data.keys()])
         query = f"UPDATE G12_Doctors SET {set_clause} WHERE DoctorID = %s"
@@ -82,13 +139,15 @@ class Doctor:
         affected_rows = cursor.rowcount
         cursor.close()
         
+        image_digest_cache.invalidate(int(doctor_id))
+        
         return affected_rows
     
     @staticmethod
     def delete(doctor_id):
         """Delete a doctor"""
-        db = get_db_connection('cims')
-        cursor = db.cursor()
+        db = get_db('cims')
+        cursor = db.cursor(dictionary=True)
         
         query = "DELETE FROM G12_Doctors WHERE DoctorID = %s"
         
@@ -98,6 +157,8 @@ class Doctor:
         affected_rows = cursor.rowcount
         cursor.close()
         
+        image_digest_cache.invalidate(int(doctor_id))
+        
         return affected_rows
 
 class DoctorAvailability:
@@ -113,7 +174,7 @@ class DoctorAvailability:
     @staticmethod
     def get_all():
         """Get all doctor availability records"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = """
@@ -131,7 +192,7 @@ class DoctorAvailability:
     @staticmethod
     def get_by_doctor(doctor_id):
         """Get doctor availability by doctor ID."""
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor(dictionary=True)  # Use dictionary cursor to return dictionaries
         
         # Get the doctor's working hours
@@ -141,86 +202,195 @@ class DoctorAvailability:
         )
         
         availability = cursor.fetchall()
-        conn.close()
         
         return availability
     
+    @staticmethod
+    def get_by_doctors(doctor_ids):
+        """
+        Get availability for several doctors with a single query.
+        
+        Returns:
+            dict: Doctor ID mapped to its list of availability records
+        """
+        return load_grouped(
+            'SELECT * FROM DoctorAvailability WHERE DoctorID IN ({keys})',
+            [int(doctor_id) for doctor_id in doctor_ids],
+            'DoctorID'
+        )
+    
+    @staticmethod
+    def get_day_masks(doctor_ids, dates, store=True):
+        """
+        Get schedule and booked slot bitmaps for doctors on given dates.
+        
+        Cached days are served from availability_cache; the rest are loaded
+        with two queries regardless of how many doctors or dates are missing.
+        
+        Args:
+            doctor_ids: Doctor IDs
+            dates: Dates as date objects or 'YYYY-MM-DD' strings
+            store (bool): Cache the loaded days. Bulk window scans pass False
+                so a single search cannot evict every per-day entry that
+                booking and slot lookups rely on
+        
+        Returns:
+            dict: (doctor_id, 'YYYY-MM-DD') mapped to (schedule_mask, booked_mask)
+        """
+        doctor_ids = sorted({int(doctor_id) for doctor_id in doctor_ids})
+        dates = sorted({slots.normalize_date(date) for date in dates})
+        
+        masks = {}
+        missing_doctors = set()
+        missing_dates = set()
+        for date in dates:
+            for doctor_id in doctor_ids:
+                cached = availability_cache.get((doctor_id, date))
+                if cached is None:
+                    missing_doctors.add(doctor_id)
+                    missing_dates.add(date)
+                else:
+                    masks[(doctor_id, date)] = cached
+        
+        if missing_doctors:
+            loaded = DoctorAvailability._load_day_masks(sorted(missing_doctors), sorted(missing_dates))
+            if store:
+                for key, value in loaded.items():
+                    availability_cache.set(key, value)
+            masks.update(loaded)
+        
+        return masks
+    
+    @staticmethod
+    def _load_day_masks(doctor_ids, dates):
+        """Load slot bitmaps from the database for sorted doctor IDs and dates."""
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        placeholders = ", ".join(["%s"] * len(doctor_ids))
+        
+        cursor.execute(
+            f'SELECT DoctorID, DayOfWeek, StartTime, EndTime FROM DoctorAvailability '
+            f'WHERE DoctorID IN ({placeholders})',
+            tuple(doctor_ids)
+        )
+        
+        # Schedule mask per doctor and weekday
+        schedules = {}
+        for row in cursor.fetchall():
+            key = (row['DoctorID'], row['DayOfWeek'])
+            schedules[key] = schedules.get(key, 0) | slots.range_mask(row['StartTime'], row['EndTime'])
+        
+        cursor.execute(
+            f"SELECT DoctorID, AppointmentDate, AppointmentTime FROM Appointments "
+            f"WHERE DoctorID IN ({placeholders}) AND AppointmentDate BETWEEN %s AND %s "
+            f"AND Status != 'Cancelled'",
+            tuple(doctor_ids) + (dates[0], dates[-1])
+        )
+        
+        booked = {}
+        for row in cursor.fetchall():
+            key = (row['DoctorID'], slots.normalize_date(row['AppointmentDate']))
+            booked[key] = booked.get(key, 0) | (1 << slots.slot_index(row['AppointmentTime']))
+        cursor.close()
+        
+        masks = {}
+        for date in dates:
+            day_name = slots.WEEKDAYS[datetime.strptime(date, '%Y-%m-%d').weekday()]
+            for doctor_id in doctor_ids:
+                masks[(doctor_id, date)] = (
+                    schedules.get((doctor_id, day_name), 0),
+                    booked.get((doctor_id, date), 0)
+                )
+        
+        return masks
+    
+    @staticmethod
+    def invalidate_cache(doctor_id, date=None):
+        """Drop cached slot bitmaps for a doctor, for one date or all dates."""
+        try:
+            doctor_id = int(doctor_id)
+            if date is None:
+                availability_cache.invalidate_where(lambda key: key[0] == doctor_id)
+            else:
+                availability_cache.invalidate((doctor_id, slots.normalize_date(date)))
+        except (TypeError, ValueError):
+            # Unparseable keys can never have been cached
+            pass
+    
     @staticmethod
     def get_available_slots(doctor_id, date):
         """Get available appointment slots for a doctor on a specific date."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Format date to match database format
         try:
-            # Parse input date to ensure correct format
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-            formatted_date = date_obj.strftime('%Y-%m-%d')
-            
-            # Get day of week (0 = Monday, 6 = Sunday)
-            day_of_week = date_obj.weekday()
-            weekdays = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-            day_name = weekdays[day_of_week]
+            formatted_date = slots.normalize_date(date)
             
-            # Check if the doctor works on this day
-            cursor.execute(
-                'SELECT * FROM DoctorAvailability WHERE DoctorID = %s AND DayOfWeek = %s',
-                (doctor_id, day_name)
-            )
+            masks = DoctorAvailability.get_day_masks([doctor_id], [formatted_date])
+            schedule, booked = masks[(int(doctor_id), formatted_date)]
             
-            doctor_schedule = cursor.fetchall()
-            if not doctor_schedule:
-                return []
-                
-            # Get all booked appointments for this doctor on this date
-            cursor.execute(
-                'SELECT AppointmentTime FROM Appointments WHERE DoctorID = %s AND AppointmentDate = %s AND Status != "Cancelled"',
-                (doctor_id, formatted_date)
-            )
-            
-            booked_slots = [row['AppointmentTime'] for row in cursor.fetchall()]
-            
-            # Generate all possible slots based on doctor's schedule
-            all_slots = []
-            for schedule in doctor_schedule:
-                start_time = datetime.strptime(schedule['StartTime'], '%H:%M:%S')
-                end_time = datetime.strptime(schedule['EndTime'], '%H:%M:%S')
-                
-                # Generate slots every 15 minutes
-                current_slot = start_time
-                while current_slot < end_time:
-                    slot_time = current_slot.strftime('%H:%M:%S')
-                    
-                    # Check if this slot is booked
-                    status = 'Booked' if slot_time in booked_slots else 'Available'
-                    
-                    # Check if this slot is in the past (for today's slots)
-                    if formatted_date == datetime.now().strftime('%Y-%m-%d'):
-                        current_time = datetime.now()
-                        if current_slot <= current_time:
-                            status = 'Unavailable'
-                    
-                    all_slots.append({
-                        'time': slot_time,
-                        'status': status
-                    })
-                    
-                    # Move to next slot (15 minutes later)
-                    current_slot += timedelta(minutes=15)
-            
-            conn.close()
-            return all_slots
+            return slots.slot_statuses(schedule, booked, slots.past_mask(formatted_date))
             
         except Exception as e:
             print(f"Error getting available slots: {e}")
-            conn.close()
             return []
     
+    @staticmethod
+    def find_next_available(start_date=None, days=14, specialization=None, limit=10, now=None):
+        """
+        Find the earliest free slots across all doctors in a date window.
+        
+        Uses one query for the doctors and at most two for their schedules
+        and bookings, however many doctors match. Days already cached are
+        reused, but the window is not written back: doctors x days can
+        exceed the cache's capacity.
+        
+        Returns:
+            list: Dicts with DoctorID, DoctorName, Specialization, date and
+                time ('HH:MM'), earliest first
+        """
+        now = now or datetime.now()
+        start = datetime.strptime(slots.normalize_date(start_date or now.date()), '%Y-%m-%d').date()
+        dates = [(start + timedelta(days=offset)).isoformat() for offset in range(days)]
+        
+        doctors = {row['DoctorID']: row for row in Doctor.get_by_specialization(specialization)}
+        if not doctors or not dates or limit <= 0:
+            return []
+        
+        masks = DoctorAvailability.get_day_masks(doctors.keys(), dates, store=False)
+        
+        results = []
+        for date in dates:
+            past = slots.past_mask(date, now)
+            remaining = limit - len(results)
+            
+            # Each doctor contributes at most `remaining` slots for the day
+            candidates = []
+            for doctor_id in doctors:
+                schedule, booked = masks[(doctor_id, date)]
+                free = slots.free_mask(schedule, booked, past)
+                for count, index in enumerate(slots.iter_slots(free)):
+                    if count >= remaining:
+                        break
+                    candidates.append((index, doctor_id))
+            
+            for index, doctor_id in sorted(candidates)[:remaining]:
+                doctor = doctors[doctor_id]
+                results.append({
+                    'DoctorID': doctor_id,
+                    'DoctorName': doctor['Name'],
+                    'Specialization': doctor['Specialization'],
+                    'date': date,
+                    'time': slots.SLOT_TIMES[index][:5]
+                })
+            
+            if len(results) >= limit:
+                break
+        
+        return results
+    
     @staticmethod
     def create(doctor_id, availability_date, start_time, end_time, status='Available'):
         """Create a new doctor availability record"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         query = """
             INSERT INTO DoctorAvailability (DoctorID, AvailabilityDate, StartTime, EndTime, Status)
@@ -233,13 +403,17 @@ class DoctorAvailability:
         availability_id = cursor.lastrowid
         cursor.close()
         
+        DoctorAvailability.invalidate_cache(doctor_id)
+        
         return availability_id
     
     @staticmethod
     def update(availability_id, data):
         """Update a doctor availability record"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        
+        doctor_id = DoctorAvailability._get_doctor_id(cursor, availability_id)
         
         set_clause = ", ".join([f"{key} = %s" for key in data.keys()])
         query = f"UPDATE DoctorAvailability SET {set_clause} WHERE AvailabilityID = %s"
@@ -253,13 +427,18 @@ class DoctorAvailability:
         affected_rows = cursor.rowcount
         cursor.close()
         
+        for changed_doctor in {doctor_id, data.get('DoctorID')} - {None}:
+            DoctorAvailability.invalidate_cache(changed_doctor)
+        
         return affected_rows
     
     @staticmethod
     def delete(availability_id):
         """Delete a doctor availability record"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        
+        doctor_id = DoctorAvailability._get_doctor_id(cursor, availability_id)
         
         query = "DELETE FROM DoctorAvailability WHERE AvailabilityID = %s"
         
@@ -269,4 +448,14 @@ class DoctorAvailability:
         affected_rows = cursor.rowcount
         cursor.close()
         
+        if doctor_id is not None:
+            DoctorAvailability.invalidate_cache(doctor_id)
+        
         return affected_rows
+    
+    @staticmethod
+    def _get_doctor_id(cursor, availability_id):
+        """Get the doctor an availability record belongs to"""
+        cursor.execute('SELECT DoctorID FROM DoctorAvailability WHERE AvailabilityID = %s', (availability_id,))
+        row = cursor.fetchone()
+        return row['DoctorID'] if row else None
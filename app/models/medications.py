@@ -1,4 +1,4 @@
-from app.utils.database import get_db_connection
+from app.utils.database import get_db
 
 class Medication:
     def __init__(self, medication_id=None, name=None, dosage_form=None,
@@ -12,7 +12,7 @@ class Medication:
     @staticmethod
     def get_all():
         """Get all medications"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = "SELECT * FROM Medications ORDER BY Name"
@@ -26,7 +26,7 @@ class Medication:
     @staticmethod
     def get_by_id(medication_id):
         """Get medication by ID"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = "SELECT * FROM Medications WHERE MedicationID = %s"
@@ -40,7 +40,7 @@ class Medication:
     @staticmethod
     def search(term):
         """Search medications by name"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = "SELECT * FROM Medications WHERE Name LIKE %s ORDER BY Name"
@@ -54,8 +54,8 @@ class Medication:
     @staticmethod
     def create(name, dosage_form, quantity_in_stock, expiry_date=None):
         """Create a new medication"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         if expiry_date:
             query = """
@@ -80,8 +80,8 @@ class Medication:
     @staticmethod
     def update(medication_id, data):
         """Update a medication"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         set_clause = ", ".join([f"{key} = %s" for key in data.keys()])
         query = f"UPDATE Medications SET {set_clause} WHERE MedicationID = %s"
@@ -100,8 +100,8 @@ class Medication:
     @staticmethod
     def delete(medication_id):
         """Delete a medication"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         query = "DELETE FROM Medications WHERE MedicationID = %s"
         
@@ -116,8 +116,8 @@ class Medication:
     @staticmethod
     def update_stock(medication_id, quantity_change):
         """Update medication stock quantity"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         query = """
             UPDATE Medications 
@@ -136,7 +136,7 @@ class Medication:
     @staticmethod
     def get_low_stock(threshold=10):
         """Get medications with low stock"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = "SELECT * FROM Medications WHERE QuantityInStock <= %s ORDER BY QuantityInStock"
@@ -150,7 +150,7 @@ class Medication:
     @staticmethod
     def get_expired(current_date):
         """Get expired medications"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = "SELECT * FROM Medications WHERE ExpiryDate IS NOT NULL AND ExpiryDate <= %s"
@@ -0,0 +1,63 @@
+from app.utils.database import get_db
+from datetime import datetime
+
+class Notification:
+    """Notifications stored in the Notifications table."""
+
+    COLUMNS = "NotificationID, Role, UserID, Message, CreatedAt"
+
+    @staticmethod
+    def create(role, user_id, message):
+        """Store a notification for a user, or for every user of a role when user_id is None"""
+        db = get_db()
+        cursor = db.cursor()
+
+        cursor.execute(
+            "INSERT INTO Notifications (Role, UserID, Message, CreatedAt) VALUES (%s, %s, %s, %s)",
+            (role, None if user_id is None else str(user_id), message, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        )
+        notification_id = cursor.lastrowid
+        db.commit()
+        cursor.close()
+
+        return notification_id
+
+    @staticmethod
+    def get_recent(role, user_id, limit=20):
+        """Get the newest notifications addressed to a user or their whole role, newest first"""
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+
+        # Two short backward ranges of the (Role, UserID, NotificationID) index;
+        # an OR of both would sort every notification ever sent to the role
+        query = f"""
+            SELECT {Notification.COLUMNS} FROM (
+                SELECT {Notification.COLUMNS} FROM Notifications
+                WHERE Role = %s AND UserID = %s
+                ORDER BY NotificationID DESC LIMIT %s
+            ) own
+            UNION ALL
+            SELECT {Notification.COLUMNS} FROM (
+                SELECT {Notification.COLUMNS} FROM Notifications
+                WHERE Role = %s AND UserID IS NULL
+                ORDER BY NotificationID DESC LIMIT %s
+            ) shared
+            ORDER BY NotificationID DESC
+            LIMIT %s
+        """
+
+        cursor.execute(query, (role, str(user_id), limit, role, limit, limit))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        return rows
+
+    @staticmethod
+    def to_dict(row):
+        """Convert a notification row to the JSON format of the notification event"""
+        created_at = row['CreatedAt']
+        return {
+            'id': row['NotificationID'],
+            'message': row['Message'],
+            'timestamp': int(created_at.timestamp()) if created_at else None
+        }
@@ -1,4 +1,7 @@
-from app.utils.database import get_db_connection
+from app.utils.database import get_db, stream_query
+from app.utils.loader import load_grouped
+from app.utils.pagination import KeysetKey, paginate, DEFAULT_PER_PAGE
+from app.utils import events, counters, timeline
 
 class Prescription:
     def __init__(self, prescription_id=None, appointment_id=None, doctor_id=None, 
@@ -16,7 +19,7 @@ class Prescription:
     @staticmethod
     def get_all():
         """Get all prescriptions"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = """
@@ -35,10 +38,47 @@ class Prescription:
         
         return prescriptions
     
+    # Keyset sort order of the paginated list, newest first
+    PAGE_KEYS = [KeysetKey('p.PrescriptionDate'), KeysetKey('p.PrescriptionID')]
+    
+    @staticmethod
+    def get_page(doctor_id=None, student_id=None, cursor=None,
+                 per_page=DEFAULT_PER_PAGE, include_total=False):
+        """Get one page of prescriptions, optionally filtered by doctor and student"""
+        conditions = []
+        params = []
+        
+        if doctor_id is not None:
+            conditions.append("p.DoctorID = %s")
+            params.append(doctor_id)
+        
+        if student_id is not None:
+            conditions.append("p.StudentID = %s")
+            params.append(student_id)
+        
+        return paginate(
+            """
+            SELECT p.*, s.FirstName as StudentFirstName, s.LastName as StudentLastName,
+                   d.Name as DoctorName, m.Name as MedicationName, m.DosageForm,
+                   (SELECT MAX(mg.DateGiven) FROM MedicinesGiven mg
+                    WHERE mg.PrescriptionID = p.PrescriptionID) as DateGiven
+            FROM Prescription p
+            JOIN Students s ON p.StudentID = s.StudentID
+            JOIN cs432cims.G12_Doctors d ON p.DoctorID = d.DoctorID
+            JOIN Medications m ON p.MedicationID = m.MedicationID
+            """,
+            Prescription.PAGE_KEYS,
+            conditions,
+            params,
+            cursor=cursor,
+            per_page=per_page,
+            include_total=include_total
+        )
+    
     @staticmethod
     def get_by_id(prescription_id):
         """Get prescription by ID"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = """
@@ -60,7 +100,7 @@ class Prescription:
     @staticmethod
     def get_by_student(student_id):
         """Get prescriptions for a specific student"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = """
@@ -83,7 +123,7 @@ class Prescription:
     @staticmethod
     def get_by_doctor(doctor_id):
         """Get prescriptions issued by a specific doctor"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = """
@@ -103,24 +143,51 @@ class Prescription:
         return prescriptions
     
     @staticmethod
-    def get_unfulfilled():
-        """Get prescriptions that haven't been fulfilled yet"""
-        db = get_db_connection()
+    def get_by_appointments(appointment_ids):
+        """
+        Get prescriptions for several appointments with a single query
+        
+        Returns:
+            dict: Appointment ID mapped to its list of prescriptions
+        """
+        return load_grouped(
+            """
+            SELECT p.*, m.Name as MedicationName, m.DosageForm
+            FROM Prescription p
+            JOIN Medications m ON p.MedicationID = m.MedicationID
+            WHERE p.AppointmentID IN ({keys})
+            ORDER BY p.PrescriptionDate DESC
+            """,
+            [int(appointment_id) for appointment_id in appointment_ids],
+            'AppointmentID'
+        )
+    
+    @staticmethod
+    def get_by_appointment(appointment_id):
+        """Get prescriptions written during an appointment"""
+        return Prescription.get_by_appointments([appointment_id])[int(appointment_id)]
+    
+    @staticmethod
+    def get_unfulfilled(limit=100):
+        """Get the oldest prescriptions that haven't been fulfilled yet, with their claims"""
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
+        # Reads the (DispenseStatus, PrescriptionDate, PrescriptionID) index in order
         query = """
             SELECT p.*, s.FirstName as StudentFirstName, s.LastName as StudentLastName,
-                   d.Name as DoctorName, m.Name as MedicationName, m.DosageForm
+                   d.Name as DoctorName, m.Name as MedicationName, m.DosageForm,
+                   p.ClaimExpiresAt > NOW() as Claimed
             FROM Prescription p
             JOIN Students s ON p.StudentID = s.StudentID
-            JOIN G12_Doctors d ON p.DoctorID = d.DoctorID
+            JOIN cs432cims.G12_Doctors d ON p.DoctorID = d.DoctorID
             JOIN Medications m ON p.MedicationID = m.MedicationID
-            LEFT JOIN MedicinesGiven mg ON p.PrescriptionID = mg.PrescriptionID
-            WHERE mg.MedicineGivenID IS NULL
-            ORDER BY p.PrescriptionDate
+            WHERE p.DispenseStatus = 'Pending'
+            ORDER BY p.PrescriptionDate, p.PrescriptionID
+            LIMIT %s
         """
         
-        cursor.execute(query)
+        cursor.execute(query, (limit,))
         prescriptions = cursor.fetchall()
         cursor.close()
         
@@ -130,8 +197,8 @@ class Prescription:
     def create(appointment_id, doctor_id, student_id, medication_id, 
                prescription_date, quantity, instructions):
         """Create a new prescription"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         query = """
             INSERT INTO Prescription (
@@ -144,19 +211,30 @@ class Prescription:
             appointment_id, doctor_id, student_id, medication_id,
             prescription_date, quantity, instructions
         ))
+        prescription_id = cursor.lastrowid
         
-        db.commit()
+        touched = counters.apply(cursor, counters.prescription_deltas(
+            {'DoctorID': doctor_id, 'StudentID': student_id}
+        ))
+        timeline.sync_prescription(cursor, prescription_id, dispenses=False)
         
-        prescription_id = cursor.lastrowid
+        db.commit()
         cursor.close()
         
+        counters.invalidate(touched)
+        events.push_stats('doctor', doctor_id)
+        events.push_stats('student', student_id)
+        events.push_stats('staff')
+        events.notify('student', student_id, 'You have a new prescription')
+        events.notify('staff', None, f'New prescription {prescription_id} is waiting to be dispensed')
+        
         return prescription_id
     
     @staticmethod
     def update(prescription_id, data):
         """Update a prescription"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         set_clause = ", ".join([f"{key} = %s" for key in data.keys()])
         query = f"UPDATE Prescription SET {set_clause} WHERE PrescriptionID = %s"
@@ -165,9 +243,11 @@ class Prescription:
         values.append(prescription_id)
         
         cursor.execute(query, tuple(values))
+        affected_rows = cursor.rowcount
+        if affected_rows:
+            timeline.sync_prescription(cursor, prescription_id)
         db.commit()
         
-        affected_rows = cursor.rowcount
         cursor.close()
         
         return affected_rows
@@ -175,20 +255,40 @@ class Prescription:
     @staticmethod
     def delete(prescription_id):
         """Delete a prescription"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        
+        cursor.execute(
+            "SELECT DoctorID, StudentID, DispenseStatus FROM Prescription WHERE PrescriptionID = %s FOR UPDATE",
+            (prescription_id,)
+        )
+        current = cursor.fetchone()
         
         query = "DELETE FROM Prescription WHERE PrescriptionID = %s"
         
         cursor.execute(query, (prescription_id,))
-        db.commit()
-        
         affected_rows = cursor.rowcount
+        
+        touched = set()
+        if current and affected_rows:
+            touched = counters.apply(cursor, counters.prescription_deltas(
+                current, -1, current['DispenseStatus'] == 'Pending'
+            ))
+            timeline.remove_prescription(cursor, prescription_id)
+        
+        db.commit()
         cursor.close()
         
+        counters.invalidate(touched)
+        
         return affected_rows
 
 class MedicineGiven:
+    # Results of create() other than a new record ID
+    NOT_ENOUGH_STOCK = -1
+    CLAIMED_BY_OTHER = -2
+    ALREADY_DISPENSED = -3
+    
     def __init__(self, medicine_given_id=None, prescription_id=None, medication_id=None,
                  date_given=None, quantity_given=None):
         self.medicine_given_id = medicine_given_id
@@ -200,7 +300,7 @@ class MedicineGiven:
     @staticmethod
     def get_all():
         """Get all medicine given records"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = """
@@ -219,10 +319,49 @@ class MedicineGiven:
         
         return medicines_given
     
+    @staticmethod
+    def iter_all(chunk_size=None):
+        """Stream all medicine given records, newest first, without loading them into memory"""
+        return stream_query(
+            """
+            SELECT mg.*, m.Name as MedicationName, s.FirstName as StudentFirstName,
+                   s.LastName as StudentLastName, d.Name as DoctorName
+            FROM MedicinesGiven mg
+            JOIN Prescription p ON mg.PrescriptionID = p.PrescriptionID
+            JOIN Medications m ON mg.MedicationID = m.MedicationID
+            JOIN Students s ON p.StudentID = s.StudentID
+            JOIN cs432cims.G12_Doctors d ON p.DoctorID = d.DoctorID
+            ORDER BY mg.DateGiven DESC, mg.MedicineGivenID DESC
+            """,
+            chunk_size=chunk_size
+        )
+    
+    # Keyset sort order of the paginated list, newest first
+    PAGE_KEYS = [KeysetKey('mg.DateGiven'), KeysetKey('mg.MedicineGivenID')]
+    
+    @staticmethod
+    def get_page(cursor=None, per_page=DEFAULT_PER_PAGE, include_total=False):
+        """Get one page of medicine given records"""
+        return paginate(
+            """
+            SELECT mg.*, m.Name as MedicationName, s.FirstName as StudentFirstName,
+                   s.LastName as StudentLastName, d.Name as DoctorName
+            FROM MedicinesGiven mg
+            JOIN Prescription p ON mg.PrescriptionID = p.PrescriptionID
+            JOIN Medications m ON mg.MedicationID = m.MedicationID
+            JOIN Students s ON p.StudentID = s.StudentID
+            JOIN cs432cims.G12_Doctors d ON p.DoctorID = d.DoctorID
+            """,
+            MedicineGiven.PAGE_KEYS,
+            cursor=cursor,
+            per_page=per_page,
+            include_total=include_total
+        )
+    
     @staticmethod
     def get_by_prescription(prescription_id):
         """Get medicine given records for a specific prescription"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = """
@@ -240,10 +379,40 @@ class MedicineGiven:
         return medicines_given
     
     @staticmethod
-    def create(prescription_id, medication_id, date_given, quantity_given):
-        """Create a new medicine given record"""
-        db = get_db_connection()
-        cursor = db.cursor()
+    def create(prescription_id, medication_id, date_given, quantity_given, staff_id=None):
+        """
+        Create a new medicine given record and take the prescription off the dispensing queue.
+        
+        Returns:
+            int: New record ID, NOT_ENOUGH_STOCK, CLAIMED_BY_OTHER if another
+                staff member holds an unexpired claim on the prescription,
+                ALREADY_DISPENSED, or 0 if nothing was written
+        """
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        
+        # Lock the prescription so concurrent dispenses cannot both go ahead
+        cursor.execute(
+            """
+            SELECT StudentID, DispenseStatus, ClaimedBy, ClaimExpiresAt > NOW() AS Claimed
+            FROM Prescription
+            WHERE PrescriptionID = %s
+            FOR UPDATE
+            """,
+            (prescription_id,)
+        )
+        prescription = cursor.fetchone()
+        
+        if prescription:
+            result = None
+            if prescription['DispenseStatus'] == 'Dispensed':
+                result = MedicineGiven.ALREADY_DISPENSED
+            elif prescription['Claimed'] and staff_id is not None and str(prescription['ClaimedBy']) != str(staff_id):
+                result = MedicineGiven.CLAIMED_BY_OTHER
+            if result is not None:
+                db.rollback()
+                cursor.close()
+                return result
         
         query = """
             INSERT INTO MedicinesGiven (
@@ -255,9 +424,9 @@ class MedicineGiven:
             prescription_id, medication_id, date_given, quantity_given
         ))
         
-        db.commit()
+        medicine_given_id = cursor.lastrowid
         
-        # Update medication stock
+        # Update medication stock in the same transaction
         stock_query = """
             UPDATE Medications 
             SET QuantityInStock = QuantityInStock - %s 
@@ -270,19 +439,40 @@ class MedicineGiven:
             # Roll back if not enough stock
             db.rollback()
             cursor.close()
-            return -1
+            return MedicineGiven.NOT_ENOUGH_STOCK
+        
+        cursor.execute(
+            """
+            UPDATE Prescription
+            SET DispenseStatus = 'Dispensed', ClaimedBy = NULL, ClaimExpiresAt = NULL
+            WHERE PrescriptionID = %s
+            """,
+            (prescription_id,)
+        )
+        
+        touched = set()
+        if prescription:
+            touched = counters.apply(cursor, counters.dispense_deltas(
+                prescription['StudentID'], date_given, changes_pending=prescription['DispenseStatus'] == 'Pending'
+            ))
+        timeline.sync_dispense(cursor, medicine_given_id)
         
         db.commit()
-        medicine_given_id = cursor.lastrowid
         cursor.close()
         
+        counters.invalidate(touched)
+        events.push_stats('staff')
+        if prescription:
+            events.push_stats('student', prescription['StudentID'])
+            events.notify('student', prescription['StudentID'], 'Your medication has been dispensed')
+        
         return medicine_given_id
     
     @staticmethod
     def update(medicine_given_id, data):
         """Update a medicine given record"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         # First get the current record to calculate stock adjustment
         query = "SELECT * FROM MedicinesGiven WHERE MedicineGivenID = %s"
@@ -326,17 +516,78 @@ class MedicineGiven:
         values.append(medicine_given_id)
         
         cursor.execute(update_query, tuple(values))
-        db.commit()
-        
         affected_rows = cursor.rowcount
+        
+        touched = set()
+        if affected_rows:
+            reopened = filled = None
+            if 'PrescriptionID' in data and str(data['PrescriptionID']) != str(current['PrescriptionID']):
+                reopened, filled = MedicineGiven._move_between(cursor, current['PrescriptionID'], data['PrescriptionID'])
+            touched = counters.apply(cursor, counters.merge(
+                counters.dispense_deltas(reopened, current['DateGiven'], -1, changes_pending=reopened is not None),
+                counters.dispense_deltas(
+                    filled, data.get('DateGiven', current['DateGiven']), changes_pending=filled is not None
+                )
+            ))
+            timeline.sync_dispense(cursor, medicine_given_id)
+        
+        db.commit()
         cursor.close()
         
+        counters.invalidate(touched)
+        
         return affected_rows
     
+    @staticmethod
+    def _move_between(cursor, old_prescription_id, new_prescription_id):
+        """
+        Update the dispense status of both prescriptions after a record moved between them.
+        
+        Returns:
+            tuple: StudentID of the old prescription if it has no dispense
+                left and is pending again, and StudentID of the new one if
+                it was pending; None otherwise
+        """
+        # Both rows are locked in ID order, so concurrent moves cannot deadlock
+        cursor.execute(
+            """
+            SELECT p.PrescriptionID, p.StudentID, p.DispenseStatus,
+                   EXISTS (SELECT 1 FROM MedicinesGiven mg
+                           WHERE mg.PrescriptionID = p.PrescriptionID) AS HasDispenses
+            FROM Prescription p
+            WHERE p.PrescriptionID IN (%s, %s)
+            ORDER BY p.PrescriptionID
+            FOR UPDATE
+            """,
+            (old_prescription_id, new_prescription_id)
+        )
+        rows = {str(row['PrescriptionID']): row for row in cursor.fetchall()}
+        old, new = rows.get(str(old_prescription_id)), rows.get(str(new_prescription_id))
+        
+        reopened = filled = None
+        if old and old['DispenseStatus'] == 'Dispensed' and not old['HasDispenses']:
+            cursor.execute(
+                "UPDATE Prescription SET DispenseStatus = 'Pending' WHERE PrescriptionID = %s",
+                (old_prescription_id,)
+            )
+            reopened = old['StudentID']
+        if new and new['DispenseStatus'] == 'Pending':
+            cursor.execute(
+                """
+                UPDATE Prescription
+                SET DispenseStatus = 'Dispensed', ClaimedBy = NULL, ClaimExpiresAt = NULL
+                WHERE PrescriptionID = %s
+                """,
+                (new_prescription_id,)
+            )
+            filled = new['StudentID']
+        
+        return reopened, filled
+    
     @staticmethod
     def delete(medicine_given_id):
         """Delete a medicine given record"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         # First get the current record to adjust stock
@@ -360,9 +611,163 @@ class MedicineGiven:
         # Delete the record
         delete_query = "DELETE FROM MedicinesGiven WHERE MedicineGivenID = %s"
         cursor.execute(delete_query, (medicine_given_id,))
+        affected_rows = cursor.rowcount
+        
+        # Deleting the last dispense makes the prescription pending again
+        cursor.execute(
+            """
+            SELECT p.StudentID,
+                   NOT EXISTS (SELECT 1 FROM MedicinesGiven mg
+                               WHERE mg.PrescriptionID = p.PrescriptionID) AS Pending
+            FROM Prescription p
+            WHERE p.PrescriptionID = %s
+            FOR UPDATE
+            """,
+            (record['PrescriptionID'],)
+        )
+        prescription = cursor.fetchone()
+        
+        touched = set()
+        if prescription and affected_rows:
+            if prescription['Pending']:
+                cursor.execute(
+                    "UPDATE Prescription SET DispenseStatus = 'Pending' WHERE PrescriptionID = %s",
+                    (record['PrescriptionID'],)
+                )
+            touched = counters.apply(cursor, counters.dispense_deltas(
+                prescription['StudentID'], record['DateGiven'], -1, changes_pending=bool(prescription['Pending'])
+            ))
+        if affected_rows:
+            timeline.sync_dispense(cursor, medicine_given_id, exists=False)
         
         db.commit()
-        affected_rows = cursor.rowcount
         cursor.close()
         
+        counters.invalidate(touched)
+        
         return affected_rows
+
+class DispensingQueue:
+    """
+    Prescriptions waiting to be dispensed.
+    
+    Pending prescriptions are claimed by a staff member for a limited
+    time so two people never work on the same one. Claims are taken with
+    FOR UPDATE SKIP LOCKED: concurrent claimers skip rows another
+    transaction is claiming instead of waiting for it, and an expired
+    claim is simply claimable again.
+    """
+    
+    DEFAULT_CLAIM_SECONDS = 300
+    
+    @staticmethod
+    def claim(staff_id, limit=1, claim_seconds=DEFAULT_CLAIM_SECONDS):
+        """
+        Claim the oldest unclaimed prescriptions.
+        
+        Returns:
+            list: IDs of the claimed prescriptions, oldest first
+        """
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        
+        try:
+            cursor.execute(
+                """
+                SELECT PrescriptionID
+                FROM Prescription
+                WHERE DispenseStatus = 'Pending'
+                  AND (ClaimExpiresAt IS NULL OR ClaimExpiresAt <= NOW())
+                ORDER BY PrescriptionDate, PrescriptionID
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                (limit,)
+            )
+            prescription_ids = [row['PrescriptionID'] for row in cursor.fetchall()]
+            
+            if prescription_ids:
+                placeholders = ', '.join(['%s'] * len(prescription_ids))
+                cursor.execute(
+                    f"""
+                    UPDATE Prescription
+                    SET ClaimedBy = %s, ClaimExpiresAt = NOW() + INTERVAL %s SECOND
+                    WHERE PrescriptionID IN ({placeholders})
+                    """,
+                    (staff_id, claim_seconds, *prescription_ids)
+                )
+            
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
+        
+        return prescription_ids
+    
+    @staticmethod
+    def claim_one(prescription_id, staff_id, claim_seconds=DEFAULT_CLAIM_SECONDS):
+        """
+        Claim a specific prescription, or extend the caller's own claim.
+        
+        Returns:
+            bool: False if it is dispensed or claimed by someone else
+        """
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        
+        cursor.execute(
+            """
+            UPDATE Prescription
+            SET ClaimedBy = %s, ClaimExpiresAt = NOW() + INTERVAL %s SECOND
+            WHERE PrescriptionID = %s
+              AND DispenseStatus = 'Pending'
+              AND (ClaimedBy = %s OR ClaimExpiresAt IS NULL OR ClaimExpiresAt <= NOW())
+            """,
+            (staff_id, claim_seconds, prescription_id, staff_id)
+        )
+        claimed = cursor.rowcount > 0
+        db.commit()
+        cursor.close()
+        
+        return claimed
+    
+    @staticmethod
+    def release(prescription_id, staff_id):
+        """Give up the caller's claim on a prescription"""
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        
+        cursor.execute(
+            """
+            UPDATE Prescription
+            SET ClaimedBy = NULL, ClaimExpiresAt = NULL
+            WHERE PrescriptionID = %s AND ClaimedBy = %s AND DispenseStatus = 'Pending'
+            """,
+            (prescription_id, staff_id)
+        )
+        released = cursor.rowcount > 0
+        db.commit()
+        cursor.close()
+        
+        return released
+    
+    @staticmethod
+    def get_depth():
+        """Get the number of pending prescriptions and how many of them are claimed"""
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        
+        cursor.execute(
+            """
+            SELECT COUNT(*) AS pending,
+                   COALESCE(SUM(ClaimExpiresAt > NOW()), 0) AS claimed
+            FROM Prescription
+            WHERE DispenseStatus = 'Pending'
+            """
+        )
+        depth = cursor.fetchone()
+        cursor.close()
+        
+        return {key: int(value or 0) for key, value in depth.items()}
@@ -1,4 +1,4 @@
-from app.utils.database import get_db_connection
+from app.utils.database import get_db
 
 class Staff:
     def __init__(self, staff_id=None, first_name=None, last_name=None, 
@@ -13,7 +13,7 @@ class Staff:
     @staticmethod
     def get_all():
         """Get all staff members"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = "SELECT * FROM Staff ORDER BY FirstName, LastName"
@@ -27,7 +27,7 @@ class Staff:
     @staticmethod
     def get_by_id(staff_id):
         """Get staff member by ID"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = "SELECT * FROM Staff WHERE StaffID = %s"
@@ -41,7 +41,7 @@ class Staff:
     @staticmethod
     def get_by_role(role):
         """Get staff members by role"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = "SELECT * FROM Staff WHERE Role = %s ORDER BY FirstName, LastName"
@@ -55,8 +55,8 @@ class Staff:
     @staticmethod
     def create(first_name, last_name, role, email=None, contact_number=None):
         """Create a new staff member"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         query = """
             INSERT INTO Staff (FirstName, LastName, Role, Email, ContactNumber)
@@ -74,8 +74,8 @@ class Staff:
     @staticmethod
     def update(staff_id, data):
         """Update a staff member"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         set_clause = ", ".join([f"{key} = %s" for key in data.keys()])
         query = f"UPDATE Staff SET {set_clause} WHERE StaffID = %s"
@@ -94,8 +94,8 @@ class Staff:
     @staticmethod
     def delete(staff_id):
         """Delete a staff member"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         query = "DELETE FROM Staff WHERE StaffID = %s"
         
@@ -110,7 +110,7 @@ class Staff:
     @staticmethod
     def search(term):
         """Search staff members by name"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = """
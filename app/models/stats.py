@@ -0,0 +1,76 @@
+from app.utils.database import get_db
+from app.utils import counters
+from datetime import datetime
+
+class DashboardStats:
+    """Dashboard counters read from the materialized DashboardCounters table."""
+
+    @staticmethod
+    def get_doctor_stats(doctor_id, current_date=None):
+        """Get dashboard counters for a doctor"""
+        current_date = current_date or datetime.now().strftime('%Y-%m-%d')
+
+        return DashboardStats._read({
+            'appointments_today': f'doctor:{doctor_id}:appointments:{current_date}',
+            'pending_appointments': f'doctor:{doctor_id}:pending_appointments',
+            'prescriptions_issued': f'doctor:{doctor_id}:prescriptions',
+            'patients_seen': f'doctor:{doctor_id}:patients_seen'
+        })
+
+    @staticmethod
+    def get_staff_stats(current_date=None, low_stock_threshold=10):
+        """Get dashboard counters for pharmacy staff"""
+        current_date = current_date or datetime.now().strftime('%Y-%m-%d')
+
+        stats = DashboardStats._read({
+            'pending_prescriptions': 'staff:pending_prescriptions',
+            'medicines_dispensed_today': f'staff:dispensed:{current_date}',
+            'total_students_served': 'staff:students_served'
+        })
+
+        # Stock changes everywhere and Medications is small, so this one is still counted
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT COUNT(*) AS low_stock_medications FROM Medications WHERE QuantityInStock <= %s",
+            (low_stock_threshold,)
+        )
+        stats.update(DashboardStats._as_ints(cursor.fetchone()))
+        cursor.close()
+
+        return stats
+
+    @staticmethod
+    def get_student_stats(student_id):
+        """Get dashboard counters for a student"""
+        return DashboardStats._read({
+            'upcoming_appointments': f'student:{student_id}:upcoming_appointments',
+            'pending_prescriptions': f'student:{student_id}:pending_prescriptions',
+            'total_appointments': f'student:{student_id}:appointments',
+            'total_prescriptions': f'student:{student_id}:prescriptions'
+        })
+
+    @staticmethod
+    def get_for_role(role, user_id):
+        """Get the dashboard counters for a user's role"""
+        if role == 'doctor':
+            return DashboardStats.get_doctor_stats(user_id)
+        elif role == 'staff':
+            return DashboardStats.get_staff_stats()
+        elif role == 'student':
+            return DashboardStats.get_student_stats(user_id)
+
+        return {}
+
+    @staticmethod
+    def _read(keys):
+        """Read counters by stat name from their counter keys"""
+        values = counters.get_many(list(keys.values()))
+        return {name: values[key] for name, key in keys.items()}
+
+    @staticmethod
+    def _as_ints(row):
+        """Convert aggregate results (Decimal for SUM) to plain integers"""
+        if not row:
+            return {}
+        return {key: int(value or 0) for key, value in row.items()}
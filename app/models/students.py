@@ -1,4 +1,4 @@
-from app.utils.database import get_db_connection
+from app.utils.database import get_db
 
 class Student:
     def __init__(self, student_id=None, first_name=None, last_name=None, 
@@ -16,7 +16,7 @@ class Student:
     @staticmethod
     def get_all():
         """Get all students"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = "SELECT * FROM Students ORDER BY FirstName, LastName"
@@ -30,7 +30,7 @@ class Student:
     @staticmethod
     def get_by_id(student_id):
         """Get student by ID"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = "SELECT * FROM Students WHERE StudentID = %s"
@@ -44,7 +44,7 @@ class Student:
     @staticmethod
     def search(term):
         """Search students by name or ID"""
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
         query = """
@@ -64,8 +64,8 @@ class Student:
     def create(first_name, last_name, gender, date_of_birth=None, 
                email=None, contact_number=None, address=None):
         """Create a new student"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         query = """
             INSERT INTO Students (
@@ -88,8 +88,8 @@ class Student:
     @staticmethod
     def update(student_id, data):
         """Update a student"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         set_clause = ", ".join([f"{key} = %s" for key in data.keys()])
         query = f"UPDATE Students SET {set_clause} WHERE StudentID = %s"
@@ -108,8 +108,8 @@ class Student:
     @staticmethod
     def delete(student_id):
         """Delete a student"""
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
         
         query = "DELETE FROM Students WHERE StudentID = %s"
         
@@ -120,32 +120,3 @@ class Student:
         cursor.close()
         
         return affected_rows
-    
-    @staticmethod
-    def get_medical_history(student_id):
-        """Get medical history for a student"""
-        db = get_db_connection()
-        cursor = db.cursor(dictionary=True)
-        
-        query = """
-            SELECT 
-                a.AppointmentDate, a.AppointmentTime, 
-                d.Name as DoctorName, d.Specialization,
-                p.PrescriptionID, p.Instructions,
-                m.Name as MedicationName, m.DosageForm,
-                p.Quantity as PrescribedQuantity,
-                mg.DateGiven, mg.QuantityGiven
-            FROM Appointments a
-            LEFT JOIN G12_Doctors d ON a.DoctorID = d.DoctorID
-            LEFT JOIN Prescription p ON a.AppointmentID = p.AppointmentID
-            LEFT JOIN Medications m ON p.MedicationID = m.MedicationID
-            LEFT JOIN MedicinesGiven mg ON p.PrescriptionID = mg.PrescriptionID
-            WHERE a.StudentID = %s
-            ORDER BY a.AppointmentDate DESC, a.AppointmentTime DESC
-        """
-        
-        cursor.execute(query, (student_id,))
-        history = cursor.fetchall()
-        cursor.close()
-        
-        return history
@@ -0,0 +1,52 @@
+import datetime
+
+from app.utils.pagination import KeysetKey, paginate, DEFAULT_PER_PAGE
+
+class StudentTimeline:
+    """Medical history read from the materialized StudentTimeline table."""
+
+    COLUMNS = ("TimelineID, EventDate, EventTime, EventType, AppointmentID, PrescriptionID, DoctorID, "
+               "DoctorName, Specialization, MedicationName, DosageForm, Quantity, Instructions")
+
+    PAGE_KEYS = [KeysetKey('EventDate'), KeysetKey('TimelineID')]
+
+    @staticmethod
+    def get_page(student_id, cursor=None, per_page=DEFAULT_PER_PAGE):
+        """Get one page of a student's timeline, newest first"""
+        # A single range of the (StudentID, EventDate, TimelineID) index
+        return paginate(
+            f"SELECT {StudentTimeline.COLUMNS} FROM StudentTimeline",
+            StudentTimeline.PAGE_KEYS,
+            ["StudentID = %s"],
+            [student_id],
+            cursor=cursor,
+            per_page=per_page
+        )
+
+    @staticmethod
+    def to_dict(row):
+        """Convert a timeline row to JSON-safe values"""
+        event_time = row['EventTime']
+        if isinstance(event_time, datetime.timedelta):
+            # MySQL returns TIME columns as timedelta
+            seconds = int(event_time.total_seconds())
+            event_time = '%02d:%02d' % (seconds // 3600, seconds // 60 % 60)
+        elif event_time is not None:
+            event_time = str(event_time)[:5]
+
+        event_date = row['EventDate']
+        return {
+            'id': row['TimelineID'],
+            'type': row['EventType'],
+            'date': event_date.isoformat() if hasattr(event_date, 'isoformat') else event_date,
+            'time': event_time,
+            'appointment_id': row['AppointmentID'],
+            'prescription_id': row['PrescriptionID'],
+            'doctor_id': row['DoctorID'],
+            'doctor_name': row['DoctorName'],
+            'specialization': row['Specialization'],
+            'medication_name': row['MedicationName'],
+            'dosage_form': row['DosageForm'],
+            'quantity': row['Quantity'],
+            'instructions': row['Instructions']
+        }
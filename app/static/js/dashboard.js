@@ -9,8 +9,18 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Setup notifications
     setupNotifications();
+    
+    // Receive live updates, or poll if the browser cannot stream events
+    setupEventStream();
 });
 
+const POLL_INTERVAL = 60000;
+const MAX_ACTIVITY_ITEMS = 20;
+
+let notificationCount = 0;
+let lastNotificationId = null;
+let pollTimer = null;
+
 function initDashboard() {
     // Load dashboard statistics
     loadDashboardStats();
@@ -19,6 +29,65 @@ function initDashboard() {
     loadRecentActivity();
 }
 
+function setupEventStream() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    
+    // The browser reconnects on its own and sends Last-Event-ID so missed events are replayed
+    const source = new EventSource('/api/events/stream');
+    
+    source.addEventListener('stats', event => {
+        updateStatsDisplay(JSON.parse(event.data));
+    });
+    
+    source.addEventListener('activity', event => {
+        addActivityItem(JSON.parse(event.data));
+    });
+    
+    source.addEventListener('notification', event => {
+        const notification = JSON.parse(event.data);
+        if (notification.id) {
+            lastNotificationId = notification.id;
+        }
+        notificationCount++;
+        updateNotificationBadge(notificationCount);
+        showNotification(notification.message, 'info');
+    });
+    
+    // Events were missed and cannot be replayed, reload everything once
+    source.addEventListener('reset', () => {
+        initDashboard();
+        checkNotifications();
+    });
+    
+    source.onopen = () => {
+        stopPolling();
+    };
+    
+    source.onerror = () => {
+        // CLOSED means the server refused the stream (e.g. too many connections)
+        if (source.readyState === EventSource.CLOSED) {
+            startPolling();
+        }
+    };
+}
+
+function startPolling() {
+    if (pollTimer) return;
+    pollTimer = setInterval(() => {
+        initDashboard();
+        checkNotifications();
+    }, POLL_INTERVAL);
+}
+
+function stopPolling() {
+    if (!pollTimer) return;
+    clearInterval(pollTimer);
+    pollTimer = null;
+}
+
 function loadDashboardStats() {
     const userRole = document.body.dataset.userRole || '';
     let apiEndpoint = '/api/dashboard/stats';
@@ -76,29 +145,51 @@ function updateActivityList(activities) {
     activityList.innerHTML = '';
     
     if (activities.length === 0) {
-        activityList.innerHTML = '<li class="activity-item">No recent activity</li>';
+        activityList.innerHTML = '<li class="activity-item activity-empty">No recent activity</li>';
         return;
     }
     
     // Add activity items
     activities.forEach(activity => {
-        const li = document.createElement('li');
-        li.className = 'activity-item';
-        
-        const time = document.createElement('div');
-        time.className = 'time';
-        time.textContent = formatActivityTime(activity.timestamp);
-        
-        const description = document.createElement('div');
-        description.className = 'description';
-        description.textContent = activity.description;
-        
-        li.appendChild(time);
-        li.appendChild(description);
-        activityList.appendChild(li);
+        activityList.appendChild(createActivityItem(activity));
     });
 }
 
+function addActivityItem(activity) {
+    const activityList = document.querySelector('.activity-list');
+    
+    if (!activityList) return;
+    
+    // Replace the "No recent activity" placeholder
+    const placeholder = activityList.querySelector('.activity-empty');
+    if (placeholder) {
+        placeholder.remove();
+    }
+    
+    activityList.insertBefore(createActivityItem(activity), activityList.firstChild);
+    
+    while (activityList.children.length > MAX_ACTIVITY_ITEMS) {
+        activityList.removeChild(activityList.lastChild);
+    }
+}
+
+function createActivityItem(activity) {
+    const li = document.createElement('li');
+    li.className = 'activity-item';
+    
+    const time = document.createElement('div');
+    time.className = 'time';
+    time.textContent = formatActivityTime(activity.timestamp);
+    
+    const description = document.createElement('div');
+    description.className = 'description';
+    description.textContent = activity.description;
+    
+    li.appendChild(time);
+    li.appendChild(description);
+    return li;
+}
+
 function formatActivityTime(timestamp) {
     const date = new Date(timestamp * 1000);
     const now = new Date();
@@ -140,25 +231,33 @@ function setupSidebarToggle() {
 }
 
 function setupNotifications() {
-    // Check for new notifications periodically
-    setInterval(checkNotifications, 60000); // Check every minute
-    
-    // Initial check
+    // Initial check; later notifications arrive on the event stream
     checkNotifications();
 }
 
 function checkNotifications() {
-    fetch('/api/notifications')
+    let url = '/api/notifications';
+    if (lastNotificationId) {
+        url += `?since=${encodeURIComponent(lastNotificationId)}`;
+    }
+    
+    fetch(url)
         .then(response => response.json())
         .then(data => {
+            if (data.last_id) {
+                lastNotificationId = data.last_id;
+            }
+            
             if (data.notifications && data.notifications.length > 0) {
-                updateNotificationBadge(data.notifications.length);
+                notificationCount = data.notifications.length;
+                updateNotificationBadge(notificationCount);
                 
                 // Show notification for new items
                 if (data.new_notifications > 0) {
                     showNotification(`You have ${data.new_notifications} new notification(s)`, 'info');
                 }
             } else {
+                notificationCount = 0;
                 updateNotificationBadge(0);
             }
         })
@@ -111,8 +111,27 @@ function setupMedicineDispensing() {
             const prescriptionId = event.target.dataset.prescriptionId;
             const medicationId = event.target.dataset.medicationId;
             
+            claimPrescription(prescriptionId, medicationId);
+        }
+    });
+}
+
+function claimPrescription(prescriptionId, medicationId) {
+    // Claim the prescription first so two staff members don't dispense it twice
+    fetch(`/staff/api/queue/${prescriptionId}/claim`, {
+        method: 'POST'
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
             showDispenseForm(prescriptionId, medicationId);
+        } else {
+            showNotification(data.message || 'This prescription is being dispensed by someone else.', 'error');
         }
+    })
+    .catch(error => {
+        console.error('Error claiming prescription:', error);
+        showNotification('Error claiming prescription. Please try again.', 'error');
     });
 }
 
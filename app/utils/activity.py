@@ -0,0 +1,519 @@
+"""
+Buffered activity log writer.
+
+log_activity() only puts the event on an in-memory queue. A background
+thread drains the queue and inserts events into ActivityLog with one
+multi-row INSERT per batch, flushing when a batch is full or the flush
+interval has passed. Batches that cannot be written (the database is
+down, the pool is exhausted, ...) are appended to a bounded JSON lines
+spill file and replayed once writes succeed again. Every worker process
+shares the spill file, so appends and the hand-over to a replay are
+serialized with an flock on a sibling lock file. Events the database
+refuses because of their contents (integrity or data errors) would
+fail again on every replay; they are set aside in a rejected file
+instead. Remaining events are flushed when the process exits.
+
+RecentActivity keeps the newest ActivityLog rows in memory so the first
+page of the dashboard feed is served without touching the database.
+"""
+
+import os
+import glob
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the threads of one process are serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('UserID', 'Role', 'ActivityType', 'Description', 'Timestamp', 'IPAddress')
+
+INSERT_QUERY = f"""
+    INSERT INTO ActivityLog ({', '.join(COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(COLUMNS))})
+"""
+
+# Errors caused by the events themselves; writing them again cannot succeed
+REJECTED_ERRORS = (mysql.connector.IntegrityError, mysql.connector.DataError)
+
+_STOP = object()
+
+class ActivityLogWriter:
+    """
+    Background writer for ActivityLog rows.
+
+    Args:
+        pool (ConnectionPool, optional): Pool the worker borrows connections from
+        flush_size (int): Events per INSERT; a full batch is written immediately
+        flush_interval (float): Seconds a partial batch may wait
+        max_queue (int): Events buffered in memory before new ones are dropped
+        spill_path (str, optional): File for batches that could not be written;
+            refused events go to the same path with a .rejected suffix
+        spill_max_bytes (int): Size limit of the spill and rejected files
+    """
+
+    def __init__(self, pool=None, flush_size=200, flush_interval=1.0, max_queue=10000,
+                 spill_path=None, spill_max_bytes=50 * 1024 * 1024):
+        self.pool = pool
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.spill_path = spill_path
+        self.spill_max_bytes = spill_max_bytes
+        self._listeners = []
+        self._stats = {'queued': 0, 'written': 0, 'spilled': 0, 'replayed': 0, 'dropped': 0, 'rejected': 0,
+                       'failures': 0}
+        self._stats_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._queue = queue.Queue(max_queue)
+
+    def configure(self, pool=None, flush_size=None, flush_interval=None, max_queue=None,
+                  spill_path=None, spill_max_bytes=None):
+        """Change the writer settings; takes effect for the next worker started."""
+        if pool is not None:
+            self.pool = pool
+        if flush_size is not None:
+            self.flush_size = flush_size
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if max_queue is not None and max_queue != self.max_queue:
+            self.max_queue = max_queue
+            if self._thread is None:
+                self._queue = queue.Queue(max_queue)
+        if spill_path is not None:
+            self.spill_path = spill_path
+        if spill_max_bytes is not None:
+            self.spill_max_bytes = spill_max_bytes
+
+    def add_listener(self, listener):
+        """
+        Register a callable notified with every event as it is enqueued.
+
+        Listeners run on the request thread and must not block.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def enqueue(self, event):
+        """
+        Queue an event for writing.
+
+        Args:
+            event (dict): Values keyed by COLUMNS
+
+        Returns:
+            bool: False if the queue was full and the event was dropped
+        """
+        self._ensure_started()
+
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as err:
+                logger.error(f"Activity listener failed: {err}")
+
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._count('dropped')
+            logger.warning("Activity queue full, dropping event")
+            return False
+        self._count('queued')
+        return True
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so every worker process starts its own
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._stats_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self.max_queue)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            self._stats[name] += value
+
+    def _run(self):
+        batch = []
+        deadline = None
+        stopping = False
+
+        try:
+            self._recover_replays()
+        except Exception:
+            logger.exception("Could not recover activity replay files")
+
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                event = self._queue.get(timeout=timeout)
+                if event is _STOP:
+                    stopping = True
+                else:
+                    batch.append(event)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+            except queue.Empty:
+                pass
+
+            # Drain whatever else is already waiting without blocking
+            while len(batch) < self.flush_size and not stopping:
+                try:
+                    event = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    stopping = True
+                else:
+                    batch.append(event)
+
+            if batch and (stopping or len(batch) >= self.flush_size or time.monotonic() >= deadline):
+                try:
+                    self._flush(batch)
+                except Exception:
+                    # Keep the worker alive; losing one batch beats losing every later one
+                    self._count('failures')
+                    logger.exception(f"Unexpected error flushing {len(batch)} activity events")
+                batch = []
+                deadline = None
+
+    def _flush(self, batch):
+        """Write a batch, spilling it to disk on failure."""
+        failed = self._write(batch, 'written')
+        if failed:
+            self._spill(failed)
+        else:
+            self._replay_spill()
+
+    def _write(self, events, outcome):
+        """
+        Insert events, setting aside the ones the database refuses.
+
+        A refused batch is retried one event at a time so a single bad
+        event does not hold back the others.
+
+        Args:
+            events (list): Events to insert
+            outcome (str): Counter incremented with the events written
+
+        Returns:
+            list: Events that could not be written yet and should be spilled
+        """
+        if self.pool is None:
+            return events
+        try:
+            self._insert(events)
+            self._count(outcome, len(events))
+            return []
+        except REJECTED_ERRORS as err:
+            if len(events) == 1:
+                self._reject(events[0], err)
+                return []
+        except Exception as err:
+            self._count('failures')
+            logger.error(f"Error writing {len(events)} activity events: {err}")
+            return events
+
+        for index, event in enumerate(events):
+            if self._write([event], outcome):
+                return events[index:]
+        return []
+
+    def _insert(self, events):
+        connection = self.pool.acquire(timeout=1)
+        try:
+            cursor = connection.cursor()
+            cursor.executemany(INSERT_QUERY, [tuple(event.get(column) for column in COLUMNS) for event in events])
+            connection.commit()
+            cursor.close()
+        except REJECTED_ERRORS:
+            # The connection itself is fine
+            connection.rollback()
+            connection.close()
+            raise
+        except Exception:
+            connection.invalidate()
+            raise
+        connection.close()
+
+    @contextmanager
+    def _spill_files(self):
+        """Hold the spill lock against other threads and other worker processes."""
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(f'{self.spill_path}.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append(self, path, events, outcome):
+        """Append events to a JSON lines file, dropping them if it is full. Call with the spill lock held."""
+        try:
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            lines = ''.join(json.dumps(event, default=str) + '\n' for event in events)
+            if size + len(lines) > self.spill_max_bytes:
+                self._count('dropped', len(events))
+                logger.error(f"{path} is full, dropping {len(events)} activity events")
+                return
+            with open(path, 'a') as spill_file:
+                spill_file.write(lines)
+            self._count(outcome, len(events))
+        except OSError as err:
+            self._count('dropped', len(events))
+            logger.error(f"Could not write activity events to {path}: {err}")
+
+    def _spill(self, batch):
+        """Append a batch to the spill file, dropping it if the file is full."""
+        if not self.spill_path:
+            self._count('dropped', len(batch))
+            return
+        with self._spill_files():
+            self._append(self.spill_path, batch, 'spilled')
+
+    def _reject(self, event, err):
+        """Set aside an event the database refused so it is not retried."""
+        logger.error(f"Activity event rejected by the database: {err}")
+        if not self.spill_path:
+            self._count('rejected')
+            return
+        with self._spill_files():
+            self._append(f'{self.spill_path}.rejected', [event], 'rejected')
+
+    def _replay_path(self, pid):
+        return f'{self.spill_path}.{pid}.replay'
+
+    def _recover_replays(self):
+        """Move replay files left by processes that died mid-replay back into the spill file."""
+        if not self.spill_path:
+            return
+        with self._spill_files():
+            for path in glob.glob(self._replay_path('*')):
+                pid = path[len(self.spill_path) + 1:-len('.replay')]
+                if not pid.isdigit() or (int(pid) != os.getpid() and _process_alive(int(pid))):
+                    continue
+                with open(path) as replay_file, open(self.spill_path, 'a') as spill_file:
+                    spill_file.writelines(replay_file)
+                os.remove(path)
+
+    def _replay_spill(self):
+        """Write spilled events back to the database after a successful flush."""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        # Named per process so two workers replaying at once never share a file
+        replay_path = self._replay_path(os.getpid())
+        with self._spill_files():
+            try:
+                os.replace(self.spill_path, replay_path)
+            except OSError:
+                return
+
+        events = []
+        with open(replay_path) as replay_file:
+            for line in replay_file:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+
+        for start in range(0, len(events), self.flush_size):
+            failed = self._write(events[start:start + self.flush_size], 'replayed')
+            if failed:
+                # Still failing: put the rest back and try again after the next good flush
+                self._spill(failed + events[start + self.flush_size:])
+                break
+
+        os.remove(replay_path)
+
+    def flush(self, timeout=5):
+        """
+        Stop the worker after writing every queued event.
+
+        Args:
+            timeout (float): Seconds to wait for the worker
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        """
+        Get writer statistics.
+
+        Returns:
+            dict: Event counters and the current queue depth
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['pending'] = self._queue.qsize()
+        return stats
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but belongs to another user
+        return True
+    return True
+
+activity_writer = ActivityLogWriter()
+
+atexit.register(activity_writer.flush)
+
+class RecentActivity:
+    """
+    Ring buffer of the newest ActivityLog rows.
+
+    The buffer is refreshed from the tail of the table at most once per
+    refresh interval, so it also picks up events written by other worker
+    processes. Rows are kept oldest first; the oldest fall off once
+    max_entries is reached.
+
+    ActivityIDs are assigned when a row is inserted but become visible
+    when its transaction commits, so a writer in another process can
+    commit a lower ID after a higher one was already read. Each refresh
+    therefore re-reads the last reread_window IDs and merges the rows it
+    has not seen yet in ID order.
+
+    Args:
+        max_entries (int): Rows kept in memory
+        refresh_interval (float): Minimum seconds between refreshes
+        reread_window (int): ActivityIDs before the newest buffered row
+            read again on each refresh
+    """
+
+    def __init__(self, max_entries=1000, refresh_interval=1.0, reread_window=100):
+        self.refresh_interval = refresh_interval
+        self.reread_window = reread_window
+        self._events = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_id = None
+        self._refreshed = 0.0
+        self._complete = False
+
+    def configure(self, max_entries=None, refresh_interval=None, reread_window=None):
+        """Change the buffer size and refresh settings, dropping buffered rows."""
+        if refresh_interval is not None:
+            self.refresh_interval = refresh_interval
+        if reread_window is not None:
+            self.reread_window = reread_window
+        with self._lock:
+            if max_entries is not None and max_entries != self._events.maxlen:
+                self._events = deque(maxlen=max_entries)
+                self._last_id = None
+                self._refreshed = 0.0
+                self._complete = False
+
+    def refresh(self, load_latest, load_since, force=False):
+        """
+        Append rows added since the last refresh.
+
+        Only one thread refreshes at a time; the others keep reading the
+        current contents.
+
+        Args:
+            load_latest (callable): Called with a limit, returns the newest rows
+                newest first
+            load_since (callable): Called with an ActivityID and a limit, returns
+                the rows after it oldest first
+            force (bool): Refresh regardless of the interval
+        """
+        if not force and time.monotonic() - self._refreshed < self.refresh_interval:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            limit = self._events.maxlen
+            rows = None
+            if self._last_id is not None:
+                start = max(0, self._last_id - self.reread_window)
+                rows = load_since(start, limit)
+                if len(rows) >= limit:
+                    # Too far behind to catch up incrementally
+                    rows = None
+
+            with self._lock:
+                if rows is None:
+                    rows = list(reversed(load_latest(limit)))
+                    self._events.clear()
+                    self._complete = len(rows) < limit
+                    self._events.extend(rows)
+                else:
+                    seen = {event['ActivityID'] for event in self._events if event['ActivityID'] > start}
+                    rows = [row for row in rows if row['ActivityID'] not in seen]
+                    if rows and rows[0]['ActivityID'] < self._last_id:
+                        # Committed late, behind rows already buffered
+                        merged = sorted(list(self._events) + rows, key=lambda event: event['ActivityID'])
+                        self._events.clear()
+                        self._events.extend(merged)
+                    else:
+                        self._events.extend(rows)
+                if len(self._events) >= limit:
+                    self._complete = False
+                if rows:
+                    self._last_id = max(self._last_id or 0, rows[-1]['ActivityID'])
+                self._refreshed = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+    def latest(self, predicate, limit):
+        """
+        Get the newest buffered rows matching a predicate.
+
+        Args:
+            predicate (callable): Called with a row, True to include it
+            limit (int): Maximum rows returned
+
+        Returns:
+            tuple: (rows newest first, whether they are exactly what the
+                database would return for the same query)
+        """
+        with self._lock:
+            events = list(self._events)
+            complete = self._complete
+
+        rows = []
+        for event in reversed(events):
+            if predicate(event):
+                rows.append(event)
+                if len(rows) >= limit:
+                    return rows, True
+        return rows, complete
+
+    def clear(self):
+        """Drop every buffered row."""
+        with self._lock:
+            self._events.clear()
+            self._last_id = None
+            self._refreshed = 0.0
+            self._complete = False
+
+recent_activity = RecentActivity()
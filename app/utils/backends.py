@@ -0,0 +1,509 @@
+"""
+Database backends.
+
+The application talks to MySQL through mysql.connector. For running and
+benchmarking it without the campus server, SQLiteBackend provides an
+embedded stand-in: each logical database is a SQLite file (or a shared
+in-memory database) opened in WAL mode, with the other database attached
+under its MySQL schema name so cross-database references such as
+'cs432cims.G12_Doctors' keep working.
+
+SQLite connections are wrapped to look like mysql.connector ones to the
+rest of the code:
+
+- statements are translated from the MySQL dialect the models are written
+  in (placeholders, upserts, FOR UPDATE, INTERVAL arithmetic, CAST types)
+  and the MySQL functions they call (NOW, CURDATE, CONCAT, SHA1) are
+  registered as SQL functions
+- cursor(dictionary=True) returns rows as dicts, cursors are buffered
+  unless buffered=False, and lastrowid after a multi-row INSERT is the
+  first new ID, as with MySQL
+- sqlite3 errors are raised as the equivalent mysql.connector errors, so
+  existing error handling (and is_duplicate_key_error) applies unchanged
+- a transaction is started with BEGIN IMMEDIATE by the first write or
+  locking read, so writers queue on the database lock instead of failing
+  to upgrade a read snapshot; reads outside a transaction see the latest
+  committed data, much like READ COMMITTED
+
+The schema is created on first connect, see app.utils.schema.
+"""
+
+import re
+import os
+import sqlite3
+import hashlib
+import datetime
+import decimal
+import logging
+import threading
+from functools import lru_cache
+
+import mysql.connector
+from mysql.connector import errors, errorcode
+
+logger = logging.getLogger(__name__)
+
+class MySQLBackend:
+    """
+    MySQL server backend.
+
+    Args:
+        config (dict): Application configuration
+    """
+
+    name = 'mysql'
+
+    def __init__(self, config):
+        self.config = config
+        self.connect = mysql.connector.connect
+
+    def connect_args(self, pool_name):
+        """Build mysql.connector arguments for a logical database."""
+        return {
+            'host': self.config['DB_HOST'],
+            'user': self.config['DB_USER'],
+            'password': self.config['DB_PASSWORD'],
+            'database': self.config['CIMS_DB_NAME'] if pool_name == 'cims' else self.config['DB_NAME']
+        }
+
+# Statement rewrites from the MySQL dialect, applied outside string literals
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NAMED_PLACEHOLDERS = re.compile(r'%\((\w+)\)s')
+_INTERVAL = re.compile(
+    r'(\w+\(\)|[\w.]+)\s*([+-])\s*INTERVAL\s+(\?|\d+)\s+(SECOND|MINUTE|HOUR|DAY|MONTH|YEAR)\b', re.I
+)
+_CAST_INTEGER = re.compile(r'\bAS\s+(?:UNSIGNED|SIGNED)(?:\s+INTEGER)?\b', re.I)
+_LOCKING = re.compile(r'\s+FOR\s+UPDATE(?:\s+(?:SKIP\s+LOCKED|NOWAIT))?\b', re.I)
+_ON_DUPLICATE = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.I)
+_VALUES_REFERENCE = re.compile(r'\bVALUES\((\w+)\)', re.I)
+_INSERT_IGNORE = re.compile(r'^(\s*)INSERT\s+IGNORE\b', re.I)
+_EXPLAIN = re.compile(r'^(\s*)EXPLAIN\s+(?!QUERY\s+PLAN\b)', re.I)
+_FIRST_WORD = re.compile(r'^[\s(]*(\w+)')
+
+_WRITES = {'INSERT', 'UPDATE', 'DELETE', 'REPLACE'}
+_DDL = {'CREATE', 'ALTER', 'DROP', 'TRUNCATE'}
+
+@lru_cache(maxsize=2048)
+def translate(query):
+    """
+    Rewrite a MySQL statement for SQLite.
+
+    Args:
+        query (str): Statement using %s or %(name)s placeholders
+
+    Returns:
+        tuple: (SQLite statement, kind) where kind is 'read', 'lock' (a
+            locking read), 'write', 'ddl' or 'other'
+    """
+    parts = []
+    position = 0
+    for match in _STRINGS.finditer(query):
+        parts.append(query[position:match.start()])
+        literal = match.group()
+        if literal.startswith('"'):
+            # Double quotes delimit strings in MySQL but identifiers in SQLite
+            literal = "'" + literal[1:-1].replace('""', '"').replace("'", "''") + "'"
+        parts.append(literal)
+        position = match.end()
+    parts.append(query[position:])
+
+    for index in range(0, len(parts), 2):
+        code = parts[index]
+        code = _NAMED_PLACEHOLDERS.sub(r':\1', code)
+        code = code.replace('%s', '?').replace('%%', '%')
+        code = _INTERVAL.sub(lambda m: f"DATETIME({m.group(1)}, '{m.group(2)}' || {m.group(3)} || ' {m.group(4).lower()}s')", code)
+        code = _CAST_INTEGER.sub('AS INTEGER', code)
+        if _ON_DUPLICATE.search(code):
+            code = _ON_DUPLICATE.sub('ON CONFLICT DO UPDATE SET', code)
+            code = _VALUES_REFERENCE.sub(r'excluded.\1', code)
+        parts[index] = code
+
+    statement = ''.join(parts)
+    locking = bool(_LOCKING.search(statement))
+    statement = _LOCKING.sub('', statement)
+    statement = _INSERT_IGNORE.sub(r'\1INSERT OR IGNORE', statement)
+    statement = _EXPLAIN.sub(r'\1EXPLAIN QUERY PLAN ', statement)
+
+    first = _FIRST_WORD.match(statement)
+    first = first.group(1).upper() if first else ''
+    if first in _WRITES:
+        kind = 'write'
+    elif first in _DDL:
+        kind = 'ddl'
+    elif first in ('SELECT', 'WITH'):
+        kind = 'lock' if locking else 'read'
+    else:
+        kind = 'other'
+    return statement, kind
+
+def _convert_error(err):
+    """Map a sqlite3 error onto the mysql.connector error callers expect."""
+    message = str(err)
+    if isinstance(err, sqlite3.IntegrityError):
+        if 'UNIQUE' in message or 'PRIMARY KEY' in message:
+            return errors.IntegrityError(msg=message, errno=errorcode.ER_DUP_ENTRY)
+        if 'FOREIGN KEY' in message:
+            return errors.IntegrityError(msg=message, errno=errorcode.ER_NO_REFERENCED_ROW_2)
+        return errors.IntegrityError(msg=message, errno=errorcode.ER_BAD_NULL_ERROR)
+    if isinstance(err, sqlite3.OperationalError):
+        if 'locked' in message or 'busy' in message:
+            return errors.DatabaseError(msg=message, errno=errorcode.ER_LOCK_WAIT_TIMEOUT)
+        if 'no such table' in message:
+            return errors.ProgrammingError(msg=message, errno=errorcode.ER_NO_SUCH_TABLE)
+        if 'no such column' in message:
+            return errors.ProgrammingError(msg=message, errno=errorcode.ER_BAD_FIELD_ERROR)
+        if 'syntax error' in message:
+            return errors.ProgrammingError(msg=message, errno=errorcode.ER_PARSE_ERROR)
+        return errors.OperationalError(msg=message)
+    if isinstance(err, sqlite3.ProgrammingError):
+        return errors.ProgrammingError(msg=message)
+    if isinstance(err, sqlite3.DataError):
+        return errors.DataError(msg=message)
+    return errors.DatabaseError(msg=message)
+
+# Python values are stored the way MySQL renders them, so string
+# comparisons against NOW() and CURDATE() order correctly
+def _adapt_datetime(value):
+    return value.isoformat(' ', 'microseconds' if value.microsecond else 'seconds')
+
+def _adapt_timedelta(value):
+    seconds = int(value.total_seconds())
+    return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+def _convert_date(value):
+    try:
+        return datetime.date.fromisoformat(value.decode()[:10])
+    except ValueError:
+        return value.decode()
+
+def _convert_datetime(value):
+    try:
+        return datetime.datetime.fromisoformat(value.decode())
+    except ValueError:
+        return value.decode()
+
+def _convert_time(value):
+    # MySQL returns TIME columns as timedelta
+    try:
+        hours, minutes, *seconds = value.decode().split(':')
+        return datetime.timedelta(hours=int(hours), minutes=int(minutes),
+                                  seconds=float(seconds[0]) if seconds else 0)
+    except ValueError:
+        return value.decode()
+
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+sqlite3.register_adapter(datetime.datetime, _adapt_datetime)
+sqlite3.register_adapter(datetime.time, datetime.time.isoformat)
+sqlite3.register_adapter(datetime.timedelta, _adapt_timedelta)
+sqlite3.register_adapter(decimal.Decimal, str)
+sqlite3.register_converter('DATE', _convert_date)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_datetime)
+sqlite3.register_converter('TIME', _convert_time)
+
+def _now():
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _curdate():
+    return datetime.date.today().isoformat()
+
+def _concat(*values):
+    if any(value is None for value in values):
+        return None
+    return ''.join(value.decode() if isinstance(value, bytes) else str(value) for value in values)
+
+def _sha1(value):
+    if value is None:
+        return None
+    return hashlib.sha1(value if isinstance(value, bytes) else str(value).encode()).hexdigest()
+
+class SQLiteCursor:
+    """
+    mysql.connector style cursor over a SQLite connection.
+
+    Args:
+        connection (SQLiteConnection): Connection the cursor belongs to
+        dictionary (bool): Return rows as dicts
+        buffered (bool): Fetch the whole result set on execute
+    """
+
+    def __init__(self, connection, dictionary=False, buffered=True):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self.dictionary = dictionary
+        self.buffered = buffered
+        self._rows = None
+        self._columns = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return tuple(self._columns or ())
+
+    def _prepare(self, query):
+        if isinstance(query, bytes):
+            query = query.decode()
+        statement, kind = translate(query)
+        self._connection.begin_for(kind)
+        return statement, kind
+
+    def execute(self, query, params=None, *args, **kwargs):
+        statement, kind = self._prepare(query)
+        if isinstance(params, list):
+            params = tuple(params)
+        try:
+            if params is None:
+                self._cursor.execute(statement)
+            else:
+                self._cursor.execute(statement, params)
+        except sqlite3.Error as err:
+            raise _convert_error(err) from err
+
+        self._rows = None
+        self._columns = [column[0] for column in self._cursor.description] if self._cursor.description else None
+        self.lastrowid = self._cursor.lastrowid if kind == 'write' else None
+        if self._columns is not None and self.buffered:
+            self._rows = [self._row(row) for row in self._cursor.fetchall()]
+            self.rowcount = len(self._rows)
+        else:
+            self.rowcount = self._cursor.rowcount
+
+    def executemany(self, query, seq_params, *args, **kwargs):
+        statement, kind = self._prepare(query)
+        seq_params = [tuple(params) if isinstance(params, list) else params for params in seq_params]
+        if not seq_params:
+            self.rowcount = 0
+            return
+        try:
+            self._cursor.executemany(statement, seq_params)
+        except sqlite3.Error as err:
+            raise _convert_error(err) from err
+
+        self._rows = None
+        self._columns = None
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = None
+        if kind == 'write' and statement.lstrip().upper().startswith('INSERT') and self.rowcount > 0:
+            # mysql.connector reports the first ID of a multi-row insert
+            last = self._connection.raw.execute('SELECT last_insert_rowid()').fetchone()[0]
+            self.lastrowid = last - len(seq_params) + 1 if last else None
+
+    def _row(self, row):
+        if self.dictionary:
+            return dict(zip(self._columns, row))
+        return row
+
+    def fetchone(self):
+        if self._rows is not None:
+            return self._rows.pop(0) if self._rows else None
+        if self._columns is None:
+            return None
+        row = self._cursor.fetchone()
+        return self._row(row) if row is not None else None
+
+    def fetchmany(self, size=1):
+        if self._rows is not None:
+            rows, self._rows = self._rows[:size], self._rows[size:]
+            return rows
+        if self._columns is None:
+            return []
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        if self._rows is not None:
+            rows, self._rows = self._rows, []
+            return rows
+        if self._columns is None:
+            return []
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._rows = None
+        self._cursor.close()
+
+class SQLiteConnection:
+    """
+    mysql.connector style connection to a SQLite database.
+
+    Args:
+        raw (sqlite3.Connection): Connection opened by SQLiteBackend
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def begin_for(self, kind):
+        """Start or end the implicit transaction a statement of this kind needs."""
+        if kind in ('write', 'lock') and not self.raw.in_transaction:
+            try:
+                self.raw.execute('BEGIN IMMEDIATE')
+            except sqlite3.Error as err:
+                raise _convert_error(err) from err
+        elif kind == 'ddl' and self.raw.in_transaction:
+            # DDL commits the open transaction in MySQL
+            self.commit()
+
+    def cursor(self, dictionary=False, buffered=True, **kwargs):
+        return SQLiteCursor(self, dictionary=dictionary, buffered=buffered)
+
+    def commit(self):
+        try:
+            if self.raw.in_transaction:
+                self.raw.execute('COMMIT')
+        except sqlite3.Error as err:
+            raise _convert_error(err) from err
+
+    def rollback(self):
+        try:
+            if self.raw.in_transaction:
+                self.raw.execute('ROLLBACK')
+        except sqlite3.Error as err:
+            raise _convert_error(err) from err
+
+    def ping(self, reconnect=False, *args, **kwargs):
+        try:
+            self.raw.execute('SELECT 1').fetchone()
+        except sqlite3.Error as err:
+            raise _convert_error(err) from err
+
+    def is_connected(self):
+        try:
+            self.ping()
+            return True
+        except errors.Error:
+            return False
+
+    def close(self):
+        self.raw.close()
+
+class SQLiteBackend:
+    """
+    Embedded SQLite backend.
+
+    The default database lives at SQLITE_PATH and the CIMS database at
+    SQLITE_CIMS_PATH; ':memory:' keeps a database in memory for as long as
+    the backend exists. Connections of the default pool attach the CIMS
+    database as CIMS_DB_NAME and those of the 'cims' pool attach the
+    default database as DB_NAME.
+
+    Args:
+        config (dict): Application configuration
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, config):
+        self.config = config
+        self.shared_cache = config.get('SQLITE_SHARED_CACHE', False)
+        self.busy_timeout = config.get('SQLITE_BUSY_TIMEOUT', 5000)
+        self.databases = {
+            'default': (config['DB_NAME'], config['SQLITE_PATH']),
+            'cims': (config['CIMS_DB_NAME'], config['SQLITE_CIMS_PATH'])
+        }
+        self._lock = threading.Lock()
+        self._bootstrapped = False
+        self._keepers = []
+
+    def _uri(self, pool_name):
+        """Get the URI a logical database is opened with."""
+        schema, path = self.databases[pool_name]
+        if path == ':memory:':
+            # In-memory databases are only visible to other connections through the shared cache
+            return f'file:{schema}?mode=memory&cache=shared'
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        uri = 'file:' + os.path.abspath(path).replace('?', '%3f').replace('#', '%23')
+        return uri + ('?cache=shared' if self.shared_cache else '')
+
+    def connect_args(self, pool_name):
+        """Build SQLiteBackend.connect arguments for a logical database."""
+        other = 'default' if pool_name == 'cims' else 'cims'
+        return {
+            'database': self._uri(pool_name),
+            'attach': {self.databases[other][0]: self._uri(other)}
+        }
+
+    def _open(self, database, attach=None, **kwargs):
+        raw = sqlite3.connect(database, uri=True, check_same_thread=False, isolation_level=None, **kwargs)
+        raw.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout)}')
+        for schema, uri in (attach or {}).items():
+            raw.execute('ATTACH DATABASE ? AS ' + schema, (uri,))
+        for schema, uri in [('main', database), *(attach or {}).items()]:
+            if 'mode=memory' not in uri:
+                raw.execute(f'PRAGMA {schema}.journal_mode = WAL')
+                raw.execute(f'PRAGMA {schema}.synchronous = NORMAL')
+        return raw
+
+    def connect(self, database, attach=None):
+        """
+        Open a connection, creating the schema first if needed.
+
+        Args:
+            database (str): URI of the main database
+            attach (dict, optional): Schema name -> URI of databases to attach
+
+        Returns:
+            SQLiteConnection: Wrapped connection
+        """
+        try:
+            self._bootstrap()
+            raw = self._open(database, attach, detect_types=sqlite3.PARSE_DECLTYPES)
+            raw.create_function('NOW', 0, _now)
+            raw.create_function('CURDATE', 0, _curdate)
+            raw.create_function('CONCAT', -1, _concat, deterministic=True)
+            raw.create_function('SHA1', 1, _sha1, deterministic=True)
+        except sqlite3.Error as err:
+            raise _convert_error(err) from err
+        return SQLiteConnection(raw)
+
+    def _bootstrap(self):
+        """Create the schema once; in-memory databases are kept open by this connection."""
+        if self._bootstrapped:
+            return
+        with self._lock:
+            if self._bootstrapped:
+                return
+            from app.utils.schema import create_schema
+
+            args = self.connect_args('default')
+            keeper = self._open(args['database'], args['attach'])
+            create_schema(keeper, 'main', self.databases['cims'][0])
+            if 'mode=memory' in args['database'] or any('mode=memory' in uri for uri in args['attach'].values()):
+                self._keepers.append(keeper)
+            else:
+                keeper.close()
+            self._bootstrapped = True
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend
+}
+
+def get_backend(config):
+    """
+    Create the backend selected by DB_BACKEND.
+
+    Args:
+        config (dict): Application configuration
+
+    Returns:
+        MySQLBackend or SQLiteBackend: Backend for the configured database
+
+    Raises:
+        ValueError: If DB_BACKEND names an unknown backend
+    """
+    name = config.get('DB_BACKEND') or 'mysql'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND '{name}'. Valid options are {', '.join(BACKENDS)}")
+    return BACKENDS[name](config)
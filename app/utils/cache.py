@@ -0,0 +1,192 @@
+"""
+In-process caches.
+
+LRUCache is a thread-safe mapping with a per-entry time to live and
+least-recently-used eviction once it holds max_entries items. Every
+cache keeps hit, miss, eviction and memory statistics so it can be sized.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def _approximate_size(value):
+    """Approximate the memory held by a cached key or value."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list, set, frozenset)):
+        size += sum(_approximate_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(_approximate_size(k) + _approximate_size(v) for k, v in value.items())
+    return size
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a time to live.
+
+    Args:
+        name (str): Cache name, used in statistics
+        max_entries (int): Entries kept before the least recently used is evicted
+        ttl (float): Seconds an entry stays valid
+        clock (callable, optional): Monotonic time source
+    """
+
+    def __init__(self, name, max_entries=1024, ttl=30, clock=time.monotonic):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value, size)
+        self._memory = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def configure(self, max_entries=None, ttl=None):
+        """
+        Change the cache limits.
+
+        Args:
+            max_entries (int, optional): New maximum number of entries
+            ttl (float, optional): New time to live in seconds
+        """
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if ttl is not None:
+                self.ttl = ttl
+            self._evict_locked()
+
+    def get(self, key, default=None):
+        """
+        Get a cached value.
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+
+        Returns:
+            The cached value, or default if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self._misses += 1
+                return default
+
+            expires_at, value, _ = entry
+            if expires_at <= self._clock():
+                self._remove_locked(key)
+                self._expirations += 1
+                self._misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Store a value.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        size = _approximate_size(key) + _approximate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = (self._clock() + self.ttl, value, size)
+            self._memory += size
+            self._evict_locked()
+
+    def invalidate(self, key):
+        """
+        Remove a single key.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            bool: True if the key was cached
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove_locked(key)
+            self._invalidations += 1
+            return True
+
+    def invalidate_where(self, predicate):
+        """
+        Remove every key matching a predicate.
+
+        Args:
+            predicate (callable): Called with each key
+
+        Returns:
+            int: Number of keys removed
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove_locked(key)
+            self._invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._memory = 0
+
+    def _remove_locked(self, key):
+        _, _, size = self._entries.pop(key)
+        self._memory -= size
+
+    def _evict_locked(self):
+        while len(self._entries) > self.max_entries:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._memory -= size
+            self._evictions += 1
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Sizes, hit rate and eviction counters
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'name': self.name,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+                'memory_bytes': self._memory
+            }
+
+
+# Schedule and booked slot bitmaps keyed by (doctor_id, 'YYYY-MM-DD')
+availability_cache = LRUCache('availability', max_entries=4096, ttl=30)
+
+# SHA-1 digest of each doctor's image ('' when there is none) keyed by doctor ID
+image_digest_cache = LRUCache('doctor_images', max_entries=1024, ttl=300)
+
+# DashboardCounters values keyed by counter key; short-lived because other workers update them
+counter_cache = LRUCache('dashboard_counters', max_entries=8192, ttl=5)
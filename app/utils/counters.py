@@ -0,0 +1,375 @@
+"""
+Materialized dashboard counters.
+
+DashboardCounters holds one row per counter, keyed by a string such as
+'doctor:12:pending_appointments' or 'staff:dispensed:2026-01-31'. Model
+writes add deltas to the counters they affect in the same transaction
+as the source rows, so dashboards read a handful of primary keys instead
+of aggregating Appointments, Prescription and MedicinesGiven. Values
+read are mirrored in counter_cache for a few seconds; the keys a write
+touched are dropped from the mirror once it commits.
+
+Counters of distinct values (patients a doctor has seen, students served
+by the pharmacy) are derived from pair counters: when a pair counter
+moves between zero and non-zero the derived counter changes by one.
+
+The staff counters are global, so every prescription and dispense would
+queue on the same rows' locks until its transaction commits. Each is
+stored as SHARDS rows ('<key>', '<key>#1', ...); a write adds to one of
+them picked at random and readers sum them.
+
+reconcile() recomputes every counter from the source tables, reports
+drift and optionally corrects it; run it periodically with
+`flask --app run reconcile-counters`.
+"""
+
+import re
+import random
+import logging
+import datetime
+
+from app.utils.cache import counter_cache
+from app.utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+# Per-day counters are kept for this many past days
+RECENT_DAYS = 7
+
+# Pair counter pattern -> derived distinct counter
+_DISTINCT = [
+    (re.compile(r'^doctor:([^:]+):completed:[^:]+$'), 'doctor:{0}:patients_seen'),
+    (re.compile(r'^student:[^:]+:prescriptions$'), 'staff:students_served')
+]
+
+_DAY_KEY = re.compile(r':(\d{4}-\d{2}-\d{2})$')
+
+# Rows each global counter is spread over
+SHARDS = 8
+
+def _sharded(key):
+    return key.startswith('staff:')
+
+def _rows_of(key):
+    """Get the DashboardCounters rows that make up a counter."""
+    if not _sharded(key):
+        return [key]
+    return [key] + [f'{key}#{shard}' for shard in range(1, SHARDS)]
+
+def _counter_of(row_key):
+    return row_key.partition('#')[0]
+
+def _day(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+def merge(*deltas):
+    """Sum several delta dicts, dropping counters whose changes cancel out."""
+    merged = {}
+    for delta in deltas:
+        for key, value in delta.items():
+            merged[key] = merged.get(key, 0) + value
+    return {key: value for key, value in merged.items() if value}
+
+def appointment_deltas(appointment, sign=1):
+    """
+    Get the counter changes of adding (sign=1) or removing (sign=-1) an appointment.
+
+    Args:
+        appointment (dict): Row with DoctorID, StudentID, AppointmentDate and Status
+        sign (int): 1 or -1
+    """
+    doctor_id, student_id = appointment['DoctorID'], appointment['StudentID']
+    deltas = {
+        f"doctor:{doctor_id}:appointments:{_day(appointment['AppointmentDate'])}": sign,
+        f'student:{student_id}:appointments': sign
+    }
+    if appointment['Status'] == 'Scheduled':
+        deltas[f'doctor:{doctor_id}:pending_appointments'] = sign
+        deltas[f'student:{student_id}:upcoming_appointments'] = sign
+    elif appointment['Status'] == 'Completed':
+        deltas[f'doctor:{doctor_id}:completed:{student_id}'] = sign
+    return deltas
+
+def prescription_deltas(prescription, sign=1, pending=True):
+    """
+    Get the counter changes of adding or removing a prescription.
+
+    Args:
+        prescription (dict): Row with DoctorID and StudentID
+        sign (int): 1 or -1
+        pending (bool): Whether the prescription has not been dispensed
+    """
+    student_id = prescription['StudentID']
+    deltas = {
+        f"doctor:{prescription['DoctorID']}:prescriptions": sign,
+        f'student:{student_id}:prescriptions': sign
+    }
+    if pending:
+        deltas['staff:pending_prescriptions'] = sign
+        deltas[f'student:{student_id}:pending_prescriptions'] = sign
+    return deltas
+
+def dispense_deltas(student_id, date_given, sign=1, changes_pending=False):
+    """
+    Get the counter changes of recording or deleting a dispense.
+
+    Args:
+        student_id: Student the prescription belongs to
+        date_given: Dispense date
+        sign (int): 1 or -1
+        changes_pending (bool): Whether this was the prescription's first
+            dispense (or, when deleting, its last)
+    """
+    deltas = {f'staff:dispensed:{_day(date_given)}': sign}
+    if changes_pending:
+        deltas['staff:pending_prescriptions'] = -sign
+        deltas[f'student:{student_id}:pending_prescriptions'] = -sign
+    return deltas
+
+def _upsert(cursor, deltas):
+    shard = random.randrange(SHARDS)
+    rows = [(f'{key}#{shard}' if shard and _sharded(key) else key, value) for key, value in deltas.items()]
+    # Rows are locked in key order, so two writers cannot deadlock on them
+    cursor.executemany(
+        "INSERT INTO DashboardCounters (CounterKey, Value) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE Value = Value + VALUES(Value)",
+        sorted(rows)
+    )
+
+def _read(cursor, keys):
+    row_keys = [row_key for key in keys for row_key in _rows_of(key)]
+    placeholders = ', '.join(['%s'] * len(row_keys))
+    cursor.execute(
+        f"SELECT CounterKey, Value FROM DashboardCounters WHERE CounterKey IN ({placeholders})",
+        tuple(row_keys)
+    )
+    values = {}
+    for row in cursor.fetchall():
+        key = _counter_of(row['CounterKey'])
+        values[key] = values.get(key, 0) + int(row['Value'])
+    return values
+
+def _derived_key(key):
+    for pattern, template in _DISTINCT:
+        match = pattern.match(key)
+        if match:
+            return template.format(*match.groups())
+    return None
+
+def apply(cursor, deltas):
+    """
+    Add deltas to the counters inside the caller's transaction.
+
+    Args:
+        cursor: Dictionary cursor of the connection making the source write
+        deltas (dict): Counter key -> change
+
+    Returns:
+        set: Keys changed, to pass to invalidate() after the commit
+    """
+    deltas = {key: value for key, value in deltas.items() if value}
+    if not deltas:
+        return set()
+    _upsert(cursor, deltas)
+
+    # Pair counters that crossed zero move their distinct counter
+    distinct = {key: _derived_key(key) for key in deltas}
+    distinct = {key: target for key, target in distinct.items() if target}
+    derived = {}
+    if distinct:
+        values = _read(cursor, distinct)
+        for key, target in distinct.items():
+            after = values.get(key, 0)
+            before = after - deltas[key]
+            if before <= 0 < after:
+                derived[target] = derived.get(target, 0) + 1
+            elif after <= 0 < before:
+                derived[target] = derived.get(target, 0) - 1
+        derived = {key: value for key, value in derived.items() if value}
+        if derived:
+            _upsert(cursor, derived)
+
+    return set(deltas) | set(derived)
+
+def invalidate(keys):
+    """Drop committed counters from the in-process mirror."""
+    for key in keys:
+        counter_cache.invalidate(key)
+
+def get_many(keys):
+    """
+    Read counters, from the mirror where possible.
+
+    Args:
+        keys (list): Counter keys
+
+    Returns:
+        dict: Key -> value; counters without a row are 0
+    """
+    values = {}
+    missing = []
+    for key in keys:
+        value = counter_cache.get(key)
+        if value is None:
+            missing.append(key)
+        else:
+            values[key] = value
+
+    if missing:
+        cursor = get_db().cursor(dictionary=True)
+        stored = _read(cursor, missing)
+        cursor.close()
+        for key in missing:
+            values[key] = stored.get(key, 0)
+            counter_cache.set(key, values[key])
+
+    return values
+
+def compute_all(cursor, today=None, days=RECENT_DAYS):
+    """
+    Recompute every counter from the source tables.
+
+    Args:
+        cursor: Dictionary cursor
+        today (str, optional): 'YYYY-MM-DD'; per-day counters are computed
+            from days before it onwards
+        days (int): Past days of per-day counters
+
+    Returns:
+        dict: Counter key -> value, without zero counters
+    """
+    today = datetime.date.fromisoformat(today) if today else datetime.date.today()
+    since = (today - datetime.timedelta(days=days)).isoformat()
+    counters = {}
+
+    def add(query, params, key):
+        cursor.execute(query, params)
+        for row in cursor.fetchall():
+            counters[key(row)] = counters.get(key(row), 0) + int(row['n'])
+
+    add("SELECT DoctorID, AppointmentDate, COUNT(*) AS n FROM Appointments "
+        "WHERE AppointmentDate >= %s GROUP BY DoctorID, AppointmentDate", (since,),
+        lambda row: f"doctor:{row['DoctorID']}:appointments:{_day(row['AppointmentDate'])}")
+    add("SELECT StudentID, COUNT(*) AS n FROM Appointments GROUP BY StudentID", (),
+        lambda row: f"student:{row['StudentID']}:appointments")
+    add("SELECT DoctorID, COUNT(*) AS n FROM Appointments WHERE Status = 'Scheduled' GROUP BY DoctorID", (),
+        lambda row: f"doctor:{row['DoctorID']}:pending_appointments")
+    add("SELECT StudentID, COUNT(*) AS n FROM Appointments WHERE Status = 'Scheduled' GROUP BY StudentID", (),
+        lambda row: f"student:{row['StudentID']}:upcoming_appointments")
+    add("SELECT DoctorID, StudentID, COUNT(*) AS n FROM Appointments WHERE Status = 'Completed' "
+        "GROUP BY DoctorID, StudentID", (),
+        lambda row: f"doctor:{row['DoctorID']}:completed:{row['StudentID']}")
+    add("SELECT DoctorID, COUNT(*) AS n FROM Prescription GROUP BY DoctorID", (),
+        lambda row: f"doctor:{row['DoctorID']}:prescriptions")
+    add("SELECT StudentID, COUNT(*) AS n FROM Prescription GROUP BY StudentID", (),
+        lambda row: f"student:{row['StudentID']}:prescriptions")
+    add("SELECT StudentID, COUNT(*) AS n FROM Prescription WHERE DispenseStatus = 'Pending' GROUP BY StudentID", (),
+        lambda row: f"student:{row['StudentID']}:pending_prescriptions")
+    add("SELECT DateGiven, COUNT(*) AS n FROM MedicinesGiven WHERE DateGiven >= %s GROUP BY DateGiven", (since,),
+        lambda row: f"staff:dispensed:{_day(row['DateGiven'])}")
+
+    # Totals and distinct counters follow from the per-user counters
+    for key, value in list(counters.items()):
+        if key.endswith(':pending_prescriptions'):
+            counters['staff:pending_prescriptions'] = counters.get('staff:pending_prescriptions', 0) + value
+        target = _derived_key(key)
+        if target and value > 0:
+            counters[target] = counters.get(target, 0) + 1
+
+    return counters
+
+def reconcile(fix=False, today=None, days=RECENT_DAYS):
+    """
+    Compare the stored counters with the source tables.
+
+    Writes committed between the recount and the correction can make a
+    fix slightly off again; the next run reports and repairs that.
+
+    Args:
+        fix (bool): Overwrite drifted counters and delete expired per-day ones
+        today (str, optional): 'YYYY-MM-DD', defaults to the current date
+        days (int): Past days of per-day counters to keep
+
+    Returns:
+        dict: checked (counters compared), drift (list of (key, stored,
+            actual)) and expired (per-day counters older than the window)
+    """
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+
+    actual = compute_all(cursor, today, days)
+    cursor.execute("SELECT CounterKey, Value FROM DashboardCounters")
+    stored = {}
+    for row in cursor.fetchall():
+        key = _counter_of(row['CounterKey'])
+        stored[key] = stored.get(key, 0) + int(row['Value'])
+
+    since = ((datetime.date.fromisoformat(today) if today else datetime.date.today())
+             - datetime.timedelta(days=days)).isoformat()
+    expired = [key for key in stored if _DAY_KEY.search(key) and _DAY_KEY.search(key).group(1) < since]
+
+    drift = []
+    for key in sorted(set(stored) | set(actual)):
+        if key in expired:
+            continue
+        if stored.get(key, 0) != actual.get(key, 0):
+            drift.append((key, stored.get(key, 0), actual.get(key, 0)))
+
+    if fix and (drift or expired):
+        corrections = [(key, value) for key, _, value in drift if value]
+        if corrections:
+            cursor.executemany(
+                "INSERT INTO DashboardCounters (CounterKey, Value) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE Value = VALUES(Value)",
+                corrections
+            )
+        # A corrected counter keeps its whole value in its first row
+        removed = [(row_key,) for key, _, value in drift for row_key in _rows_of(key)[0 if not value else 1:]]
+        removed += [(row_key,) for key in expired for row_key in _rows_of(key)]
+        if removed:
+            cursor.executemany("DELETE FROM DashboardCounters WHERE CounterKey = %s", removed)
+        db.commit()
+        counter_cache.clear()
+
+    cursor.close()
+    for key, stored_value, actual_value in drift:
+        logger.warning(f"Counter drift {key}: stored {stored_value}, actual {actual_value}")
+
+    return {'checked': len(set(stored) | set(actual)) - len(expired), 'drift': drift, 'expired': expired}
+
+def rebuild(today=None, days=RECENT_DAYS, batch_size=5000):
+    """
+    Replace every counter with its value recomputed from the source tables.
+
+    Meant for bulk loads, where nearly every counter would show up as
+    drift in reconcile(). Writes made while it runs may be lost; run
+    reconcile() afterwards if the application was live.
+
+    Args:
+        today (str, optional): 'YYYY-MM-DD', defaults to the current date
+        days (int): Past days of per-day counters to keep
+        batch_size (int): Counters per INSERT
+
+    Returns:
+        int: Number of counters written
+    """
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    try:
+        rows = list(compute_all(cursor, today, days).items())
+        cursor.execute("DELETE FROM DashboardCounters")
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(
+                "INSERT INTO DashboardCounters (CounterKey, Value) VALUES (%s, %s)",
+                rows[start:start + batch_size]
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    counter_cache.clear()
+    return len(rows)
@@ -1,42 +1,84 @@
 import mysql.connector
+from mysql.connector import errorcode
 from flask import current_app, g
 import logging
 
+from app.utils.pool import ConnectionPool
+from app.utils.backends import get_backend
+from app.utils.instrumentation import request_totals
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+POOL_NAMES = ('default', 'cims')
+
+def _pool_key(db_name):
+    """Map a db_name argument onto the logical pool name."""
+    return 'cims' if db_name == 'cims' else 'default'
+
+def init_db(app):
+    """
+    Create the connection pools for the application.
+    
+    Connections are opened lazily, so the application can start even
+    while the database server is unreachable. DB_BACKEND selects the
+    MySQL server or the embedded SQLite backend (see app.utils.backends).
+    
+    Args:
+        app: Flask application instance
+    """
+    backend = get_backend(app.config)
+    pools = {}
+    for pool_name in POOL_NAMES:
+        pools[pool_name] = ConnectionPool(
+            pool_name,
+            backend.connect_args(pool_name),
+            min_size=app.config['DB_POOL_MIN_SIZE'],
+            max_size=app.config['DB_POOL_MAX_SIZE'],
+            max_idle=app.config['DB_POOL_MAX_IDLE'],
+            timeout=app.config['DB_POOL_TIMEOUT'],
+            ping_interval=app.config['DB_POOL_PING_INTERVAL'],
+            connect=backend.connect
+        )
+    app.extensions['db_backend'] = backend
+    app.extensions['db_pools'] = pools
+
+def get_pool(db_name=None):
+    """
+    Get the connection pool for a database.
+    
+    Args:
+        db_name (str, optional): 'cims' or None for the default database
+    
+    Returns:
+        ConnectionPool: Pool registered by init_db
+    """
+    return current_app.extensions['db_pools'][_pool_key(db_name)]
+
+def get_pool_stats():
+    """
+    Get statistics for all connection pools of the current application.
+    
+    Returns:
+        dict: Pool name mapped to its statistics
+    """
+    pools = current_app.extensions.get('db_pools', {})
+    return {name: pool.stats() for name, pool in pools.items()}
+
 def get_db_connection(db_name=None):
     """
-    Get a database connection.
+    Get a database connection from the pool.
     
     Args:
         db_name (str, optional): Database name to connect to.
             If None, connects to the default database.
     
     Returns:
-        mysql.connector.connection: Database connection object
+        PooledConnection: Database connection; close() returns it to the pool
     """
     try:
-        # Use the database name if provided, otherwise use default
-        if db_name == 'cims':
-            db_config = {
-                'host': current_app.config['DB_HOST'],
-                'user': current_app.config['DB_USER'],
-                'password': current_app.config['DB_PASSWORD'],
-                'database': current_app.config['CIMS_DB_NAME']
-            }
-        else:
-            db_config = {
-                'host': current_app.config['DB_HOST'],
-                'user': current_app.config['DB_USER'],
-                'password': current_app.config['DB_PASSWORD'],
-                'database': current_app.config['DB_NAME']
-            }
-        
-        # Create a new connection
-        connection = mysql.connector.connect(**db_config)
-        return connection
+        return get_pool(db_name).acquire()
     
     except mysql.connector.Error as err:
         logger.error(f"Database connection error: {err}")
@@ -55,24 +97,303 @@ def close_db_connection(connection):
         except mysql.connector.Error as err:
             logger.error(f"Error closing database connection: {err}")
 
-def execute_query(query, params=None, fetch=False, db_name=None):
+class RequestCursor:
+    """
+    Cursor handed out by a RequestConnection.
+    
+    Results are buffered so several cursors can be used on the shared
+    connection one after another. close() parks the cursor for reuse.
+    """
+    
+    def __init__(self, owner, cursor, dictionary, reusable=True):
+        self._owner = owner
+        self._cursor = cursor
+        self.dictionary = dictionary
+        self.reusable = reusable
+    
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+    
+    def __iter__(self):
+        return iter(self._cursor)
+    
+    def execute(self, query, params=None, *args, **kwargs):
+        try:
+            return self._cursor.execute(query, params, *args, **kwargs)
+        except Exception:
+            self._owner.failed = True
+            raise
+    
+    def executemany(self, query, seq_params, *args, **kwargs):
+        try:
+            return self._cursor.executemany(query, seq_params, *args, **kwargs)
+        except Exception:
+            self._owner.failed = True
+            raise
+    
+    def close(self):
+        self._owner.park_cursor(self)
+
+class RequestConnection:
+    """
+    Connection shared by all models for the lifetime of an app context.
+    
+    close() is a no-op; the underlying pooled connection is committed or
+    rolled back and released by RequestDatabase.teardown(). A statement
+    that failed since the last commit or rollback marks the transaction
+    as failed, so teardown rolls it back even when the model swallowed
+    the error.
+    """
+    
+    def __init__(self, context, connection):
+        self.context = context
+        self._connection = connection
+        self._free_cursors = {True: [], False: []}
+        self._cursors = []
+        self.failed = False
+    
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+    
+    def commit(self):
+        self._connection.commit()
+        self.failed = False
+    
+    def rollback(self):
+        self._connection.rollback()
+        self.failed = False
+    
+    def cursor(self, dictionary=False, **kwargs):
+        """
+        Get a buffered cursor, reusing a closed one when possible.
+        
+        Args:
+            dictionary (bool): Whether rows are returned as dictionaries
+        
+        Returns:
+            RequestCursor: Cursor on the shared connection
+        """
+        dictionary = bool(dictionary)
+        reusable = not kwargs
+        if reusable and self._free_cursors[dictionary]:
+            return self._free_cursors[dictionary].pop()
+        
+        kwargs.setdefault('buffered', True)
+        cursor = RequestCursor(self, self._connection.cursor(dictionary=dictionary, **kwargs),
+                               dictionary, reusable)
+        self._cursors.append(cursor)
+        return cursor
+    
+    def park_cursor(self, cursor):
+        """Make a closed cursor available for reuse."""
+        free = self._free_cursors[cursor.dictionary]
+        if cursor.reusable and cursor not in free:
+            free.append(cursor)
+    
+    def close(self):
+        """Connections are released at the end of the app context."""
+    
+    def release(self, exception=None):
+        """
+        Finish the transaction and return the connection to the pool.
+        
+        The transaction is committed unless the request raised or a
+        statement failed after the last commit or rollback.
+        
+        Args:
+            exception (Exception, optional): Error that ended the request
+        """
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        
+        for cursor in self._cursors:
+            try:
+                cursor._cursor.close()
+            except Exception:
+                pass
+        self._cursors = []
+        self._free_cursors = {True: [], False: []}
+        
+        try:
+            if exception is None and not self.failed:
+                connection.commit()
+            else:
+                if exception is None:
+                    logger.warning("Rolling back a request transaction left open after a failed statement")
+                connection.rollback()
+        except mysql.connector.Error as err:
+            logger.error(f"Error finishing request transaction: {err}")
+            connection.invalidate()
+            return
+        
+        connection.close()
+
+class RequestDatabase:
+    """Lazily opened connections for one app context."""
+    
+    def __init__(self):
+        self.connections = {}
+    
+    def connection(self, db_name=None):
+        """
+        Get the shared connection for a database, opening it on first use.
+        
+        Args:
+            db_name (str, optional): 'cims' or None for the default database
+        
+        Returns:
+            RequestConnection: Connection shared within the app context
+        """
+        key = _pool_key(db_name)
+        if key not in self.connections:
+            self.connections[key] = RequestConnection(self, get_db_connection(db_name))
+        return self.connections[key]
+    
+    def teardown(self, exception=None):
+        """
+        Commit (or roll back on error) and release every connection.
+        
+        Args:
+            exception (Exception, optional): Error that ended the request
+        """
+        connections, self.connections = self.connections, {}
+        for connection in connections.values():
+            connection.release(exception)
+
+def get_db(db_name=None):
     """
-    Execute a SQL query.
+    Get the database connection shared by the current request.
+    
+    The connection is opened on first use and released when the app
+    context is torn down, so callers should not close it.
+    
+    Args:
+        db_name (str, optional): Database name to connect to.
+            If None, connects to the default database.
+    
+    Returns:
+        RequestConnection: Database connection for this request
+    """
+    if '_database' not in g:
+        g._database = RequestDatabase()
+    return g._database.connection(db_name)
+
+def close_request_db(exception=None):
+    """
+    Release the connections opened for the current app context.
+    
+    Args:
+        exception (Exception, optional): Error that ended the request
+    """
+    database = g.pop('_database', None)
+    if database is not None:
+        database.teardown(exception)
+
+def get_query_count():
+    """
+    Get the number of queries run in the current app context.
+    
+    Returns:
+        int: Number of executed statements
+    """
+    return request_totals()['count']
+
+def is_duplicate_key_error(err):
+    """
+    Check whether an error was caused by a unique constraint violation.
+    
+    Args:
+        err (Exception): Error raised by the database driver
+    
+    Returns:
+        bool: True for duplicate key errors
+    """
+    return isinstance(err, mysql.connector.IntegrityError) and err.errno == errorcode.ER_DUP_ENTRY
+
+# Rows fetched per round trip while streaming
+STREAM_BATCH_SIZE = 1000
+
+def stream_query(query, params=None, db_name=None, chunk_size=None):
+    """
+    Run a SELECT and yield its rows without loading the result set into memory.
+    
+    The query runs on an unbuffered cursor over a dedicated pooled
+    connection, so the request's shared connection stays usable while the
+    rows are consumed. The connection goes back to the pool once every row
+    has been read; if the consumer stops early (break, exception or close())
+    the unread result set cannot be skipped cheaply, so the connection is
+    discarded instead.
+    
+    Args:
+        query (str): SELECT statement
+        params (tuple, optional): Parameters for the query
+        db_name (str, optional): Database name to connect to
+        chunk_size (int, optional): Yield lists of this many rows instead
+            of single rows
+    
+    Yields:
+        dict or list: Rows as dictionaries, or lists of rows if chunk_size is set
+    """
+    batch_size = chunk_size or STREAM_BATCH_SIZE
+    connection = get_db_connection(db_name)
+    cursor = None
+    finished = False
+    try:
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        cursor.execute(query, params)
+        
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if chunk_size:
+                yield rows
+            else:
+                yield from rows
+        
+        finished = True
+    
+    except mysql.connector.Error as err:
+        logger.error(f"Streaming query error: {err}")
+        raise
+    
+    finally:
+        if finished:
+            try:
+                cursor.close()
+                connection.rollback()
+                connection.close()
+            except mysql.connector.Error:
+                connection.invalidate()
+        else:
+            connection.invalidate()
+
+def execute_query(query, params=None, fetch=False, db_name=None, stream=False, chunk_size=None):
+    """
+    Execute a SQL query on the request's shared connection.
     
     Args:
         query (str): SQL query to execute
         params (tuple, optional): Parameters for the query
         fetch (bool): Whether to fetch results
         db_name (str, optional): Database name to connect to
+        stream (bool): Return a generator over the rows instead of a list
+            (see stream_query)
+        chunk_size (int, optional): With stream, yield lists of this many rows
     
     Returns:
+        If stream is True, returns a generator of rows.
         If fetch is True, returns query results.
         If fetch is False, returns affected row count.
     """
+    if stream:
+        return stream_query(query, params, db_name, chunk_size)
+    
     connection = None
     cursor = None
     try:
-        connection = get_db_connection(db_name)
+        connection = get_db(db_name)
         cursor = connection.cursor(dictionary=True)
         
         cursor.execute(query, params)
@@ -93,5 +414,3 @@ def execute_query(query, params=None, fetch=False, db_name=None):
     finally:
         if cursor:
             cursor.close()
-        if connection:
-            close_db_connection(connection)
@@ -0,0 +1,472 @@
+"""
+Synthetic dataset generator for scale testing.
+
+Appends a reproducible dataset to the configured database (MySQL or the
+SQLite backend): the same seed and sizes always produce the same rows.
+The data is skewed the way real traffic is:
+
+- doctor popularity and student visit frequency follow Zipf distributions,
+  so a few doctors are booked solid while most have free slots
+- appointments cluster in late-morning and late-afternoon slots, fewer on
+  Saturdays, none on Sundays, and spike in the weeks after each semester
+  starts
+- prescriptions come from completed appointments and favour common
+  medications; most of them are dispensed within a day or two
+
+Rows are generated day by day with explicit IDs following the current
+maximum of each table and written with multi-row INSERTs in batches, one
+commit per batch. Dashboard counters and student timelines are rebuilt
+at the end.
+"""
+
+import math
+import time
+import random
+import logging
+import datetime
+from array import array
+
+from app.utils import counters, slots, timeline
+from app.utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Doctors see patients Monday to Saturday in two sessions
+SESSIONS = (('09:00:00', '13:00:00'), ('14:00:00', '18:00:00'))
+WORKDAYS = slots.WEEKDAYS[:6]
+SLOT_TIMES = [
+    slots.SLOT_TIMES[index]
+    for start, end in SESSIONS
+    for index in range(slots.slot_index(start), slots.slot_index(end))
+]
+
+# Relative demand by hour of the day
+APPOINTMENT_HOUR_WEIGHTS = {9: 1.0, 10: 2.0, 11: 2.0, 12: 1.2, 14: 0.8, 15: 1.2, 16: 1.6, 17: 1.0}
+ACTIVITY_HOUR_WEIGHTS = [0.1] * 7 + [0.5, 1.0, 1.5, 2.0, 2.0, 1.5, 1.0, 1.2, 1.5, 1.8, 1.5, 1.0, 1.2, 1.2, 0.8, 0.4, 0.2]
+
+# Semesters start in early January and late July; demand is TERM_SPIKE times
+# higher on the first day and decays over the following weeks
+TERM_STARTS = ((1, 2), (7, 25))
+TERM_SPIKE = 2.0
+TERM_DECAY_DAYS = 10
+
+# Bookings per day are capped at this share of the day's slots
+MAX_DAILY_OCCUPANCY = 0.9
+
+FIRST_NAMES = {
+    'Male': ('Aarav', 'Vivaan', 'Aditya', 'Arjun', 'Rohan', 'Karan', 'Ishaan', 'Dhruv', 'Kabir', 'Yash'),
+    'Female': ('Ananya', 'Diya', 'Isha', 'Meera', 'Priya', 'Riya', 'Saanvi', 'Kavya', 'Nisha', 'Tara')
+}
+LAST_NAMES = ('Patel', 'Shah', 'Sharma', 'Gupta', 'Iyer', 'Reddy', 'Nair', 'Das', 'Joshi', 'Mehta', 'Singh', 'Rao')
+SPECIALIZATIONS = ('General Medicine', 'Pediatrics', 'Dermatology', 'Orthopedics', 'Psychiatry', 'ENT', 'Ophthalmology')
+STAFF_ROLES = ('Pharmacist', 'Nurse', 'Receptionist', 'Lab Technician')
+DOSAGE_FORMS = ('Tablet', 'Capsule', 'Syrup', 'Ointment', 'Injection', 'Drops')
+INSTRUCTIONS = ('Once daily after food', 'Twice daily after food', 'Three times daily', 'At bedtime', 'As needed')
+
+ACTIVITY_ROLES = (('student', 0.7), ('doctor', 0.2), ('staff', 0.1))
+ACTIVITY_TYPES = {
+    'student': (('login', 'Logged in'), ('book_appointment', 'Booked an appointment'),
+                ('cancel_appointment', 'Cancelled an appointment')),
+    'doctor': (('login', 'Logged in'), ('update_appointment', 'Updated an appointment'),
+               ('add_prescription', 'Added a prescription')),
+    'staff': (('login', 'Logged in'), ('dispense_medicine', 'Dispensed medication'),
+              ('update_stock', 'Updated medication stock'))
+}
+
+def zipf_cum_weights(count, skew):
+    """
+    Get cumulative Zipf weights for random.choices.
+
+    Args:
+        count (int): Number of ranks
+        skew (float): Exponent; 0 is uniform, larger values favour the top ranks
+
+    Returns:
+        list: Cumulative weights of ranks 1..count
+    """
+    total = 0.0
+    weights = []
+    for rank in range(1, count + 1):
+        total += rank ** -skew
+        weights.append(total)
+    return weights
+
+def _cumulate(weights):
+    total = 0.0
+    cumulative = []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+class BulkWriter:
+    """
+    Buffer rows for one table and insert them in batches.
+
+    Args:
+        table (str): Table name
+        columns (tuple): Column names
+        batch_size (int): Rows per INSERT and commit
+        db_name (str, optional): 'cims' or None for the default database
+        stats (dict, optional): Rows written are counted under the table name
+    """
+
+    def __init__(self, table, columns, batch_size=DEFAULT_BATCH_SIZE, db_name=None, stats=None):
+        self.table = table
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.stats = stats if stats is not None else {}
+        self.query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        self.rows = []
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows."""
+        if not self.rows:
+            return
+        db = get_db(self.db_name)
+        cursor = db.cursor()
+        try:
+            cursor.executemany(self.query, self.rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
+        self.stats[self.table] = self.stats.get(self.table, 0) + len(self.rows)
+        self.rows = []
+
+class DatasetGenerator:
+    """
+    Generate a synthetic dataset.
+
+    Must run inside an application context.
+
+    Args:
+        students (int): Students to create
+        doctors (int): Doctors to create in G12_Doctors
+        staff (int): Staff members to create
+        medications (int): Medications to create
+        appointments (int): Appointments to create; fewer are written if the
+            doctors' slots in the date range cannot hold them
+        prescriptions (int): Prescriptions to create from completed appointments
+        activity (int): ActivityLog events to create
+        days (int): Length of the date range, ending two weeks after today
+        seed (int): Random seed
+        batch_size (int): Rows per INSERT and commit
+        doctor_skew (float): Zipf exponent of doctor popularity
+        student_skew (float): Zipf exponent of student visit frequency
+        today (datetime.date, optional): Date treated as today
+    """
+
+    def __init__(self, students=50000, doctors=200, staff=50, medications=300, appointments=2000000,
+                 prescriptions=1000000, activity=500000, days=730, seed=42, batch_size=DEFAULT_BATCH_SIZE,
+                 doctor_skew=0.8, student_skew=0.5, today=None):
+        self.sizes = {
+            'students': students, 'doctors': doctors, 'staff': staff, 'medications': medications,
+            'appointments': appointments, 'prescriptions': prescriptions, 'activity': activity
+        }
+        self.seed = seed
+        self.batch_size = batch_size
+        self.doctor_skew = doctor_skew
+        self.student_skew = student_skew
+        self.today = today or datetime.date.today()
+        self.end = self.today + datetime.timedelta(days=14)
+        self.start = self.end - datetime.timedelta(days=days)
+        self.rng = random.Random(seed)
+        self.stats = {}
+        self.ids = {}
+        self._slot_weights = _cumulate(
+            APPOINTMENT_HOUR_WEIGHTS[int(slot_time[:2])] for slot_time in SLOT_TIMES
+        )
+        self._hour_weights = _cumulate(ACTIVITY_HOUR_WEIGHTS)
+
+    def writer(self, table, columns, db_name=None):
+        return BulkWriter(table, columns, self.batch_size, db_name, self.stats)
+
+    def _next_id(self, table, column, db_name=None):
+        cursor = get_db(db_name).cursor(dictionary=True)
+        cursor.execute(f"SELECT COALESCE(MAX({column}), 0) AS LastID FROM {table}")
+        last_id = int(cursor.fetchone()['LastID'])
+        cursor.close()
+        return last_id + 1
+
+    def _id_range(self, name, table, column, db_name=None):
+        first = self._next_id(table, column, db_name)
+        self.ids[name] = range(first, first + self.sizes[name])
+        return self.ids[name]
+
+    def run(self):
+        """
+        Generate and write the dataset.
+
+        Returns:
+            dict: Rows written per table and elapsed seconds
+        """
+        started = time.perf_counter()
+        self.generate_people()
+        self.generate_medications()
+        completed = self.generate_appointments()
+        self.generate_prescriptions(completed)
+        self.generate_activity()
+
+        logger.info("Rebuilding dashboard counters")
+        self.stats['DashboardCounters'] = counters.rebuild(today=self.today.isoformat(), batch_size=self.batch_size)
+        logger.info("Rebuilding student timelines")
+        self.stats['StudentTimeline'] = timeline.rebuild()['events']
+
+        self.stats['elapsed'] = round(time.perf_counter() - started, 3)
+        return dict(self.stats)
+
+    def generate_people(self):
+        """Write students, doctors with their weekly schedules, and staff."""
+        rng = self.rng
+
+        students = self.writer('Students', ('StudentID', 'FirstName', 'LastName', 'Gender', 'DateOfBirth',
+                                            'Email', 'ContactNumber', 'Address'))
+        for student_id in self._id_range('students', 'Students', 'StudentID'):
+            gender = rng.choice(('Male', 'Female'))
+            date_of_birth = datetime.date(1998 + rng.randrange(10), rng.randrange(1, 13), rng.randrange(1, 29))
+            students.add((
+                student_id, rng.choice(FIRST_NAMES[gender]), rng.choice(LAST_NAMES), gender,
+                date_of_birth.isoformat(), f'student{student_id}@datagen.iitgn.ac.in',
+                f'9{rng.randrange(10 ** 9):09d}', f'Hostel {rng.choice("ABCDEFGHIJK")}, IIT Gandhinagar'
+            ))
+        students.flush()
+        logger.info(f"Wrote {self.stats.get('Students', 0)} students")
+
+        doctors = self.writer('G12_Doctors', ('DoctorID', 'Name', 'Specialization', 'Email', 'ContactNumber'), 'cims')
+        availability = self.writer('DoctorAvailability', ('DoctorID', 'DayOfWeek', 'StartTime', 'EndTime'))
+        for doctor_id in self._id_range('doctors', 'G12_Doctors', 'DoctorID', 'cims'):
+            doctors.add((
+                doctor_id, f'Dr. {rng.choice(FIRST_NAMES[rng.choice(("Male", "Female"))])} {rng.choice(LAST_NAMES)}',
+                rng.choice(SPECIALIZATIONS), f'doctor{doctor_id}@datagen.iitgn.ac.in', f'9{rng.randrange(10 ** 9):09d}'
+            ))
+            for day in WORKDAYS:
+                for start, end in SESSIONS:
+                    availability.add((doctor_id, day, start, end))
+        doctors.flush()
+        availability.flush()
+
+        staff = self.writer('Staff', ('StaffID', 'FirstName', 'LastName', 'Role', 'Email', 'ContactNumber'))
+        for staff_id in self._id_range('staff', 'Staff', 'StaffID'):
+            staff.add((
+                staff_id, rng.choice(FIRST_NAMES[rng.choice(('Male', 'Female'))]), rng.choice(LAST_NAMES),
+                rng.choice(STAFF_ROLES), f'staff{staff_id}@datagen.iitgn.ac.in', f'9{rng.randrange(10 ** 9):09d}'
+            ))
+        staff.flush()
+
+        # Popularity ranks are shuffled so the busiest doctors and students are spread over the ID range
+        self._doctor_ranks = list(self.ids['doctors'])
+        rng.shuffle(self._doctor_ranks)
+        self._doctor_weights = zipf_cum_weights(len(self._doctor_ranks), self.doctor_skew)
+        self._student_ranks = list(self.ids['students'])
+        rng.shuffle(self._student_ranks)
+        self._student_weights = zipf_cum_weights(len(self._student_ranks), self.student_skew)
+
+    def generate_medications(self):
+        """Write medications with plenty of stock."""
+        rng = self.rng
+        medications = self.writer('Medications', ('MedicationID', 'Name', 'DosageForm', 'QuantityInStock', 'ExpiryDate'))
+        for medication_id in self._id_range('medications', 'Medications', 'MedicationID'):
+            medications.add((
+                medication_id, f'Medication {medication_id}', rng.choice(DOSAGE_FORMS),
+                rng.randrange(500, 5000), (self.end + datetime.timedelta(days=rng.randrange(90, 1000))).isoformat()
+            ))
+        medications.flush()
+        self._medication_weights = zipf_cum_weights(len(self.ids['medications']), 1.0)
+
+    def day_weight(self, day):
+        """Get the relative appointment demand of a date."""
+        weekday = day.weekday()
+        if weekday == 6:
+            return 0.0
+        weight = 0.5 if weekday == 5 else 1.0
+
+        since = min(
+            (day - datetime.date(year, month, term_day)).days
+            for year in (day.year - 1, day.year)
+            for month, term_day in TERM_STARTS
+            if datetime.date(year, month, term_day) <= day
+        )
+        return weight * (1 + TERM_SPIKE * math.exp(-since / TERM_DECAY_DAYS))
+
+    def _days(self):
+        day = self.start
+        while day < self.end:
+            yield day
+            day += datetime.timedelta(days=1)
+
+    def _daily_counts(self, total, weight, days):
+        """Spread a total over days in proportion to their weights."""
+        days = list(days)
+        weights = [weight(day) for day in days]
+        scale = total / (sum(weights) or 1)
+        carry = 0.0
+        for day, day_weight in zip(days, weights):
+            carry += day_weight * scale
+            count = int(carry)
+            carry -= count
+            yield day, count
+
+    def generate_appointments(self):
+        """
+        Write appointments day by day.
+
+        Returns:
+            tuple: Arrays of the ID, doctor, student and date ordinal of every
+                completed appointment
+        """
+        rng = self.rng
+        completed = (array('q'), array('q'), array('q'), array('q'))
+        appointments = self.writer('Appointments', ('AppointmentID', 'StudentID', 'DoctorID', 'AppointmentDate',
+                                                    'AppointmentTime', 'Status'))
+        next_id = self._next_id('Appointments', 'AppointmentID')
+        capacity = int(len(self._doctor_ranks) * len(SLOT_TIMES) * MAX_DAILY_OCCUPANCY)
+        backlog = 0
+
+        for day, count in self._daily_counts(self.sizes['appointments'], self.day_weight, self._days()):
+            if count == 0:
+                continue
+            # Demand above the cap spills over into the following days
+            count += backlog
+            backlog = max(0, count - capacity)
+            count -= backlog
+
+            taken = set()
+            full = set()
+            date = day.isoformat()
+            past = day < self.today
+            students = rng.choices(self._student_ranks, cum_weights=self._student_weights, k=count)
+            for doctor_id, student_id in zip(
+                rng.choices(self._doctor_ranks, cum_weights=self._doctor_weights, k=count), students
+            ):
+                slot_time = None
+                while slot_time is None:
+                    while doctor_id in full:
+                        doctor_id = rng.choices(self._doctor_ranks, cum_weights=self._doctor_weights)[0]
+                    slot_time = self._free_slot(doctor_id, taken)
+                    if slot_time is None:
+                        full.add(doctor_id)
+                taken.add((doctor_id, slot_time))
+
+                draw = rng.random()
+                if past:
+                    status = 'Completed' if draw < 0.85 else 'Cancelled' if draw < 0.97 else 'Scheduled'
+                else:
+                    status = 'Scheduled' if draw < 0.9 else 'Cancelled'
+
+                appointments.add((next_id, student_id, doctor_id, date, slot_time, status))
+                if status == 'Completed':
+                    for values, value in zip(completed, (next_id, doctor_id, student_id, day.toordinal())):
+                        values.append(value)
+                next_id += 1
+
+        appointments.flush()
+        if backlog:
+            logger.warning(f"{backlog} appointments did not fit into the doctors' slots")
+        logger.info(f"Wrote {self.stats.get('Appointments', 0)} appointments")
+        return completed
+
+    def _free_slot(self, doctor_id, taken):
+        """Pick a free slot of a doctor, favouring peak hours, or None if the day is full."""
+        for slot_time in self.rng.choices(SLOT_TIMES, cum_weights=self._slot_weights, k=8):
+            if (doctor_id, slot_time) not in taken:
+                return slot_time
+        free = [slot_time for slot_time in SLOT_TIMES if (doctor_id, slot_time) not in taken]
+        return self.rng.choice(free) if free else None
+
+    def generate_prescriptions(self, completed):
+        """Write prescriptions for completed appointments and the medicines given for them."""
+        rng = self.rng
+        appointment_ids, doctor_ids, student_ids, ordinals = completed
+        if not appointment_ids:
+            return
+
+        total = self.sizes['prescriptions']
+        if total <= len(appointment_ids):
+            picks = sorted(rng.sample(range(len(appointment_ids)), total))
+        else:
+            picks = sorted(rng.choices(range(len(appointment_ids)), k=total))
+
+        prescriptions = self.writer('Prescription', ('PrescriptionID', 'AppointmentID', 'DoctorID', 'StudentID',
+                                                     'MedicationID', 'PrescriptionDate', 'Quantity', 'Instructions',
+                                                     'DispenseStatus'))
+        given = self.writer('MedicinesGiven', ('MedicineGivenID', 'PrescriptionID', 'MedicationID', 'DateGiven',
+                                               'QuantityGiven'))
+        prescription_id = self._next_id('Prescription', 'PrescriptionID')
+        given_id = self._next_id('MedicinesGiven', 'MedicineGivenID')
+        medication_ids = list(self.ids['medications'])
+        today = self.today.toordinal()
+
+        for index, medication_id in zip(
+            picks, rng.choices(medication_ids, cum_weights=self._medication_weights, k=len(picks))
+        ):
+            ordinal = ordinals[index]
+            quantity = rng.randrange(1, 21)
+            # Recent prescriptions are still waiting at the pharmacy more often
+            dispensed = rng.random() < (0.97 if today - ordinal > 3 else 0.5)
+
+            prescriptions.add((
+                prescription_id, appointment_ids[index], doctor_ids[index], student_ids[index], medication_id,
+                datetime.date.fromordinal(ordinal).isoformat(), quantity, rng.choice(INSTRUCTIONS),
+                'Dispensed' if dispensed else 'Pending'
+            ))
+            if dispensed:
+                date_given = min(ordinal + rng.choices((0, 1, 2), weights=(80, 15, 5))[0], today)
+                given.add((given_id, prescription_id, medication_id,
+                           datetime.date.fromordinal(date_given).isoformat(), quantity))
+                given_id += 1
+            prescription_id += 1
+
+        prescriptions.flush()
+        given.flush()
+        logger.info(f"Wrote {self.stats.get('Prescription', 0)} prescriptions "
+                    f"and {self.stats.get('MedicinesGiven', 0)} dispenses")
+
+    def generate_activity(self):
+        """Write ActivityLog history up to now, oldest first."""
+        rng = self.rng
+        activity = self.writer('ActivityLog', ('UserID', 'Role', 'ActivityType', 'Description', 'Timestamp',
+                                               'IPAddress'))
+        roles = [role for role, _ in ACTIVITY_ROLES]
+        role_weights = _cumulate(weight for _, weight in ACTIVITY_ROLES)
+        staff_ids = list(self.ids['staff']) or [None]
+        now = datetime.datetime.now()
+
+        # Users are active on Sundays too, just less
+        def weight(day):
+            return self.day_weight(day) or 0.3
+
+        days = (day for day in self._days() if day <= self.today)
+        for day, count in self._daily_counts(self.sizes['activity'], weight, days):
+            hours = rng.choices(range(24), cum_weights=self._hour_weights, k=count)
+            moments = sorted(
+                datetime.datetime(day.year, day.month, day.day, hour, rng.randrange(60), rng.randrange(60))
+                for hour in hours
+            )
+            for moment in moments:
+                if moment > now:
+                    break
+                role = rng.choices(roles, cum_weights=role_weights)[0]
+                if role == 'student':
+                    user_id = rng.choices(self._student_ranks, cum_weights=self._student_weights)[0]
+                elif role == 'doctor':
+                    user_id = rng.choices(self._doctor_ranks, cum_weights=self._doctor_weights)[0]
+                else:
+                    user_id = rng.choice(staff_ids)
+                activity_type, description = rng.choice(ACTIVITY_TYPES[role])
+                activity.add((
+                    str(user_id), role, activity_type, description, moment,
+                    f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}'
+                ))
+
+        activity.flush()
+        logger.info(f"Wrote {self.stats.get('ActivityLog', 0)} activity events")
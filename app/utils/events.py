@@ -0,0 +1,332 @@
+"""
+Server-Sent Events push channel.
+
+Dashboards open one EventSource per tab on /api/events/stream and receive
+'stats', 'activity' and 'notification' events instead of polling. The
+EventBroker fans events out in process: every event is addressed to a
+role, optionally narrowed to one user of that role, and is delivered to
+the matching subscribers of this worker.
+
+Events carry ids of the form '<worker token>-<sequence>'. A reconnecting
+client sends the last id it saw in the Last-Event-ID header; if it was
+issued by this worker and is still in the replay history, the missed
+events are replayed, otherwise the client is sent a 'reset' event and
+reloads its dashboard data once.
+
+The broker does not cross process boundaries: an event only reaches the
+streams held by the worker process that handled the write. Live updates
+are therefore complete with a single (threaded) worker process only.
+Under several workers a stream misses the events published elsewhere
+and the dashboard catches up from its next poll or reset, which read
+the database: counters, the activity feed and stored notifications.
+The push is a latency shortcut, never the record.
+
+Dashboard counters are pushed after the response has been sent, so a
+write request does not wait for the stats queries of every dashboard
+it touched.
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+from collections import deque
+
+from flask import has_request_context, session, g, current_app, after_this_request
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """
+    One connected event stream.
+
+    Args:
+        role (str): Role of the connected user
+        user_id: ID of the connected user
+        max_pending (int): Events buffered for a slow client before the
+            stream is closed and the client has to reconnect
+    """
+
+    def __init__(self, role, user_id, max_pending=100):
+        self.role = role
+        self.user_id = str(user_id)
+        self.events = queue.Queue(max_pending)
+        self.overflowed = False
+
+    def matches(self, role, user_id):
+        """Check whether an event addressed to role/user_id is for this subscriber."""
+        return role == self.role and (user_id is None or str(user_id) == self.user_id)
+
+    def put(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """
+        Wait for the next event.
+
+        Returns:
+            tuple: (id, event, data), or None if nothing arrived in time
+        """
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class EventBroker:
+    """
+    In-process publish/subscribe hub for dashboard events.
+
+    Args:
+        max_connections (int): Streams this worker keeps open at once
+        history (int): Events kept for Last-Event-ID replay
+    """
+
+    def __init__(self, max_connections=50, history=500):
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._history = deque(maxlen=history)
+        self._token = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._pid = os.getpid()
+
+    def configure(self, max_connections=None, history=None):
+        """Change the connection limit and replay history size."""
+        with self._lock:
+            if max_connections is not None:
+                self.max_connections = max_connections
+            if history is not None and history != self._history.maxlen:
+                self._history = deque(self._history, maxlen=history)
+
+    def _check_pid(self):
+        # Subscribers belong to the parent process after a fork
+        if self._pid != os.getpid():
+            self._subscribers = []
+            self._history.clear()
+            self._token = uuid.uuid4().hex[:8]
+            self._pid = os.getpid()
+
+    def subscribe(self, role, user_id, last_event_id=None):
+        """
+        Register a stream.
+
+        Args:
+            role (str): Role of the connected user
+            user_id: ID of the connected user
+            last_event_id (str, optional): Last-Event-ID sent by a reconnecting client
+
+        Returns:
+            Subscription: The new subscription with missed events already
+                queued, or None if the connection limit is reached
+        """
+        subscription = Subscription(role, user_id)
+        with self._lock:
+            self._check_pid()
+            if len(self._subscribers) >= self.max_connections:
+                return None
+            self._subscribers.append(subscription)
+
+            if last_event_id:
+                missed = self._since(last_event_id)
+                if missed is None:
+                    subscription.put((self.last_id(), 'reset', {}))
+                else:
+                    for event_id, event, data, event_role, event_user in missed:
+                        if subscription.matches(event_role, event_user):
+                            subscription.put((event_id, event, data))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a stream."""
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def last_id(self):
+        """Get the id of the newest event published by this worker."""
+        return f'{self._token}-{self._sequence}'
+
+    def _since(self, last_event_id):
+        """Get the history after an event id, or None if it cannot be replayed."""
+        token, _, sequence = last_event_id.partition('-')
+        if token != self._token or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        if sequence > self._sequence:
+            return None
+        oldest = self._sequence - len(self._history)
+        if sequence < oldest:
+            return None
+        return list(self._history)[sequence - oldest:]
+
+    def has_subscribers(self, role, user_id=None):
+        """Check whether any stream would receive an event addressed to role/user_id."""
+        with self._lock:
+            self._check_pid()
+            return any(subscription.matches(role, user_id) for subscription in self._subscribers)
+
+    def publish(self, event, data, role, user_id=None):
+        """
+        Send an event to every matching stream of this worker.
+
+        Args:
+            event (str): Event name
+            data (dict): JSON-serializable payload
+            role (str): Role the event is addressed to
+            user_id (optional): Narrow the event to one user of the role
+
+        Returns:
+            str: Event id
+        """
+        with self._lock:
+            self._check_pid()
+            self._sequence += 1
+            event_id = self.last_id()
+            self._history.append((event_id, event, data, role, user_id))
+            for subscription in self._subscribers:
+                if subscription.matches(role, user_id):
+                    subscription.put((event_id, event, data))
+        return event_id
+
+    def stats(self):
+        """
+        Get broker statistics.
+
+        Returns:
+            dict: Open connections, the connection limit and events published
+        """
+        with self._lock:
+            return {
+                'connections': len(self._subscribers),
+                'max_connections': self.max_connections,
+                'published': self._sequence
+            }
+
+broker = EventBroker()
+
+def format_event(event_id, event, data):
+    """Serialize an event in the text/event-stream format."""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def stream(subscription, heartbeat=15, max_duration=300, retry=3000):
+    """
+    Generate the body of an event stream.
+
+    A comment line is sent every heartbeat seconds so proxies keep the
+    connection open and dead clients are noticed. After max_duration the
+    stream ends and the browser reconnects with its Last-Event-ID, which
+    frees the worker thread and spreads clients over workers.
+
+    Args:
+        subscription (Subscription): Stream registered with the broker
+        heartbeat (float): Seconds between keep-alive comments
+        max_duration (float): Seconds before the stream is closed
+        retry (int): Reconnect delay suggested to the client in milliseconds
+
+    Yields:
+        str: Event stream chunks
+    """
+    deadline = time.monotonic() + max_duration
+    try:
+        yield f"retry: {retry}\n\n"
+        while not subscription.overflowed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            item = subscription.get(min(heartbeat, remaining))
+            if item is None:
+                yield ": keepalive\n\n"
+            else:
+                yield format_event(*item)
+    finally:
+        broker.unsubscribe(subscription)
+
+def _is_current_user(role, user_id):
+    return (has_request_context() and session.get('role') == role
+            and str(session.get('user_id')) == str(user_id))
+
+def notify(role, user_id, message):
+    """
+    Store a notification for a user, or for every user of a role, and push it.
+
+    Users are not notified about their own actions.
+
+    Args:
+        role (str): Recipient role
+        user_id (optional): Recipient; None addresses the whole role
+        message (str): Notification text
+    """
+    if user_id is not None and _is_current_user(role, user_id):
+        return
+    from app.models.notifications import Notification
+    notification_id = None
+    try:
+        notification_id = Notification.create(role, user_id, message)
+    except Exception as err:
+        logger.error(f"Error storing notification: {err}")
+    broker.publish('notification', {
+        'id': notification_id,
+        'message': message,
+        'timestamp': int(time.time())
+    }, role, user_id)
+
+def push_stats(role, user_id=None):
+    """
+    Send fresh dashboard counters to a dashboard, if anyone has it open.
+
+    During a request the push is queued and runs once the response has
+    been sent; repeated pushes to the same dashboard are sent once.
+
+    Args:
+        role (str): Dashboard role
+        user_id (optional): Doctor or student whose counters changed; None
+            for the shared staff dashboard
+    """
+    if not has_request_context():
+        _publish_stats(role, user_id)
+        return
+
+    pending = g.get('pending_stats')
+    if pending is None:
+        pending = g.pending_stats = []
+        app = current_app._get_current_object()
+
+        @after_this_request
+        def defer_stats(response):
+            response.call_on_close(lambda: _publish_pending_stats(app, pending))
+            return response
+
+    if (role, user_id) not in pending:
+        pending.append((role, user_id))
+
+def _publish_pending_stats(app, pending):
+    # The request context is gone once the response is closed
+    with app.app_context():
+        for role, user_id in pending:
+            _publish_stats(role, user_id)
+
+def _publish_stats(role, user_id):
+    if not broker.has_subscribers(role, user_id):
+        return
+    from app.models.stats import DashboardStats
+    try:
+        broker.publish('stats', DashboardStats.get_for_role(role, user_id), role, user_id)
+    except Exception as err:
+        logger.error(f"Error pushing dashboard stats: {err}")
+
+def publish_activity(event):
+    """Activity log listener that pushes new activity to the user's feed."""
+    if not event.get('Role'):
+        return
+    broker.publish('activity', {
+        'id': None,
+        'type': event['ActivityType'],
+        'description': event['Description'],
+        'timestamp': int(time.time())
+    }, event['Role'], event['UserID'])
@@ -118,6 +118,10 @@ def log_activity(activity_type, description, user_id=None):
     """
     Log user activity.
     
+    The event is queued for the background activity log writer, so the
+    request only pays for an enqueue; the user, IP address and timestamp
+    are captured here while the request is still available.
+    
     Args:
         activity_type (str): Type of activity
         description (str): Activity description
@@ -128,18 +132,16 @@ def log_activity(activity_type, description, user_id=None):
             user_id = session['user_id']
         
         if user_id:
-            from app.utils.database import execute_query
-            
-            query = """
-                INSERT INTO ActivityLog (UserID, ActivityType, Description, Timestamp, IPAddress)
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            
-            timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            ip_address = request.remote_addr
+            from app.utils.activity import activity_writer
             
-            execute_query(query, (user_id, activity_type, description, timestamp, ip_address))
-            logger.info(f"Activity logged: {activity_type} by {user_id}")
+            activity_writer.enqueue({
+                'UserID': user_id,
+                'Role': session.get('role'),
+                'ActivityType': activity_type,
+                'Description': description,
+                'Timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'IPAddress': request.remote_addr
+            })
     except Exception as e:
         logger.error(f"Error logging activity: {e}")
 
@@ -234,63 +236,6 @@ def validate_time_format(time_str):
     except ValueError:
         return False
 
-def get_pagination_params(request):
-    """
-    Get pagination parameters from request.
-    
-    Args:
-        request: Flask request object
-    
-    Returns:
-        tuple: (page, per_page)
-    """
-    try:
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
-        
-        # Ensure valid values
-        page = max(1, page)
-        per_page = max(1, min(100, per_page))  # Limit per_page between 1 and 100
-        
-        return page, per_page
-    except (ValueError, TypeError):
-        return 1, 10
-
-def paginate_results(items, page, per_page):
-    """
-    Paginate a list of items.
-    
-    Args:
-        items (list): List of items to paginate
-        page (int): Page number
-        per_page (int): Items per page
-    
-    Returns:
-        dict: Pagination information and items for the current page
-    """
-    total_items = len(items)
-    total_pages = (total_items + per_page - 1) // per_page  # Ceiling division
-    
-    # Ensure page is within valid range
-    page = min(max(1, page), total_pages) if total_pages > 0 else 1
-    
-    # Calculate start and end indices
-    start_idx = (page - 1) * per_page
-    end_idx = min(start_idx + per_page, total_items)
-    
-    # Get items for the current page
-    current_items = items[start_idx:end_idx] if total_items > 0 else []
-    
-    return {
-        'items': current_items,
-        'page': page,
-        'per_page': per_page,
-        'total_items': total_items,
-        'total_pages': total_pages,
-        'has_prev': page > 1,
-        'has_next': page < total_pages
-    }
-
 def generate_random_password(length=10):
     """
     Generate a random password.
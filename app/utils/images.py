@@ -0,0 +1,113 @@
+"""
+On-disk cache of doctor images.
+
+Images are stored in the database as BLOBs. The image route serves them
+from files named after the image digest, so each size is generated once
+and can be revalidated with a strong ETag without touching the BLOB.
+Resizing needs Pillow (listed in requirements.txt). Without it the
+original bytes are served for every size, and create_app logs a warning
+at startup so the missing dependency does not go unnoticed.
+"""
+
+import io
+import os
+import logging
+import tempfile
+
+try:
+    from PIL import Image
+except ImportError:  # reported by create_app
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels per named size; None keeps the original image
+IMAGE_SIZES = {
+    'thumb': 160,
+    'medium': 480,
+    'full': None
+}
+
+def sniff_mimetype(data):
+    """
+    Guess an image MIME type from its first bytes.
+
+    Args:
+        data (bytes): Image data
+
+    Returns:
+        str: MIME type, defaulting to JPEG
+    """
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+def resize_image(data, size):
+    """
+    Shrink an image so its longest edge fits a named size.
+
+    Args:
+        data (bytes): Original image data
+        size (str): Key of IMAGE_SIZES
+
+    Returns:
+        bytes: Resized JPEG, or the original data if no resizing is needed
+            or possible
+    """
+    max_edge = IMAGE_SIZES.get(size)
+    if max_edge is None or Image is None:
+        return data
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if max(image.size) <= max_edge:
+                return data
+            image.thumbnail((max_edge, max_edge))
+            output = io.BytesIO()
+            image.convert('RGB').save(output, format='JPEG', quality=85, optimize=True)
+            return output.getvalue()
+    except Exception as e:
+        logger.warning(f"Could not resize image: {e}")
+        return data
+
+def cached_image_path(folder, doctor_id, digest, size):
+    """
+    Get the cache file for one size of a doctor image.
+
+    Args:
+        folder (str): Image cache folder
+        doctor_id (int): Doctor ID
+        digest (str): Hex digest of the original image
+        size (str): Key of IMAGE_SIZES
+
+    Returns:
+        str: File path
+    """
+    return os.path.join(folder, f'doctor-{int(doctor_id)}-{digest}-{size}')
+
+def store_image(path, data, size):
+    """
+    Resize an image and write it to the cache atomically.
+
+    Args:
+        path (str): Destination from cached_image_path
+        data (bytes): Original image data
+        size (str): Key of IMAGE_SIZES
+    """
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+
+    # Write to a temporary file first so concurrent requests never see a partial image
+    handle, temp_path = tempfile.mkstemp(dir=folder)
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(resize_image(data, size))
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
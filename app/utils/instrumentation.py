@@ -0,0 +1,310 @@
+"""
+Query instrumentation.
+
+Every cursor handed out by a pooled connection is wrapped in an
+InstrumentedCursor, which covers the request-scoped models, crud and the
+CLI alike. Each statement is recorded with its fingerprint (the statement
+with literals replaced by '?'), duration, row count and calling endpoint:
+
+- per app context totals, reported in the X-DB-Query-Count and
+  X-DB-Query-Time response headers
+- process-wide totals per fingerprint, see QueryRecorder.stats()
+- a JSON lines slow query log for statements above a threshold, with
+  the EXPLAIN plan of the first slow occurrence of each fingerprint
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from functools import lru_cache
+
+from flask import g, has_app_context, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+_COMMENTS = re.compile(r'/\*.*?\*/|--[^\n]*|#[^\n]*', re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBERS = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%\(\w+\)s|%s|\?')
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_VALUES = re.compile(r'(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+', re.I)
+_SPACES = re.compile(r'\s+')
+
+@lru_cache(maxsize=2048)
+def fingerprint(query):
+    """
+    Normalize a statement so executions with different values group together.
+
+    Args:
+        query (str): SQL statement
+
+    Returns:
+        str: Statement with comments removed, literals and placeholders
+            replaced by '?', value lists collapsed and whitespace squeezed
+    """
+    if isinstance(query, bytes):
+        query = query.decode(errors='replace')
+    query = _STRINGS.sub('?', query)
+    query = _COMMENTS.sub(' ', query)
+    query = _NUMBERS.sub('?', query)
+    query = _PLACEHOLDERS.sub('?', query)
+    query = _LISTS.sub('(...)', query)
+    query = _VALUES.sub(r'\1', query)
+    return _SPACES.sub(' ', query).strip()
+
+def current_endpoint():
+    """Get the endpoint of the current request, or 'cli' outside requests."""
+    if has_request_context():
+        return request.endpoint or request.path
+    return 'cli'
+
+class QueryRecorder:
+    """
+    Collects query statistics for the process.
+
+    Args:
+        slow_threshold (float): Seconds above which a statement is slow
+        slow_log_path (str, optional): JSON lines file for slow statements
+        explain (bool): Attach EXPLAIN output to the first slow occurrence
+            of each SELECT fingerprint
+        max_fingerprints (int): Fingerprints tracked in stats(); new ones
+            beyond the limit are counted under '(other)'
+    """
+
+    def __init__(self, slow_threshold=0.2, slow_log_path=None, explain=True, max_fingerprints=500):
+        self.slow_threshold = slow_threshold
+        self.explain = explain
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._explained = set()
+        self._slow_logger = logging.getLogger('slow_queries')
+        self._slow_logger.propagate = False
+        self._slow_handler = None
+        self.set_slow_log(slow_log_path)
+
+    def configure(self, slow_threshold=None, slow_log_path=None, explain=None):
+        """
+        Change the recorder settings.
+
+        Args:
+            slow_threshold (float, optional): Slow statement threshold in seconds
+            slow_log_path (str, optional): Slow query log file
+            explain (bool, optional): Whether to EXPLAIN slow statements
+        """
+        if slow_threshold is not None:
+            self.slow_threshold = slow_threshold
+        if explain is not None:
+            self.explain = explain
+        if slow_log_path is not None:
+            self.set_slow_log(slow_log_path)
+
+    def set_slow_log(self, path):
+        """Send slow statements to a file, replacing the previous one."""
+        if self._slow_handler is not None:
+            self._slow_logger.removeHandler(self._slow_handler)
+            self._slow_handler.close()
+            self._slow_handler = None
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._slow_handler = logging.FileHandler(path)
+            self._slow_handler.setFormatter(logging.Formatter('%(message)s'))
+            self._slow_logger.addHandler(self._slow_handler)
+            self._slow_logger.setLevel(logging.INFO)
+
+    def record(self, query, params, duration, rows, database=None, error=None, explain=None):
+        """
+        Record one executed statement.
+
+        Args:
+            query (str): SQL statement
+            params: Statement parameters, only used for EXPLAIN
+            duration (float): Seconds spent executing
+            rows (int): Rows returned or affected (-1 if unknown)
+            database (str, optional): Logical database name
+            error (Exception, optional): Error raised by the statement
+            explain (callable, optional): Called with (query, params) to get
+                the plan of a slow SELECT
+        """
+        key = fingerprint(query)
+        endpoint = current_endpoint()
+        rows = rows if rows is not None and rows >= 0 else 0
+
+        if has_app_context():
+            totals = g.get('_query_totals')
+            if totals is None:
+                totals = g._query_totals = {'count': 0, 'time': 0.0, 'rows': 0, 'slow': 0}
+            totals['count'] += 1
+            totals['time'] += duration
+            totals['rows'] += rows
+
+        slow = duration >= self.slow_threshold
+        first_slow = False
+        with self._lock:
+            if key not in self._stats and len(self._stats) >= self.max_fingerprints:
+                key_stats = self._stats.setdefault('(other)', self._new_stats())
+            else:
+                key_stats = self._stats.setdefault(key, self._new_stats())
+            key_stats['count'] += 1
+            key_stats['time'] += duration
+            key_stats['max_time'] = max(key_stats['max_time'], duration)
+            key_stats['rows'] += rows
+            key_stats['endpoints'][endpoint] = key_stats['endpoints'].get(endpoint, 0) + 1
+            if error is not None:
+                key_stats['errors'] += 1
+            if slow:
+                key_stats['slow'] += 1
+                first_slow = key not in self._explained
+                self._explained.add(key)
+
+        if not slow:
+            return
+
+        if has_app_context():
+            g._query_totals['slow'] += 1
+
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'fingerprint': key,
+            'duration_ms': round(duration * 1000, 3),
+            'rows': rows,
+            'endpoint': endpoint,
+            'database': database
+        }
+        if error is not None:
+            entry['error'] = str(error)
+        if (first_slow and self.explain and explain is not None and error is None
+                and key.lstrip('( ').upper().startswith('SELECT')):
+            entry['explain'] = explain(query, params)
+
+        logger.warning(f"Slow query ({entry['duration_ms']} ms, {endpoint}): {key}")
+        if self._slow_handler is not None:
+            self._slow_logger.info(json.dumps(entry, default=str))
+
+    @staticmethod
+    def _new_stats():
+        return {'count': 0, 'time': 0.0, 'max_time': 0.0, 'rows': 0, 'slow': 0, 'errors': 0, 'endpoints': {}}
+
+    def stats(self, limit=50):
+        """
+        Get per-fingerprint statistics, slowest total time first.
+
+        Args:
+            limit (int): Maximum number of fingerprints returned
+
+        Returns:
+            list: Dicts with fingerprint, count, total/mean/max milliseconds,
+                rows, slow and error counts and calls per endpoint
+        """
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1]['time'], reverse=True)[:limit]
+            return [{
+                'fingerprint': key,
+                'count': value['count'],
+                'total_ms': round(value['time'] * 1000, 3),
+                'mean_ms': round(value['time'] * 1000 / value['count'], 3),
+                'max_ms': round(value['max_time'] * 1000, 3),
+                'rows': value['rows'],
+                'slow': value['slow'],
+                'errors': value['errors'],
+                'endpoints': dict(value['endpoints'])
+            } for key, value in items]
+
+    def reset(self):
+        """Forget all collected statistics."""
+        with self._lock:
+            self._stats.clear()
+            self._explained.clear()
+
+query_recorder = QueryRecorder()
+
+def request_totals():
+    """
+    Get the query totals of the current app context.
+
+    Returns:
+        dict: count, time (seconds), rows and slow statements
+    """
+    if has_app_context():
+        totals = g.get('_query_totals')
+        if totals is not None:
+            return dict(totals)
+    return {'count': 0, 'time': 0.0, 'rows': 0, 'slow': 0}
+
+class InstrumentedCursor:
+    """
+    Cursor wrapper that times execute() and executemany().
+
+    Args:
+        cursor: Driver cursor
+        pool: ConnectionPool the connection belongs to, used to run EXPLAIN
+            on a separate connection
+    """
+
+    def __init__(self, cursor, pool=None):
+        self._cursor = cursor
+        self._pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._cursor.close()
+
+    def execute(self, query, params=None, *args, **kwargs):
+        return self._timed(self._cursor.execute, query, params, args, kwargs)
+
+    def executemany(self, query, seq_params, *args, **kwargs):
+        return self._timed(self._cursor.executemany, query, seq_params, args, kwargs, many=True)
+
+    def _timed(self, method, query, params, args, kwargs, many=False):
+        started = time.perf_counter()
+        error = None
+        try:
+            return method(query, params, *args, **kwargs)
+        except Exception as err:
+            error = err
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            try:
+                rows = self._cursor.rowcount
+            except Exception:
+                rows = -1
+            try:
+                query_recorder.record(
+                    query, params, duration, rows,
+                    database=getattr(self._pool, 'name', None),
+                    error=error,
+                    explain=None if many else self._explain
+                )
+            except Exception as err:
+                logger.error(f"Error recording query: {err}")
+
+    def _explain(self, query, params):
+        """Run EXPLAIN on a separate connection so unread results are not disturbed."""
+        if self._pool is None:
+            return None
+        try:
+            connection = self._pool.acquire(timeout=1)
+        except Exception:
+            return None
+        try:
+            cursor = connection._connection.cursor(dictionary=True)
+            cursor.execute(f"EXPLAIN {query}", params)
+            plan = cursor.fetchall()
+            cursor.close()
+            return plan
+        except Exception as err:
+            return f"EXPLAIN failed: {err}"
+        finally:
+            connection.close()
@@ -0,0 +1,115 @@
+"""
+Batch loading of related rows.
+
+List pages that need child rows for every parent (availability per
+doctor, prescriptions per appointment, ...) collect the parent keys and
+fetch all children with one `WHERE key IN (...)` query instead of one
+query per parent.
+"""
+
+from app.utils.database import get_db
+
+# Keys per IN (...) list; keeps statements well below max_allowed_packet
+DEFAULT_CHUNK_SIZE = 500
+
+class BatchLoader:
+    """
+    Load rows grouped by a key column with as few queries as possible.
+
+    Keys can be queued with add() and are fetched together on the first
+    load(); results are remembered for the lifetime of the loader.
+
+    Args:
+        query (str): SELECT statement with a `{keys}` marker where the
+            placeholder list for the IN clause goes
+        key_column (str): Column of the result rows holding the key
+        db_name (str, optional): Database to query
+        chunk_size (int): Maximum number of keys per query
+    """
+
+    def __init__(self, query, key_column, db_name=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.query = query
+        self.key_column = key_column
+        self.db_name = db_name
+        self.chunk_size = chunk_size
+        self._pending = []
+        self._results = {}
+
+    def add(self, keys):
+        """
+        Queue keys to be fetched with the next load.
+
+        Args:
+            keys (iterable): Keys to queue
+        """
+        for key in keys:
+            if key is not None and key not in self._results:
+                self._pending.append(key)
+
+    def dispatch(self):
+        """Fetch every queued key."""
+        keys = list(dict.fromkeys(self._pending))
+        self._pending = []
+        if not keys:
+            return
+
+        for key in keys:
+            self._results.setdefault(key, [])
+
+        db = get_db(self.db_name)
+        cursor = db.cursor(dictionary=True)
+
+        for start in range(0, len(keys), self.chunk_size):
+            chunk = keys[start:start + self.chunk_size]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(self.query.format(keys=placeholders), tuple(chunk))
+            for row in cursor.fetchall():
+                self._results.setdefault(row[self.key_column], []).append(row)
+
+        cursor.close()
+
+    def load(self, key):
+        """
+        Get the rows for one key, fetching queued keys if necessary.
+
+        Args:
+            key: Key to load
+
+        Returns:
+            list: Rows for the key
+        """
+        if key not in self._results:
+            self.add([key])
+            self.dispatch()
+        return self._results.get(key, [])
+
+    def load_many(self, keys):
+        """
+        Get the rows for several keys with a single round trip per chunk.
+
+        Args:
+            keys (iterable): Keys to load
+
+        Returns:
+            dict: Key mapped to its list of rows (empty for unknown keys)
+        """
+        keys = list(keys)
+        self.add(keys)
+        self.dispatch()
+        return {key: self._results.get(key, []) for key in keys}
+
+
+def load_grouped(query, keys, key_column, db_name=None):
+    """
+    Load rows for several keys and group them by key.
+
+    Args:
+        query (str): SELECT statement with a `{keys}` marker for the IN list
+        keys (iterable): Keys to load
+        key_column (str): Column of the result rows holding the key
+        db_name (str, optional): Database to query
+
+    Returns:
+        dict: Key mapped to its list of rows
+    """
+    return BatchLoader(query, key_column, db_name).load_many(keys)
@@ -0,0 +1,352 @@
+"""
+Application metrics in the Prometheus text format.
+
+Each worker process keeps its counters, gauges and histograms in memory.
+When METRICS_DIR is set, workers periodically write a JSON snapshot to
+metrics-<pid>.json in that directory and a scrape merges every snapshot:
+counters and histograms are summed across all processes (including
+workers that have exited, so totals never go backwards), while gauges are
+only summed over processes that are still alive. Without METRICS_DIR
+only the scraped process is reported.
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'cims_http_requests_total': ('counter', 'HTTP requests by endpoint, method and status code.'),
+    'cims_http_request_duration_seconds': ('histogram', 'HTTP request latency by endpoint.'),
+    'cims_http_requests_in_flight': ('gauge', 'HTTP requests currently being handled.'),
+    'cims_db_queries_total': ('counter', 'Database statements executed by endpoint.'),
+    'cims_db_query_seconds_total': ('counter', 'Time spent executing database statements by endpoint.'),
+    'cims_db_pool_connections': ('gauge', 'Open pooled connections by state.'),
+    'cims_db_pool_waiting': ('gauge', 'Threads waiting for a pooled connection.'),
+    'cims_db_pool_borrows_total': ('counter', 'Connections borrowed from the pool.'),
+    'cims_db_pool_timeouts_total': ('counter', 'Borrow attempts that timed out.'),
+    'cims_db_pool_wait_seconds_total': ('counter', 'Time spent waiting for pooled connections.'),
+    'cims_cache_hits_total': ('counter', 'Cache hits.'),
+    'cims_cache_misses_total': ('counter', 'Cache misses.'),
+    'cims_cache_evictions_total': ('counter', 'Cache entries evicted by the size limit.'),
+    'cims_cache_entries': ('gauge', 'Entries currently cached.'),
+    'cims_cache_hit_ratio': ('gauge', 'Cache hits divided by lookups.'),
+    'cims_activity_events_total': ('counter', 'Activity log events by outcome.'),
+    'cims_activity_queue_depth': ('gauge', 'Activity log events waiting to be written.'),
+    'cims_sse_connections': ('gauge', 'Open Server-Sent Events streams.'),
+    'cims_sse_events_total': ('counter', 'Events published to Server-Sent Events streams.'),
+    'cims_dispense_queue_depth': ('gauge', 'Prescriptions waiting to be dispensed, and how many are claimed.')
+}
+
+# Gauges of shared state read from the database; only the scraping process reports them
+GLOBAL_GAUGES = {'cims_dispense_queue_depth'}
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+class MetricsRegistry:
+    """
+    In-process metric storage.
+
+    Args:
+        directory (str, optional): Directory for per-process snapshots
+        flush_interval (float): Minimum seconds between snapshot writes
+    """
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._collectors = []
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._last_flush = 0.0
+        self._pid = os.getpid()
+
+    def configure(self, directory=None, flush_interval=None):
+        """
+        Change where snapshots are written.
+
+        Args:
+            directory (str, optional): Snapshot directory; None disables sharing
+            flush_interval (float, optional): Seconds between snapshot writes
+        """
+        self.directory = directory
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def add_collector(self, collector):
+        """
+        Register a callable run before every snapshot and scrape.
+
+        Collectors update gauges and counters that mirror state kept
+        elsewhere, such as pool and cache statistics.
+        """
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def inc(self, name, labels=None, value=1):
+        """Increase a counter."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_counter(self, name, labels, value):
+        """Set a counter mirrored from a cumulative statistic."""
+        with self._lock:
+            self._counters[(name, _label_key(labels))] = value
+
+    def set_gauge(self, name, labels, value):
+        """Set a gauge."""
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def add_gauge(self, name, labels=None, value=1):
+        """Increase (or with a negative value, decrease) a gauge."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        """Add an observation to a histogram."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets),
+                                                     'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][index] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def collect(self):
+        """Run the registered collectors."""
+        for collector in self._collectors:
+            try:
+                collector(self)
+            except Exception as err:
+                logger.error(f"Metrics collector failed: {err}")
+
+    def snapshot(self):
+        """
+        Get the metrics of this process.
+
+        Returns:
+            dict: JSON-serializable counters, gauges and histograms
+        """
+        self.collect()
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'counters': [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                'gauges': [[name, dict(labels), value] for (name, labels), value in self._gauges.items()],
+                'histograms': [[name, dict(labels), dict(histogram, counts=list(histogram['counts']))]
+                               for (name, labels), histogram in self._histograms.items()]
+            }
+
+    def flush(self, force=False):
+        """
+        Write this process's snapshot if the flush interval has elapsed.
+
+        Args:
+            force (bool): Write regardless of the interval
+        """
+        if not self.directory:
+            return
+        if os.getpid() != self._pid:
+            self._reset()
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+
+        try:
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(handle, 'w') as snapshot_file:
+                json.dump(self.snapshot(), snapshot_file)
+            os.replace(temp_path, os.path.join(self.directory, f'metrics-{os.getpid()}.json'))
+        except OSError as err:
+            logger.error(f"Could not write metrics snapshot: {err}")
+
+    def _snapshots(self):
+        """Get the snapshots of every process, this one freshly collected."""
+        own = self.snapshot()
+        if not self.directory:
+            return [own]
+
+        snapshots = [own]
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as snapshot_file:
+                    snapshot = json.load(snapshot_file)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get('pid') != own['pid']:
+                snapshot['alive'] = _pid_alive(snapshot.get('pid'))
+                snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        """
+        Render the merged metrics of all processes.
+
+        Returns:
+            str: Prometheus text exposition format
+        """
+        counters, gauges, histograms = {}, {}, {}
+        for index, snapshot in enumerate(self._snapshots()):
+            for name, labels, value in snapshot['counters']:
+                key = (name, _label_key(labels))
+                counters[key] = counters.get(key, 0) + value
+            if snapshot.get('alive', True):
+                for name, labels, value in snapshot['gauges']:
+                    if index and name in GLOBAL_GAUGES:
+                        continue
+                    key = (name, _label_key(labels))
+                    gauges[key] = gauges.get(key, 0) + value
+            for name, labels, histogram in snapshot['histograms']:
+                key = (name, _label_key(labels))
+                merged = histograms.get(key)
+                if merged is None:
+                    histograms[key] = dict(histogram, counts=list(histogram['counts']))
+                else:
+                    merged['counts'] = [a + b for a, b in zip(merged['counts'], histogram['counts'])]
+                    merged['sum'] += histogram['sum']
+                    merged['count'] += histogram['count']
+
+        # Ratios cannot be summed, so they are derived from the merged counters
+        for (name, labels), hits in list(counters.items()):
+            if name == 'cims_cache_hits_total':
+                misses = counters.get(('cims_cache_misses_total', labels), 0)
+                gauges[('cims_cache_hit_ratio', labels)] = hits / (hits + misses) if hits + misses else 0.0
+
+        lines = []
+        for name in sorted({key[0] for key in list(counters) + list(gauges) + list(histograms)}):
+            kind, description = HELP.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            for (metric, labels), value in sorted(gauges.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(histogram['buckets'], histogram['counts']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", _format_value(bound)),))} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram["count"]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram["sum"])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+def _pid_alive(pid):
+    if not isinstance(pid, int):
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+metrics = MetricsRegistry()
+
+atexit.register(lambda: metrics.flush(force=True))
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=metrics._reset)
+
+def collect_pool_stats(registry, pools):
+    """
+    Mirror connection pool statistics into the registry.
+
+    Args:
+        registry (MetricsRegistry): Target registry
+        pools (dict): Pool name mapped to ConnectionPool
+    """
+    for name, pool in pools.items():
+        stats = pool.stats()
+        labels = {'pool': name}
+        registry.set_gauge('cims_db_pool_connections', dict(labels, state='idle'), stats['idle'])
+        registry.set_gauge('cims_db_pool_connections', dict(labels, state='borrowed'), stats['borrowed'])
+        registry.set_gauge('cims_db_pool_waiting', labels, stats['waiting'])
+        registry.set_counter('cims_db_pool_borrows_total', labels, stats['borrows'])
+        registry.set_counter('cims_db_pool_timeouts_total', labels, stats['timeouts'])
+        registry.set_counter('cims_db_pool_wait_seconds_total', labels, stats['wait_time_total'])
+
+def collect_cache_stats(registry, caches):
+    """
+    Mirror LRUCache statistics into the registry.
+
+    Args:
+        registry (MetricsRegistry): Target registry
+        caches (list): LRUCache instances
+    """
+    for cache in caches:
+        stats = cache.stats()
+        labels = {'cache': stats['name']}
+        registry.set_counter('cims_cache_hits_total', labels, stats['hits'])
+        registry.set_counter('cims_cache_misses_total', labels, stats['misses'])
+        registry.set_counter('cims_cache_evictions_total', labels, stats['evictions'])
+        registry.set_gauge('cims_cache_entries', labels, stats['entries'])
+
+def collect_activity_stats(registry, writer):
+    """
+    Mirror ActivityLogWriter statistics into the registry.
+
+    Args:
+        registry (MetricsRegistry): Target registry
+        writer (ActivityLogWriter): Activity log writer
+    """
+    stats = writer.stats()
+    for outcome in ('queued', 'written', 'spilled', 'replayed', 'dropped', 'rejected'):
+        registry.set_counter('cims_activity_events_total', {'outcome': outcome}, stats[outcome])
+    registry.set_gauge('cims_activity_queue_depth', None, stats['pending'])
+
+def collect_broker_stats(registry, broker):
+    """
+    Mirror EventBroker statistics into the registry.
+
+    Args:
+        registry (MetricsRegistry): Target registry
+        broker (EventBroker): Event broker
+    """
+    stats = broker.stats()
+    registry.set_gauge('cims_sse_connections', None, stats['connections'])
+    registry.set_counter('cims_sse_events_total', None, stats['published'])
@@ -0,0 +1,294 @@
+"""
+Keyset (seek) pagination.
+
+Instead of OFFSET, each page continues from the sort key of the last row
+of the previous page:
+
+    WHERE (k1 < v1) OR (k1 = v1 AND k2 < v2) OR ...
+    ORDER BY k1 DESC, k2 DESC LIMIT n + 1
+
+so page N costs the same as page 1 when the sort columns are indexed.
+The sort key must be unique, so it always ends with the primary key.
+Positions are handed to clients as opaque URL-safe cursors.
+"""
+
+import base64
+import datetime
+import decimal
+import json
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+class KeysetKey:
+    """
+    One column of a keyset sort order.
+
+    Args:
+        expression (str): SQL expression compared in the seek predicate,
+            e.g. 'a.AppointmentDate'
+        field (str, optional): Key of the column in result rows; defaults to
+            the expression without its table alias
+        descending (bool): Sort direction
+    """
+
+    def __init__(self, expression, field=None, descending=True):
+        self.expression = expression
+        self.field = field or expression.rsplit('.', 1)[-1]
+        self.descending = descending
+
+    def order(self, backward=False):
+        """Get the ORDER BY term, reversed when paging backward."""
+        descending = self.descending != backward
+        return f"{self.expression} {'DESC' if descending else 'ASC'}"
+
+    def operator(self, backward=False):
+        """Get the comparison that selects rows after a position."""
+        return '<' if self.descending != backward else '>'
+
+def _to_param(value):
+    """Convert a sort key value to a JSON-safe query parameter."""
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        # MySQL returns TIME columns as timedelta
+        seconds = int(value.total_seconds())
+        return '%02d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+    if isinstance(value, datetime.time):
+        return value.strftime('%H:%M:%S')
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+def encode_cursor(values, direction=FORWARD):
+    """
+    Encode a position as an opaque cursor.
+
+    Args:
+        values (list): Sort key values of a row
+        direction (str): FORWARD or BACKWARD
+
+    Returns:
+        str: URL-safe cursor
+    """
+    payload = json.dumps({'d': direction, 'k': [_to_param(value) for value in values]},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, key_count):
+    """
+    Decode a cursor created by encode_cursor.
+
+    Args:
+        cursor (str): Cursor from the client
+        key_count (int): Number of columns in the sort key
+
+    Returns:
+        tuple: (values, direction)
+
+    Raises:
+        ValueError: If the cursor is malformed or does not match the sort key
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        values, direction = payload['k'], payload['d']
+    except (ValueError, TypeError, KeyError, UnicodeDecodeError):
+        raise ValueError("Invalid pagination cursor")
+
+    if direction not in (FORWARD, BACKWARD) or not isinstance(values, list) or len(values) != key_count:
+        raise ValueError("Invalid pagination cursor")
+
+    return values, direction
+
+def seek_predicate(keys, values, backward=False):
+    """
+    Build the WHERE condition selecting rows after a position.
+
+    The condition is expanded into OR terms rather than a row constructor
+    comparison so it works with mixed sort directions and lets MySQL use
+    a range scan on the leading index column.
+
+    Args:
+        keys (list): KeysetKey sort order
+        values (list): Sort key values of the position
+        backward (bool): Select rows before the position instead
+
+    Returns:
+        tuple: (condition, params)
+    """
+    terms = []
+    params = []
+    for index, key in enumerate(keys):
+        parts = [f"{previous.expression} = %s" for previous in keys[:index]]
+        parts.append(f"{key.expression} {key.operator(backward)} %s")
+        terms.append("(" + " AND ".join(parts) + ")")
+        params.extend(values[:index + 1])
+    return "(" + " OR ".join(terms) + ")", params
+
+def clamp_per_page(per_page):
+    """Limit a requested page size to 1..MAX_PER_PAGE."""
+    try:
+        per_page = int(per_page)
+    except (TypeError, ValueError):
+        return DEFAULT_PER_PAGE
+    return max(1, min(MAX_PER_PAGE, per_page))
+
+def estimate_rows(cursor, query, params=None):
+    """
+    Estimate how many rows a query reads using EXPLAIN.
+
+    This is the optimizer's estimate for the first table of the plan and
+    costs no scan, unlike COUNT(*).
+
+    Args:
+        cursor: Dictionary cursor
+        query (str): SELECT statement without LIMIT
+        params (list, optional): Query parameters
+
+    Returns:
+        int: Approximate row count, or None if unavailable
+    """
+    try:
+        cursor.execute(f"EXPLAIN {query}", tuple(params or ()))
+        plan = cursor.fetchall()
+    except Exception:
+        return None
+    if not plan or plan[0].get('rows') is None:
+        return None
+    return int(plan[0]['rows'])
+
+def resolve_cursor(keys, cursor):
+    """
+    Turn a client cursor into a seek condition.
+
+    Args:
+        keys (list): KeysetKey sort order
+        cursor (str, optional): Cursor returned with a previous page
+
+    Returns:
+        tuple: (condition or None, params, backward)
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    if not cursor:
+        return None, [], False
+    values, direction = decode_cursor(cursor, len(keys))
+    backward = direction == BACKWARD
+    condition, params = seek_predicate(keys, values, backward)
+    return condition, params, backward
+
+def order_clause(keys, backward=False):
+    """Get the ORDER BY expression list for a sort order."""
+    return ", ".join(key.order(backward) for key in keys)
+
+def make_page(rows, keys, per_page, cursor=None, backward=False, total=None):
+    """
+    Build the page returned to callers from rows fetched with LIMIT per_page + 1.
+
+    Args:
+        rows (list): Fetched rows in query order
+        keys (list): KeysetKey sort order
+        per_page (int): Rows per page
+        cursor (str, optional): Cursor the page was requested with
+        backward (bool): Whether the rows were fetched in reverse order
+        total (int, optional): Approximate total row count
+
+    Returns:
+        dict: items, per_page, next_cursor, prev_cursor, has_next, has_prev
+            and total
+    """
+    has_more = len(rows) > per_page
+    rows = list(rows[:per_page])
+    if backward:
+        rows.reverse()
+
+    has_next = has_more if not backward else True
+    has_prev = has_more if backward else bool(cursor)
+    if not rows:
+        has_next = has_prev = False
+
+    def row_key(row):
+        return [row[key.field] for key in keys]
+
+    return {
+        'items': rows,
+        'per_page': per_page,
+        'next_cursor': encode_cursor(row_key(rows[-1]), FORWARD) if has_next else None,
+        'prev_cursor': encode_cursor(row_key(rows[0]), BACKWARD) if has_prev else None,
+        'has_next': has_next,
+        'has_prev': has_prev,
+        'total': total
+    }
+
+def paginate(select, keys, conditions=None, params=None, cursor=None,
+             per_page=DEFAULT_PER_PAGE, include_total=False, db_name=None):
+    """
+    Fetch one page of a query with keyset pagination.
+
+    Args:
+        select (str): SELECT ... FROM ... [JOIN ...] without WHERE or ORDER BY
+        keys (list): KeysetKey sort order ending with a unique column
+        conditions (list, optional): WHERE conditions joined with AND
+        params (list, optional): Parameters for the conditions
+        cursor (str, optional): Cursor returned with a previous page
+        per_page (int): Rows per page
+        include_total (bool): Add an approximate total row count
+        db_name (str, optional): Database to query
+
+    Returns:
+        dict: Page built by make_page
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    from app.utils.database import get_db
+
+    per_page = clamp_per_page(per_page)
+    conditions = list(conditions or [])
+    params = list(params or [])
+    seek_condition, seek_params, backward = resolve_cursor(keys, cursor)
+
+    db = get_db(db_name)
+    db_cursor = db.cursor(dictionary=True)
+
+    total = None
+    if include_total:
+        count_query = select
+        if conditions:
+            count_query += " WHERE " + " AND ".join(conditions)
+        total = estimate_rows(db_cursor, count_query, params)
+
+    if seek_condition:
+        conditions.append(seek_condition)
+        params.extend(seek_params)
+
+    query = select
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {order_clause(keys, backward)} LIMIT %s"
+
+    # One extra row tells whether another page follows
+    db_cursor.execute(query, tuple(params + [per_page + 1]))
+    rows = db_cursor.fetchall()
+    db_cursor.close()
+
+    return make_page(rows, keys, per_page, cursor, backward, total)
+
+def get_page_params(request):
+    """
+    Get keyset pagination parameters from a request.
+
+    Args:
+        request: Flask request object
+
+    Returns:
+        tuple: (cursor, per_page)
+    """
+    return request.args.get('cursor') or None, clamp_per_page(request.args.get('per_page', DEFAULT_PER_PAGE))
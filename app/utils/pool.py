@@ -0,0 +1,350 @@
+"""
+Connection pooling for the databases used by the application.
+
+Each logical database ('default' and 'cims') gets its own ConnectionPool.
+Connections are borrowed with acquire() and handed back with release();
+the PooledConnection wrapper returned by acquire() does this automatically
+when close() is called, so existing code that closes its connection keeps
+working unchanged.
+"""
+
+import os
+import threading
+import time
+import weakref
+import logging
+from collections import deque
+
+import mysql.connector
+from mysql.connector import errors
+
+from app.utils.instrumentation import InstrumentedCursor
+
+logger = logging.getLogger(__name__)
+
+# Every pool created in this process, so they can be reset after a fork
+_all_pools = weakref.WeakSet()
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a database connection borrowed from a pool.
+
+    Attribute access is delegated to the underlying connection. Calling
+    close() returns the connection to its pool instead of closing it.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        connection = self.__dict__.get('_connection')
+        if connection is None:
+            raise errors.OperationalError('Connection has already been returned to the pool')
+        return getattr(connection, name)
+
+    def cursor(self, *args, **kwargs):
+        """Open a cursor whose statements are recorded by the query instrumentation."""
+        connection = self.__dict__.get('_connection')
+        if connection is None:
+            raise errors.OperationalError('Connection has already been returned to the pool')
+        return InstrumentedCursor(connection.cursor(*args, **kwargs), self._pool)
+
+    def close(self):
+        """Return the connection to the pool."""
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self._pool.release(connection)
+
+    def invalidate(self):
+        """Close the underlying connection and remove it from the pool."""
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self._pool.discard(connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        # Connections that are never closed explicitly still find their way
+        # back to the pool once the wrapper is garbage collected
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections.
+
+    Args:
+        name (str): Logical database name, used in logs and statistics
+        connect_args (dict): Keyword arguments for mysql.connector.connect
+        min_size (int): Idle connections kept open when reaping
+        max_size (int): Maximum number of open connections
+        max_idle (float): Seconds an idle connection may live above min_size
+        timeout (float): Seconds to wait for a free connection
+        ping_interval (float): Idle seconds after which a connection is
+            health-checked before being handed out
+        connect (callable, optional): Factory used to open new connections,
+            mysql.connector.connect by default
+    """
+
+    def __init__(self, name, connect_args, min_size=1, max_size=10, max_idle=300,
+                 timeout=10, ping_interval=30, connect=None):
+        self.name = name
+        self.connect_args = dict(connect_args)
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._connect = connect or mysql.connector.connect
+        self._reset_state()
+        _all_pools.add(self)
+
+    def _reset_state(self):
+        """Initialise (or, after a fork, forget) all pool state."""
+        self._pid = os.getpid()
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._created = 0
+        self._closed = 0
+        self._borrows = 0
+        self._timeouts = 0
+        self._failed_checks = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    def _check_pid(self):
+        # Connections inherited from a parent process share its sockets;
+        # drop them without closing so the parent's sessions stay intact
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def _open(self):
+        connection = self._connect(**self.connect_args)
+        with self._cond:
+            self._created += 1
+        return connection
+
+    def _close_raw(self, connection):
+        try:
+            connection.close()
+        except Exception as err:
+            logger.warning(f"Error closing pooled connection ({self.name}): {err}")
+        with self._cond:
+            self._closed += 1
+
+    def _is_healthy(self, connection, idle_for):
+        """Check a connection before handing it out."""
+        if idle_for < self.ping_interval:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout=None):
+        """
+        Borrow a connection from the pool.
+
+        Args:
+            timeout (float, optional): Seconds to wait when the pool is
+                exhausted. Defaults to the pool timeout.
+
+        Returns:
+            PooledConnection: Wrapped connection; close() returns it
+
+        Raises:
+            mysql.connector.errors.PoolError: If no connection became
+                available in time
+        """
+        self._check_pid()
+        timeout = self.timeout if timeout is None else timeout
+
+        while True:
+            connection, idle_for = self._checkout(timeout)
+
+            if connection is None:
+                # A slot was reserved for a brand new connection
+                try:
+                    connection = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+                return PooledConnection(self, connection)
+
+            if self._is_healthy(connection, idle_for):
+                return PooledConnection(self, connection)
+
+            # Stale connection: throw it away and try again
+            with self._cond:
+                self._failed_checks += 1
+            self.discard(connection)
+
+    def _checkout(self, timeout):
+        """
+        Take an idle connection or reserve room for a new one.
+
+        Returns:
+            tuple: (connection or None, seconds the connection was idle)
+        """
+        deadline = time.monotonic() + timeout
+        started = time.monotonic()
+
+        with self._cond:
+            self._reap_locked()
+
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise errors.PoolError(
+                        f"Connection pool '{self.name}' exhausted "
+                        f"({self.max_size} connections in use)"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            waited = time.monotonic() - started
+            self._wait_time += waited
+            self._max_wait_time = max(self._max_wait_time, waited)
+            self._borrows += 1
+            self._in_use += 1
+
+            if self._idle:
+                # LIFO keeps the hottest connections busy and lets the rest age out
+                connection, last_used = self._idle.pop()
+                return connection, time.monotonic() - last_used
+
+            self._size += 1
+            return None, 0.0
+
+    def release(self, connection):
+        """
+        Return a borrowed connection to the pool.
+
+        Args:
+            connection: Raw connection previously handed out by acquire()
+        """
+        if self._pid != os.getpid():
+            return
+
+        try:
+            if getattr(connection, 'in_transaction', False):
+                connection.rollback()
+        except Exception:
+            self.discard(connection)
+            return
+
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, connection):
+        """
+        Close a borrowed connection instead of returning it to the pool.
+
+        Args:
+            connection: Raw connection previously handed out by acquire()
+        """
+        if self._pid != os.getpid():
+            return
+
+        with self._cond:
+            self._in_use -= 1
+            self._size -= 1
+            self._cond.notify()
+        self._close_raw(connection)
+
+    def _reap_locked(self):
+        """Collect idle connections above min_size that exceeded max_idle."""
+        now = time.monotonic()
+        expired = []
+
+        # The oldest idle connections sit at the left end of the deque
+        while (self._idle and self._size - len(expired) > self.min_size
+               and now - self._idle[0][1] > self.max_idle):
+            expired.append(self._idle.popleft()[0])
+
+        if expired:
+            self._size -= len(expired)
+            self._closed += len(expired)
+            for connection in expired:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+        return len(expired)
+
+    def reap(self):
+        """
+        Close idle connections that exceeded max_idle.
+
+        Returns:
+            int: Number of connections closed
+        """
+        self._check_pid()
+        with self._cond:
+            return self._reap_locked()
+
+    def close_all(self):
+        """Close every idle connection in the pool."""
+        self._check_pid()
+        with self._cond:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+        for connection in idle:
+            self._close_raw(connection)
+
+    def stats(self):
+        """
+        Get pool statistics.
+
+        Returns:
+            dict: Current sizes and cumulative counters for the pool
+        """
+        with self._cond:
+            return {
+                'name': self.name,
+                'size': self._size,
+                'idle': len(self._idle),
+                'borrowed': self._in_use,
+                'waiting': self._waiting,
+                'max_size': self.max_size,
+                'created': self._created,
+                'closed': self._closed,
+                'borrows': self._borrows,
+                'timeouts': self._timeouts,
+                'failed_checks': self._failed_checks,
+                'wait_time_total': round(self._wait_time, 6),
+                'wait_time_max': round(self._max_wait_time, 6)
+            }
+
+
+def _reset_pools_after_fork():
+    for pool in list(_all_pools):
+        pool._reset_state()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
@@ -0,0 +1,302 @@
+"""
+Student roster import.
+
+Rosters are CSV or JSON Lines files with one student per row. They are
+streamed, validated row by row and upserted into Students in large
+batches keyed on the student's email, so a roster can be imported again
+to apply corrections. Invalid rows are written to an error report instead
+of aborting the import, and a checkpoint file records the last committed
+line so an interrupted import resumes where it stopped.
+"""
+
+import csv
+import json
+import os
+import time
+import logging
+
+from app.views import crud
+from app.utils.helpers import is_valid_email, is_valid_phone, validate_date_format
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Accepted header spellings, compared lowercased without spaces, dashes or underscores
+FIELD_ALIASES = {
+    'firstname': 'FirstName',
+    'first': 'FirstName',
+    'lastname': 'LastName',
+    'last': 'LastName',
+    'surname': 'LastName',
+    'gender': 'Gender',
+    'sex': 'Gender',
+    'dateofbirth': 'DateOfBirth',
+    'dob': 'DateOfBirth',
+    'email': 'Email',
+    'emailaddress': 'Email',
+    'contactnumber': 'ContactNumber',
+    'phone': 'ContactNumber',
+    'mobile': 'ContactNumber',
+    'address': 'Address'
+}
+
+REQUIRED_FIELDS = ('FirstName', 'LastName', 'Gender', 'Email')
+
+def _field_name(header):
+    key = ''.join(ch for ch in str(header).lower() if ch.isalnum())
+    return FIELD_ALIASES.get(key)
+
+def detect_format(path):
+    """
+    Guess the roster format from the file extension.
+
+    Args:
+        path (str): Roster file
+
+    Returns:
+        str: 'jsonl' or 'csv'
+    """
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+def iter_roster(path, fmt=None):
+    """
+    Stream the rows of a roster file.
+
+    Args:
+        path (str): Roster file
+        fmt (str, optional): 'csv' or 'jsonl'; detected from the extension if omitted
+
+    Yields:
+        tuple: (line number, dict of raw values); malformed JSON lines yield
+            None instead of a dict
+    """
+    fmt = fmt or detect_format(path)
+
+    with open(path, newline='', encoding='utf-8-sig') as roster:
+        if fmt == 'jsonl':
+            for line_number, line in enumerate(roster, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_number, row if isinstance(row, dict) else None
+        else:
+            reader = csv.DictReader(roster)
+            for row in reader:
+                yield reader.line_num, row
+
+def validate_row(raw):
+    """
+    Normalize and validate one roster row.
+
+    Args:
+        raw (dict): Values keyed by roster headers
+
+    Returns:
+        tuple: (student dict keyed by Students column, list of error messages)
+    """
+    if raw is None:
+        return None, ['Malformed row']
+
+    student = {}
+    for header, value in raw.items():
+        field = _field_name(header)
+        if field is None:
+            continue
+        value = str(value).strip() if value is not None else ''
+        student[field] = value or None
+
+    errors = [f'{field} is required' for field in REQUIRED_FIELDS if not student.get(field)]
+
+    email = student.get('Email')
+    if email:
+        email = email.lower()
+        student['Email'] = email
+        if not is_valid_email(email):
+            errors.append(f'Invalid email: {email}')
+
+    phone = student.get('ContactNumber')
+    if phone:
+        phone = ''.join(ch for ch in phone if ch.isdigit() or ch == '+')
+        student['ContactNumber'] = phone
+        if not is_valid_phone(phone):
+            errors.append(f'Invalid phone number: {phone}')
+
+    date_of_birth = student.get('DateOfBirth')
+    if date_of_birth and not validate_date_format(date_of_birth):
+        errors.append(f'Invalid date of birth (expected YYYY-MM-DD): {date_of_birth}')
+
+    return student, errors
+
+class RosterImporter:
+    """
+    Import a roster file into Students with crud.create_students_bulk.
+
+    Args:
+        path (str): Roster file
+        fmt (str, optional): 'csv' or 'jsonl'
+        batch_size (int): Students per INSERT and commit
+        checkpoint_path (str, optional): Checkpoint file; defaults to
+            '<path>.checkpoint'
+        error_path (str, optional): CSV report of rejected rows; defaults to
+            '<path>.errors.csv'
+        dry_run (bool): Validate only, without writing to the database
+    """
+
+    def __init__(self, path, fmt=None, batch_size=DEFAULT_BATCH_SIZE,
+                 checkpoint_path=None, error_path=None, dry_run=False):
+        self.path = path
+        self.fmt = fmt or detect_format(path)
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path or f'{path}.checkpoint'
+        self.error_path = error_path or f'{path}.errors.csv'
+        self.dry_run = dry_run
+        self.stats = {'read': 0, 'skipped': 0, 'imported': 0, 'failed': 0, 'batches': 0}
+        self._error_file = None
+        self._error_writer = None
+
+    def load_checkpoint(self):
+        """
+        Get the last line committed by a previous run of the same file.
+
+        Returns:
+            int: Line number, or 0 to start from the beginning
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return 0
+        try:
+            with open(self.checkpoint_path) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable checkpoint {self.checkpoint_path}")
+            return 0
+
+        if checkpoint.get('path') != os.path.abspath(self.path) or checkpoint.get('size') != os.path.getsize(self.path):
+            logger.warning(f"Checkpoint {self.checkpoint_path} belongs to a different file, starting over")
+            return 0
+        return int(checkpoint.get('line', 0))
+
+    def save_checkpoint(self, line_number):
+        """Record the last committed line, replacing the checkpoint atomically."""
+        temp_path = f'{self.checkpoint_path}.tmp'
+        with open(temp_path, 'w') as checkpoint_file:
+            json.dump({
+                'path': os.path.abspath(self.path),
+                'size': os.path.getsize(self.path),
+                'line': line_number,
+                'stats': self.stats
+            }, checkpoint_file)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def report_error(self, line_number, student, errors):
+        """Append a rejected row to the error report."""
+        self.stats['failed'] += 1
+        if self._error_writer is None:
+            self._error_file = open(self.error_path, 'a', newline='', encoding='utf-8')
+            self._error_writer = csv.writer(self._error_file)
+            if self._error_file.tell() == 0:
+                self._error_writer.writerow(['line', 'email', 'errors'])
+        email = (student or {}).get('Email') or ''
+        self._error_writer.writerow([line_number, email, '; '.join(errors)])
+
+    def write_batch(self, batch):
+        """
+        Upsert a batch, isolating rows the database rejects.
+
+        Existing students only get the columns the roster provides, so a
+        correction roster without, say, an Address column keeps the
+        addresses already stored. JSON Lines rows may carry different
+        fields and are upserted in one group per set of fields.
+
+        Args:
+            batch (list): (line number, student) pairs
+        """
+        if self.dry_run:
+            self.stats['imported'] += len(batch)
+            return
+
+        groups = {}
+        for line_number, student in batch:
+            groups.setdefault(tuple(sorted(student)), []).append((line_number, student))
+        for fields, rows in groups.items():
+            self._write_group(rows, list(fields))
+
+    def _write_group(self, rows, fields):
+        # One multi-row upsert and commit; a failed batch is rolled back as a whole
+        result = crud.create_students_bulk([student for _, student in rows], batch_size=len(rows),
+                                           upsert=True, update_columns=fields)
+        if result is not None:
+            self.stats['imported'] += result['count']
+            return
+
+        logger.warning(f"Batch ending at line {rows[-1][0]} failed, retrying row by row")
+        for line_number, student in rows:
+            if crud.create_students_bulk([student], upsert=True, update_columns=fields) is None:
+                # crud logs the driver error to cims_crud.log
+                self.report_error(line_number, student, ['Rejected by the database, see cims_crud.log'])
+            else:
+                self.stats['imported'] += 1
+
+    def run(self, resume=True):
+        """
+        Import the roster.
+
+        Args:
+            resume (bool): Continue after the line recorded in the checkpoint
+
+        Returns:
+            dict: Counts of read, skipped, imported and failed rows, batches
+                and elapsed seconds
+        """
+        started = time.perf_counter()
+        start_line = self.load_checkpoint() if resume else 0
+        if start_line:
+            logger.info(f"Resuming {self.path} after line {start_line}")
+        elif os.path.exists(self.error_path):
+            os.remove(self.error_path)
+
+        batch = []
+        seen_emails = {}
+        try:
+            for line_number, raw in iter_roster(self.path, self.fmt):
+                if line_number <= start_line:
+                    self.stats['skipped'] += 1
+                    continue
+                self.stats['read'] += 1
+
+                student, errors = validate_row(raw)
+                if not errors and student['Email'] in seen_emails:
+                    errors.append(f"Duplicate email, first seen on line {seen_emails[student['Email']]}")
+                if errors:
+                    self.report_error(line_number, student, errors)
+                    continue
+
+                seen_emails[student['Email']] = line_number
+                batch.append((line_number, student))
+
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+
+            if batch:
+                self._flush(batch)
+
+            if not self.dry_run and os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+        finally:
+            if self._error_file is not None:
+                self._error_file.close()
+                self._error_file = self._error_writer = None
+
+        self.stats['elapsed'] = round(time.perf_counter() - started, 3)
+        return dict(self.stats)
+
+    def _flush(self, batch):
+        self.write_batch(batch)
+        self.stats['batches'] += 1
+        if not self.dry_run:
+            self.save_checkpoint(batch[-1][0])
+        logger.info(f"Imported {self.stats['imported']} students ({self.stats['failed']} rejected)")
@@ -0,0 +1,238 @@
+"""
+Schema bootstrap for the SQLite backend.
+
+Creates every table the models use, with the columns, keys and indexes
+of the MySQL schema after the migrations in migrations/ have been
+applied. ENUM columns become TEXT with a CHECK constraint and foreign
+keys are left out, since the two databases are separate files. The
+statements are idempotent, so they run on every start.
+"""
+
+# Tables of the group database (DB_NAME)
+DEFAULT_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.Students (
+        StudentID INTEGER PRIMARY KEY AUTOINCREMENT,
+        FirstName VARCHAR(50) NOT NULL,
+        LastName VARCHAR(50) NOT NULL,
+        Gender VARCHAR(10),
+        DateOfBirth DATE,
+        Email VARCHAR(100),
+        ContactNumber VARCHAR(20),
+        Address VARCHAR(255)
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS {schema}.uq_students_email ON Students (Email)",
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.Staff (
+        StaffID INTEGER PRIMARY KEY AUTOINCREMENT,
+        FirstName VARCHAR(50) NOT NULL,
+        LastName VARCHAR(50) NOT NULL,
+        Role VARCHAR(50),
+        Email VARCHAR(100),
+        ContactNumber VARCHAR(20)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.Medications (
+        MedicationID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Name VARCHAR(100) NOT NULL,
+        DosageForm VARCHAR(50),
+        QuantityInStock INTEGER NOT NULL DEFAULT 0,
+        ExpiryDate DATE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.DoctorAvailability (
+        AvailabilityID INTEGER PRIMARY KEY AUTOINCREMENT,
+        DoctorID INTEGER NOT NULL,
+        DayOfWeek VARCHAR(10),
+        AvailabilityDate DATE,
+        StartTime TIME NOT NULL,
+        EndTime TIME NOT NULL,
+        Status VARCHAR(20)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_availability_doctor ON DoctorAvailability (DoctorID)",
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.Appointments (
+        AppointmentID INTEGER PRIMARY KEY AUTOINCREMENT,
+        StudentID INTEGER NOT NULL,
+        DoctorID INTEGER NOT NULL,
+        AppointmentDate DATE NOT NULL,
+        AppointmentTime TIME NOT NULL,
+        Status TEXT NOT NULL DEFAULT 'Scheduled' CHECK (Status IN ('Scheduled', 'Completed', 'Cancelled')),
+        ActiveSlot INTEGER GENERATED ALWAYS AS (CASE WHEN Status = 'Cancelled' THEN NULL ELSE 1 END) STORED
+    )
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS {schema}.uq_appointments_active_slot
+        ON Appointments (DoctorID, AppointmentDate, AppointmentTime, ActiveSlot)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_appointments_date_time
+        ON Appointments (AppointmentDate, AppointmentTime, AppointmentID)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_appointments_doctor_date_time
+        ON Appointments (DoctorID, AppointmentDate, AppointmentTime, AppointmentID)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_appointments_student_date_time
+        ON Appointments (StudentID, AppointmentDate, AppointmentTime, AppointmentID)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.Prescription (
+        PrescriptionID INTEGER PRIMARY KEY AUTOINCREMENT,
+        AppointmentID INTEGER,
+        DoctorID INTEGER NOT NULL,
+        StudentID INTEGER NOT NULL,
+        MedicationID INTEGER NOT NULL,
+        PrescriptionDate DATE NOT NULL,
+        Quantity INTEGER NOT NULL,
+        Instructions TEXT,
+        DispenseStatus TEXT NOT NULL DEFAULT 'Pending' CHECK (DispenseStatus IN ('Pending', 'Dispensed')),
+        ClaimedBy VARCHAR(50),
+        ClaimExpiresAt DATETIME
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_prescription_appointment ON Prescription (AppointmentID)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_prescription_date ON Prescription (PrescriptionDate, PrescriptionID)",
+    """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_prescription_doctor_date
+        ON Prescription (DoctorID, PrescriptionDate, PrescriptionID)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_prescription_student_date
+        ON Prescription (StudentID, PrescriptionDate, PrescriptionID)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_prescription_queue
+        ON Prescription (DispenseStatus, PrescriptionDate, PrescriptionID)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.MedicinesGiven (
+        MedicineGivenID INTEGER PRIMARY KEY AUTOINCREMENT,
+        PrescriptionID INTEGER NOT NULL,
+        MedicationID INTEGER NOT NULL,
+        DateGiven DATE NOT NULL,
+        QuantityGiven INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_medicines_given_prescription ON MedicinesGiven (PrescriptionID)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_medicines_given_date ON MedicinesGiven (DateGiven, MedicineGivenID)",
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.ActivityLog (
+        ActivityID INTEGER PRIMARY KEY AUTOINCREMENT,
+        UserID VARCHAR(50),
+        Role VARCHAR(20),
+        ActivityType VARCHAR(50) NOT NULL,
+        Description TEXT,
+        Timestamp DATETIME NOT NULL,
+        IPAddress VARCHAR(45)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_activity_log_user ON ActivityLog (UserID, ActivityID)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_activity_log_role ON ActivityLog (Role, ActivityID)",
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.StudentTimeline (
+        TimelineID INTEGER PRIMARY KEY AUTOINCREMENT,
+        StudentID INTEGER NOT NULL,
+        EventDate DATE NOT NULL,
+        EventTime TIME,
+        EventType TEXT NOT NULL CHECK (EventType IN ('appointment', 'prescription', 'dispense')),
+        SourceID INTEGER NOT NULL,
+        AppointmentID INTEGER,
+        PrescriptionID INTEGER,
+        DoctorID INTEGER,
+        DoctorName VARCHAR(100),
+        Specialization VARCHAR(100),
+        MedicationName VARCHAR(100),
+        DosageForm VARCHAR(50),
+        Quantity INTEGER,
+        Instructions TEXT
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS {schema}.uq_student_timeline_source ON StudentTimeline (EventType, SourceID)",
+    """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_student_timeline_student_date
+        ON StudentTimeline (StudentID, EventDate, TimelineID)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_student_timeline_prescription
+        ON StudentTimeline (EventType, PrescriptionID)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.Notifications (
+        NotificationID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Role VARCHAR(20) NOT NULL,
+        UserID VARCHAR(50),
+        Message VARCHAR(255) NOT NULL,
+        CreatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_notifications_recipient
+        ON Notifications (Role, UserID, NotificationID)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.DashboardCounters (
+        CounterKey VARCHAR(100) NOT NULL PRIMARY KEY,
+        Value BIGINT NOT NULL DEFAULT 0,
+        UpdatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+]
+
+# Tables of the shared CIMS database (CIMS_DB_NAME)
+CIMS_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.G12_Doctors (
+        DoctorID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Name VARCHAR(100) NOT NULL,
+        Specialization VARCHAR(100),
+        Email VARCHAR(100),
+        ContactNumber VARCHAR(20),
+        Image BLOB
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.members (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        UserName VARCHAR(50) NOT NULL,
+        emailID VARCHAR(100),
+        DoB DATE
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS {schema}.uq_members_username ON members (UserName)",
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.Login (
+        MemberID VARCHAR(50) NOT NULL PRIMARY KEY,
+        Password VARCHAR(255) NOT NULL,
+        Session VARCHAR(512),
+        Expiry INTEGER,
+        Role VARCHAR(20)
+    )
+    """
+]
+
+def create_schema(connection, default_schema='main', cims_schema='cs432cims'):
+    """
+    Create any missing tables and indexes.
+
+    Args:
+        connection (sqlite3.Connection): Raw connection with both databases
+            open, outside a transaction
+        default_schema (str): Name the group database is open under
+        cims_schema (str): Name the CIMS database is open under
+    """
+    statements = ([statement.format(schema=default_schema) for statement in DEFAULT_TABLES]
+                  + [statement.format(schema=cims_schema) for statement in CIMS_TABLES])
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        for statement in statements:
+            connection.execute(statement)
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
@@ -0,0 +1,217 @@
+"""
+Appointment slot engine.
+
+A doctor's day is represented as an integer bitmap with one bit per
+fixed-width slot (bit 0 is 00:00). Free slots are derived with bitwise
+operations: schedule mask minus booked mask minus past mask.
+"""
+
+import datetime
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+FULL_DAY_MASK = (1 << SLOTS_PER_DAY) - 1
+
+# 'HH:MM:SS' label for every slot index, computed once
+SLOT_TIMES = tuple(
+    '%02d:%02d:00' % divmod(index * SLOT_MINUTES, 60) for index in range(SLOTS_PER_DAY)
+)
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+def to_minutes(value):
+    """
+    Convert a time value to minutes after midnight.
+
+    Args:
+        value: 'HH:MM[:SS]' string, datetime.time, datetime.datetime or
+            datetime.timedelta (MySQL returns TIME columns as timedelta)
+
+    Returns:
+        int: Minutes after midnight
+
+    Raises:
+        ValueError: If the value cannot be interpreted as a time
+    """
+    if isinstance(value, datetime.timedelta):
+        return int(value.total_seconds()) // 60
+    if isinstance(value, (datetime.time, datetime.datetime)):
+        return value.hour * 60 + value.minute
+    if isinstance(value, bytes):
+        value = value.decode()
+
+    parts = str(value).split(':')
+    if len(parts) < 2:
+        raise ValueError(f"Invalid time value: {value!r}")
+    return int(parts[0]) * 60 + int(parts[1])
+
+def slot_index(value):
+    """
+    Get the index of the slot that contains a time.
+
+    Args:
+        value: Time value accepted by to_minutes
+
+    Returns:
+        int: Slot index
+    """
+    return to_minutes(value) // SLOT_MINUTES
+
+def normalize_time(value):
+    """
+    Normalize a time value to the 'HH:MM:SS' start of its slot.
+
+    Args:
+        value: Time value accepted by to_minutes
+
+    Returns:
+        str: Slot start time, e.g. '09:15:00'
+    """
+    return SLOT_TIMES[slot_index(value) % SLOTS_PER_DAY]
+
+def normalize_date(value):
+    """
+    Normalize a date value to 'YYYY-MM-DD'.
+
+    Args:
+        value: 'YYYY-MM-DD' string, datetime.date or datetime.datetime
+
+    Returns:
+        str: ISO formatted date
+
+    Raises:
+        ValueError: If the string is not a valid date
+    """
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return datetime.date.fromisoformat(str(value)).isoformat()
+
+def range_mask(start, end):
+    """
+    Build the mask of slots starting within [start, end).
+
+    Args:
+        start: Start time of the range
+        end: End time of the range
+
+    Returns:
+        int: Slot bitmap
+    """
+    first = -(-to_minutes(start) // SLOT_MINUTES)  # Round up to the next slot boundary
+    last = min(-(-to_minutes(end) // SLOT_MINUTES), SLOTS_PER_DAY)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+def schedule_mask(schedules):
+    """
+    Build the mask of slots covered by schedule rows.
+
+    Args:
+        schedules (list): Rows with StartTime and EndTime
+
+    Returns:
+        int: Slot bitmap
+    """
+    mask = 0
+    for schedule in schedules:
+        mask |= range_mask(schedule['StartTime'], schedule['EndTime'])
+    return mask
+
+def booked_mask(times):
+    """
+    Build the mask of booked slots.
+
+    Args:
+        times (iterable): Appointment times
+
+    Returns:
+        int: Slot bitmap
+    """
+    mask = 0
+    for value in times:
+        mask |= 1 << slot_index(value)
+    return mask & FULL_DAY_MASK
+
+def past_mask(date, now=None):
+    """
+    Build the mask of slots that have already started.
+
+    Args:
+        date (str): Date in 'YYYY-MM-DD' format
+        now (datetime.datetime, optional): Current time
+
+    Returns:
+        int: Slot bitmap
+    """
+    now = now or datetime.datetime.now()
+    today = now.date().isoformat()
+
+    if date < today:
+        return FULL_DAY_MASK
+    if date > today:
+        return 0
+
+    elapsed = now.hour * 3600 + now.minute * 60 + now.second
+    started = min(elapsed // (SLOT_MINUTES * 60) + 1, SLOTS_PER_DAY)
+    return (1 << started) - 1
+
+def free_mask(schedule, booked, past):
+    """Get the bitmap of slots that can still be booked."""
+    return schedule & ~booked & ~past
+
+def iter_slots(mask):
+    """
+    Iterate over the set slots of a mask in ascending order.
+
+    Args:
+        mask (int): Slot bitmap
+
+    Yields:
+        int: Slot index
+    """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+def slot_statuses(schedule, booked, past):
+    """
+    Describe every scheduled slot of a day.
+
+    Args:
+        schedule (int): Schedule bitmap
+        booked (int): Booked bitmap
+        past (int): Past bitmap
+
+    Returns:
+        list: Dicts with 'time' ('HH:MM:SS') and 'status'
+            ('Available', 'Booked' or 'Unavailable')
+    """
+    slots = []
+    for index in iter_slots(schedule):
+        bit = 1 << index
+        if past & bit:
+            status = 'Unavailable'
+        elif booked & bit:
+            status = 'Booked'
+        else:
+            status = 'Available'
+        slots.append({'time': SLOT_TIMES[index], 'status': status})
+    return slots
+
+def serialize_slots(slots, time_key='time', status_key='status'):
+    """
+    Format slots for the frontend with 'HH:MM' times.
+
+    Args:
+        slots (list): Slots returned by slot_statuses
+        time_key (str): Key for the slot time in the output
+        status_key (str): Key for the slot status in the output
+
+    Returns:
+        list: Formatted slots
+    """
+    return [{time_key: slot['time'][:5], status_key: slot['status']} for slot in slots]
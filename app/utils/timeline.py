@@ -0,0 +1,202 @@
+"""
+Materialized per-student medical timeline.
+
+StudentTimeline holds one row per completed appointment, prescription
+and dispense, with the doctor and medication details copied in, so a
+patient's history is read as one range of the (StudentID, EventDate,
+TimelineID) index instead of a five-table join.
+
+Model writes call the sync functions with the row they changed, in the
+same transaction: the row's events are derived again from the source
+tables and upserted on (EventType, SourceID), so an edited event keeps
+its TimelineID and its place in the newest-first order; events of
+deleted rows are removed.
+Renaming a doctor or medication does not touch existing events;
+rebuild() derives the timeline of every student (or one) from scratch.
+Run it after creating the table with `flask --app run rebuild-timeline`.
+"""
+
+import logging
+
+from app.utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+APPOINTMENT = 'appointment'
+PRESCRIPTION = 'prescription'
+DISPENSE = 'dispense'
+
+COLUMNS = ('StudentID', 'EventDate', 'EventTime', 'EventType', 'SourceID', 'AppointmentID', 'PrescriptionID',
+           'DoctorID', 'DoctorName', 'Specialization', 'MedicationName', 'DosageForm', 'Quantity', 'Instructions')
+
+# Event queries per type, with the source column matching each timeline
+# column they can be filtered by. EventRank orders same-day events: the
+# visit, then its prescriptions, then the dispenses.
+_SOURCES = {
+    APPOINTMENT: ("""
+        SELECT a.StudentID, a.AppointmentDate AS EventDate, a.AppointmentTime AS EventTime,
+               'appointment' AS EventType, a.AppointmentID AS SourceID, a.AppointmentID,
+               NULL AS PrescriptionID, a.DoctorID, d.Name AS DoctorName, d.Specialization,
+               NULL AS MedicationName, NULL AS DosageForm, NULL AS Quantity, NULL AS Instructions,
+               0 AS EventRank
+        FROM Appointments a
+        LEFT JOIN cs432cims.G12_Doctors d ON a.DoctorID = d.DoctorID
+        WHERE a.Status = 'Completed' AND {where}
+    """, {'SourceID': 'a.AppointmentID', 'StudentID': 'a.StudentID'}),
+    PRESCRIPTION: ("""
+        SELECT p.StudentID, p.PrescriptionDate AS EventDate, NULL AS EventTime,
+               'prescription' AS EventType, p.PrescriptionID AS SourceID, p.AppointmentID,
+               p.PrescriptionID, p.DoctorID, d.Name AS DoctorName, d.Specialization,
+               m.Name AS MedicationName, m.DosageForm, p.Quantity, p.Instructions,
+               1 AS EventRank
+        FROM Prescription p
+        LEFT JOIN cs432cims.G12_Doctors d ON p.DoctorID = d.DoctorID
+        LEFT JOIN Medications m ON p.MedicationID = m.MedicationID
+        WHERE {where}
+    """, {'SourceID': 'p.PrescriptionID', 'StudentID': 'p.StudentID'}),
+    DISPENSE: ("""
+        SELECT p.StudentID, mg.DateGiven AS EventDate, NULL AS EventTime,
+               'dispense' AS EventType, mg.MedicineGivenID AS SourceID, p.AppointmentID,
+               mg.PrescriptionID, p.DoctorID, d.Name AS DoctorName, d.Specialization,
+               m.Name AS MedicationName, m.DosageForm, mg.QuantityGiven AS Quantity, NULL AS Instructions,
+               2 AS EventRank
+        FROM MedicinesGiven mg
+        JOIN Prescription p ON mg.PrescriptionID = p.PrescriptionID
+        LEFT JOIN cs432cims.G12_Doctors d ON p.DoctorID = d.DoctorID
+        LEFT JOIN Medications m ON mg.MedicationID = m.MedicationID
+        WHERE {where}
+    """, {'SourceID': 'mg.MedicineGivenID', 'StudentID': 'p.StudentID', 'PrescriptionID': 'mg.PrescriptionID'})
+}
+
+def _insert(select, order=''):
+    columns = ', '.join(COLUMNS)
+    return f"INSERT INTO StudentTimeline ({columns}) SELECT {columns} FROM ({select}) events {order}"
+
+def _upsert(cursor, event_type, column, value):
+    """Write the events of a type whose source column has a value, keeping existing TimelineIDs."""
+    select, filters = _SOURCES[event_type]
+    updates = ', '.join(f'{name} = VALUES({name})' for name in COLUMNS if name not in ('EventType', 'SourceID'))
+    # WHERE TRUE keeps SQLite from reading the conflict clause as a join constraint
+    cursor.execute(
+        _insert(select.format(where=f'{filters[column]} = %s'), f'WHERE TRUE ON DUPLICATE KEY UPDATE {updates}'),
+        (value,)
+    )
+
+def _remove(cursor, event_type, column, value):
+    """Delete the events of a type whose timeline column has a value."""
+    cursor.execute(f"DELETE FROM StudentTimeline WHERE EventType = %s AND {column} = %s", (event_type, value))
+
+def sync_appointment(cursor, appointment_id, completed=True):
+    """
+    Update the timeline after an appointment was written.
+
+    Args:
+        cursor: Cursor of the connection making the source write
+        appointment_id: Appointment created or updated
+        completed (bool): False when the appointment was deleted or is no
+            longer completed
+    """
+    if completed:
+        _upsert(cursor, APPOINTMENT, 'SourceID', appointment_id)
+    else:
+        _remove(cursor, APPOINTMENT, 'SourceID', appointment_id)
+
+def sync_student_appointments(cursor, student_id):
+    """Write the events of every completed appointment of a student, e.g. after a bulk insert."""
+    _upsert(cursor, APPOINTMENT, 'StudentID', student_id)
+
+def sync_prescription(cursor, prescription_id, dispenses=True):
+    """
+    Update the timeline after a prescription was created or updated.
+
+    Args:
+        cursor: Cursor of the connection making the source write
+        prescription_id: Prescription written
+        dispenses (bool): Also rewrite its dispenses, which copy the
+            prescription's doctor; a new prescription has none
+    """
+    _upsert(cursor, PRESCRIPTION, 'SourceID', prescription_id)
+    if dispenses:
+        _upsert(cursor, DISPENSE, 'PrescriptionID', prescription_id)
+
+def remove_prescription(cursor, prescription_id):
+    """Delete a deleted prescription's events, including its dispenses."""
+    _remove(cursor, PRESCRIPTION, 'SourceID', prescription_id)
+    _remove(cursor, DISPENSE, 'PrescriptionID', prescription_id)
+
+def sync_dispense(cursor, medicine_given_id, exists=True):
+    """
+    Update the timeline after a MedicinesGiven record was written.
+
+    Args:
+        cursor: Cursor of the connection making the source write
+        medicine_given_id: Record created, updated or deleted
+        exists (bool): False when the record was deleted
+    """
+    if exists:
+        _upsert(cursor, DISPENSE, 'SourceID', medicine_given_id)
+    else:
+        _remove(cursor, DISPENSE, 'SourceID', medicine_given_id)
+
+def rebuild(student_id=None, batch_size=1000):
+    """
+    Derive the timeline from the source tables.
+
+    Students are processed in batches of consecutive IDs, one transaction
+    each, so the table stays readable while a full rebuild runs.
+
+    Args:
+        student_id (int, optional): Rebuild only this student
+        batch_size (int): Students per transaction
+
+    Returns:
+        dict: students (processed) and events (written)
+    """
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    union = ' UNION ALL '.join(
+        select.format(where=f"{filters['StudentID']} BETWEEN %s AND %s") for select, filters in _SOURCES.values()
+    )
+    # Consecutive IDs within a student's day follow EventRank, so the newest-first order reads naturally
+    query = _insert(union, 'ORDER BY StudentID, EventDate, EventRank, EventTime, SourceID')
+    stats = {'students': 0, 'events': 0}
+
+    last_id = 0
+    try:
+        while True:
+            if student_id is not None:
+                ids = [int(student_id)]
+            else:
+                cursor.execute(
+                    "SELECT StudentID FROM Students WHERE StudentID > %s ORDER BY StudentID LIMIT %s",
+                    (last_id, batch_size)
+                )
+                ids = [row['StudentID'] for row in cursor.fetchall()]
+                if not ids:
+                    break
+            low, high = ids[0], ids[-1]
+
+            cursor.execute("DELETE FROM StudentTimeline WHERE StudentID BETWEEN %s AND %s", (low, high))
+            cursor.execute(query, (low, high) * len(_SOURCES))
+            stats['events'] += max(cursor.rowcount, 0)
+            stats['students'] += len(ids)
+            db.commit()
+
+            if student_id is not None:
+                break
+            last_id = high
+            logger.info(f"Rebuilt the timelines of {stats['students']} students ({stats['events']} events)")
+
+        if student_id is None:
+            # Events of students that no longer exist
+            cursor.execute(
+                "DELETE FROM StudentTimeline WHERE StudentID NOT IN (SELECT StudentID FROM Students)"
+            )
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return stats
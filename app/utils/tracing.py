@@ -0,0 +1,147 @@
+"""
+Request trace recorder.
+
+When TRACE_LOG is set, every request (or a TRACE_SAMPLE_RATE share of
+them) is appended to a JSON lines file with its start time, method,
+path, endpoint, query and form arguments, session role and user, status
+and duration. benchmarks/replay.py plays these traces back against a
+server to reproduce real traffic mixes.
+
+Traces are sanitized: cookies and headers are never recorded, secrets
+(passwords, tokens, ...) are dropped and free-text or contact fields are
+replaced by a placeholder. Static files and event streams are skipped.
+Each trace is a single write to a file opened for appending, so several
+worker processes can share one file.
+"""
+
+import re
+import json
+import time
+import random
+import logging
+import threading
+
+from flask import g, request, session
+
+logger = logging.getLogger(__name__)
+
+# Fields that are never recorded
+_SECRET_FIELDS = re.compile(r'pass|token|secret|session|csrf|key', re.I)
+# Fields recorded as REDACTED
+_PERSONAL_FIELDS = re.compile(r'name|email|contact|phone|address|description|notes|instructions|message', re.I)
+REDACTED = '[redacted]'
+
+# Endpoints whose requests are not recorded
+SKIPPED_ENDPOINTS = ('static',)
+
+def sanitize(values):
+    """
+    Remove secrets and personal data from request arguments.
+
+    Args:
+        values (dict): Field -> value, a list of values or a nested dict
+
+    Returns:
+        dict: Sanitized copy
+    """
+    sanitized = {}
+    for field, value in values.items():
+        if _SECRET_FIELDS.search(field):
+            continue
+        if _PERSONAL_FIELDS.search(field):
+            value = [REDACTED] * len(value) if isinstance(value, list) else REDACTED
+        elif isinstance(value, dict):
+            value = sanitize(value)
+        elif isinstance(value, list):
+            value = [sanitize(item) if isinstance(item, dict) else item for item in value]
+        sanitized[field] = value
+    return sanitized
+
+def _multi(values):
+    """Flatten a MultiDict, keeping lists only for repeated fields."""
+    return {field: items if len(items) > 1 else items[0] for field, items in values.lists()}
+
+class TraceRecorder:
+    """
+    Appends sanitized request traces to a JSON lines file.
+
+    Args:
+        path (str, optional): Trace file; recording is off without one
+        sample_rate (float): Share of requests recorded, 0 to 1
+    """
+
+    def __init__(self, path=None, sample_rate=1.0):
+        self.path = None
+        self.sample_rate = sample_rate
+        self._file = None
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.recorded = 0
+        self.configure(path, sample_rate)
+
+    def configure(self, path=None, sample_rate=None):
+        """
+        Change the trace file and sample rate.
+
+        Args:
+            path (str, optional): Trace file, None to stop recording
+            sample_rate (float, optional): Share of requests recorded
+        """
+        with self._lock:
+            if sample_rate is not None:
+                self.sample_rate = sample_rate
+            if path != self.path:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self.path = path
+                if path:
+                    self._file = open(path, 'a', encoding='utf-8')
+
+    @property
+    def enabled(self):
+        return self._file is not None
+
+    def record(self, response):
+        """
+        Record the current request.
+
+        Called from an after_request hook; never raises.
+
+        Args:
+            response: Response about to be sent
+        """
+        if not self.enabled or request.endpoint in SKIPPED_ENDPOINTS:
+            return
+        if response.mimetype == 'text/event-stream':
+            return
+        if self.sample_rate < 1 and self._random.random() >= self.sample_rate:
+            return
+
+        try:
+            now = time.perf_counter()
+            started = g.get('_request_started', now)
+            body = request.get_json(silent=True) if request.is_json else None
+            trace = {
+                'ts': round(time.time() - (now - started), 3),
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'args': sanitize(_multi(request.args)),
+                'form': sanitize(_multi(request.form)),
+                'json': sanitize(body) if isinstance(body, dict) else None,
+                'role': session.get('role'),
+                'user': session.get('user_id'),
+                'status': response.status_code,
+                'duration_ms': round((now - started) * 1000, 3)
+            }
+            line = json.dumps(trace, default=str) + '\n'
+            with self._lock:
+                if self._file is not None:
+                    self._file.write(line)
+                    self._file.flush()
+                    self.recorded += 1
+        except Exception as e:
+            logger.warning(f"Could not record request trace: {e}")
+
+trace_recorder = TraceRecorder()
@@ -1,9 +1,26 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, session, current_app
 from app.models.doctors import DoctorAvailability
+from app.utils.slots import serialize_slots
+from app.utils.cache import availability_cache, image_digest_cache, counter_cache
+from app.utils.instrumentation import query_recorder
 from datetime import datetime
 
 api = Blueprint('api', __name__)
 
+# Roles that may read the internals of a worker; scrapers use METRICS_TOKEN instead
+STATS_ROLES = ('staff', 'admin')
+
+def _stats_denied():
+    """Get the error response for a caller who may not read internal statistics, or None."""
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') == f'Bearer {token}':
+        return None
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated.'}), 401
+    if session.get('role') not in STATS_ROLES:
+        return jsonify({'success': False, 'message': 'Not authorized.'}), 403
+    return None
+
 @api.route('/appointments/availability', methods=['GET'])
 def get_available_slots():
     """API endpoint for getting available appointment slots."""
@@ -18,20 +35,7 @@ def get_available_slots():
         slots = DoctorAvailability.get_available_slots(doctor_id, date)
         
         # Format slots for frontend
-        formatted_slots = []
-        for slot in slots:
-            # Format time string (if needed)
-            time_str = slot.get('time', '')
-            if time_str and ':' in time_str:
-                time_parts = time_str.split(':')
-                time_display = f"{time_parts[0]}:{time_parts[1]}"
-            else:
-                time_display = time_str
-                
-            formatted_slots.append({
-                'time': time_display,
-                'status': slot.get('status', 'Unknown').capitalize()
-            })
+        formatted_slots = serialize_slots(slots)
             
         return jsonify({
             'success': True,
@@ -41,4 +45,61 @@ def get_available_slots():
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return jsonify({'success': False, 'message': str(e)}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@api.route('/appointments/next-available', methods=['GET'])
+def get_next_available_slots():
+    """API endpoint for the earliest free slots across all doctors."""
+    specialization = request.args.get('specialization') or None
+    start_date = request.args.get('start_date') or None
+    
+    try:
+        days = min(max(int(request.args.get('days', 14)), 1), 60)
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'days and limit must be numbers'}), 400
+    
+    try:
+        slots = DoctorAvailability.find_next_available(
+            start_date=start_date,
+            days=days,
+            specialization=specialization,
+            limit=limit
+        )
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid date format. Please use YYYY-MM-DD format.'}), 400
+    
+    return jsonify({
+        'success': True,
+        'slots': slots
+    })
+
+@api.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """API endpoint for availability cache statistics (staff, admins or the metrics token)."""
+    denied = _stats_denied()
+    if denied:
+        return denied
+    
+    return jsonify({
+        'success': True,
+        'caches': [availability_cache.stats(), image_digest_cache.stats(), counter_cache.stats()]
+    })
+
+@api.route('/queries/stats', methods=['GET'])
+def get_query_stats():
+    """API endpoint for per-statement query statistics of this worker (staff, admins or the metrics token)."""
+    denied = _stats_denied()
+    if denied:
+        return denied
+    
+    try:
+        limit = max(1, min(500, int(request.args.get('limit', 50))))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'limit must be a number'}), 400
+    
+    return jsonify({
+        'success': True,
+        'slow_threshold_ms': query_recorder.slow_threshold * 1000,
+        'queries': query_recorder.stats(limit)
+    })
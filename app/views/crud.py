@@ -7,8 +7,16 @@ on tables in the cs432g12 database and G12_Doctors table in cs432cims database.
 
 import mysql.connector
 from mysql.connector import Error
+import itertools
 import logging
 import sqlite3
+import threading
+
+from app.config import Config
+from app.utils.pool import ConnectionPool
+from app.utils.backends import get_backend
+from app.utils import pagination, counters, timeline
+from app.models.doctors import DoctorAvailability
 
 # Configure logging
 logging.basicConfig(
@@ -34,26 +42,65 @@ DB_CONFIGS = {
     }
 }
 
-def get_db_connection(db_name="g12"):
+# Connection pools, created lazily per database
+POOL_SETTINGS = {
+    "min_size": 1,
+    "max_size": 5,
+    "max_idle": 300,
+    "timeout": 10
+}
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_name="g12"):
     """
-    Create and return a database connection
+    Get the connection pool for a database, creating it on first use
     
     Args:
         db_name (str): The database to connect to ("cims" or "g12")
         
     Returns:
-        mysql.connector.connection: Database connection object
+        ConnectionPool: Pool for the database
         
     Raises:
         ValueError: If db_name is not valid
-        ConnectionError: If connection fails
     """
     if db_name not in DB_CONFIGS:
         raise ValueError(f"Invalid database name: {db_name}. Valid options are 'cims' or 'g12'")
     
+    with _pools_lock:
+        if db_name not in _pools:
+            if Config.DB_BACKEND == "sqlite":
+                # Same local databases as the application
+                backend = get_backend(vars(Config))
+                _pools[db_name] = ConnectionPool(
+                    db_name,
+                    backend.connect_args("cims" if db_name == "cims" else "default"),
+                    connect=backend.connect,
+                    **POOL_SETTINGS
+                )
+            else:
+                _pools[db_name] = ConnectionPool(db_name, DB_CONFIGS[db_name], **POOL_SETTINGS)
+        return _pools[db_name]
+
+def get_db_connection(db_name="g12"):
+    """
+    Borrow a database connection from the pool
+    
+    Args:
+        db_name (str): The database to connect to ("cims" or "g12")
+        
+    Returns:
+        PooledConnection: Database connection; close() returns it to the pool
+        
+    Raises:
+        ValueError: If db_name is not valid
+        ConnectionError: If connection fails
+    """
+    pool = get_pool(db_name)
+    
     try:
-        connection = mysql.connector.connect(**DB_CONFIGS[db_name])
-        return connection
+        return pool.acquire()
     except Error as e:
         logger.error(f"Error connecting to MySQL database: {e}")
         raise ConnectionError(f"Failed to connect to database: {e}")
@@ -84,7 +131,60 @@ def get_members():
 
 # Generic CRUD Operations
 
-def execute_query(query, params=None, db_name="g12", fetch=False):
+# Rows fetched per round trip while streaming
+STREAM_BATCH_SIZE = 1000
+
+def stream_query(query, params=None, db_name="g12", chunk_size=None):
+    """
+    Run a SELECT and yield its rows without loading the result set into memory
+    
+    Uses an unbuffered cursor. The connection returns to the pool once all
+    rows are read; if the consumer stops early it is discarded, since the
+    unread rows would otherwise have to be drained first.
+    
+    Args:
+        query (str): SELECT statement
+        params (tuple, list, dict, optional): Parameters for the query
+        db_name (str): Database to use ("cims" or "g12")
+        chunk_size (int, optional): Yield lists of this many rows instead of single rows
+        
+    Yields:
+        dict or list: Records, or lists of records if chunk_size is set
+    """
+    batch_size = chunk_size or STREAM_BATCH_SIZE
+    connection = get_db_connection(db_name)
+    cursor = None
+    finished = False
+    try:
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        cursor.execute(query, params)
+        
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if chunk_size:
+                yield rows
+            else:
+                yield from rows
+        
+        finished = True
+        
+    except Error as e:
+        logger.error(f"Error streaming query: {e}")
+        raise
+    finally:
+        if finished:
+            try:
+                cursor.close()
+                connection.rollback()
+                connection.close()
+            except Error:
+                connection.invalidate()
+        else:
+            connection.invalidate()
+
+def execute_query(query, params=None, db_name="g12", fetch=False, stream=False, chunk_size=None):
     """
     Execute a SQL query with optional parameters
     
@@ -93,13 +193,19 @@ def execute_query(query, params=None, db_name="g12", fetch=False):
         params (tuple, list, dict, optional): Parameters for the query
         db_name (str): Database to use ("cims" or "g12")
         fetch (bool): Whether to fetch results
+        stream (bool): Return a generator over the results (see stream_query)
+        chunk_size (int, optional): With stream, yield lists of this many records
         
     Returns:
-        list or int: Query results if fetch=True, or affected row count if fetch=False
+        list, int or generator: Query results if fetch=True, a generator if
+        stream=True, or affected row count otherwise
         
     Raises:
         Exception: If query execution fails
     """
+    if stream:
+        return stream_query(query, params, db_name, chunk_size)
+    
     connection = None
     cursor = None
     try:
@@ -123,7 +229,7 @@ def execute_query(query, params=None, db_name="g12", fetch=False):
     finally:
         if cursor:
             cursor.close()
-        if connection and connection.is_connected():
+        if connection:
             connection.close()
 
 # Generic CRUD functions
@@ -162,11 +268,137 @@ def create_record(table, data, db_name="g12"):
         logger.error(f"Error creating record in {table}: {e}")
         return -1
     finally:
-        if 'connection' in locals() and connection.is_connected():
+        if 'connection' in locals():
             cursor.close()
             connection.close()
 
-def read_records(table, columns="*", where=None, params=None, db_name="g12", limit=None, order_by=None):
+# Rows per multi-row INSERT in create_records_bulk
+BULK_BATCH_SIZE = 500
+
+def create_records_bulk(table, rows, db_name="g12", batch_size=BULK_BATCH_SIZE, upsert=False, update_columns=None,
+                        on_batch=None):
+    """
+    Insert many records in a single transaction
+    
+    Every row must have the same columns. Rows are sent with executemany,
+    which the driver rewrites into one multi-row INSERT per batch, and the
+    transaction is committed once at the end; any error rolls back every
+    batch.
+    
+    Rows are written as they are, without the counter, timeline and
+    cache maintenance the models do; wrappers of counted tables pass
+    on_batch to do it in the same transaction.
+    
+    Args:
+        table (str): Table name
+        rows (iterable): Dictionaries of column-value pairs
+        db_name (str): Database to use
+        batch_size (int): Rows per INSERT statement
+        upsert (bool): Update existing rows on duplicate keys instead of failing
+        update_columns (list, optional): Columns overwritten by an upsert (default all)
+        on_batch (callable, optional): Called as on_batch(cursor, rows) after
+            each batch is inserted, with a dictionary cursor on the same
+            transaction and the batch's rows as dictionaries
+        
+    Returns:
+        dict: "count" of rows written and "id_ranges", a list of
+        (first_id, last_id) per batch (empty for upserts), or None if the
+        insert failed. IDs within a batch are consecutive unless the server
+        uses innodb_autoinc_lock_mode=2 with concurrent inserts.
+        
+    Raises:
+        ValueError: If the rows do not all have the same columns
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return {"count": 0, "id_ranges": []}
+    
+    columns = list(first.keys())
+    column_set = set(columns)
+    
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    if upsert:
+        updates = update_columns or columns
+        query += " ON DUPLICATE KEY UPDATE " + ", ".join(f"{column} = VALUES({column})" for column in updates)
+    
+    def batches():
+        batch = []
+        for index, row in enumerate(itertools.chain([first], rows)):
+            if row.keys() != column_set:
+                raise ValueError(f"Row {index} of {table} has columns {sorted(row)}, expected {sorted(columns)}")
+            batch.append(tuple(row[column] for column in columns))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    connection = None
+    cursor = None
+    count = 0
+    id_ranges = []
+    try:
+        connection = get_db_connection(db_name)
+        cursor = connection.cursor(dictionary=on_batch is not None)
+        
+        for batch in batches():
+            cursor.executemany(query, batch)
+            count += len(batch)
+            if not upsert and cursor.lastrowid:
+                id_ranges.append((cursor.lastrowid, cursor.lastrowid + len(batch) - 1))
+            if on_batch:
+                on_batch(cursor, [dict(zip(columns, values)) for values in batch])
+        
+        connection.commit()
+        logger.info(f"Created {count} records in {table}")
+        
+        return {"count": count, "id_ranges": id_ranges}
+        
+    except Error as e:
+        if connection:
+            connection.rollback()
+        logger.error(f"Error bulk creating records in {table}: {e}")
+        return None
+    except ValueError:
+        if connection:
+            connection.rollback()
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+def _bulk_rows(rows, required, optional=()):
+    """
+    Normalize rows for a bulk wrapper so they share one column set
+    
+    Args:
+        rows (iterable): Dictionaries keyed by column name
+        required (tuple): Columns every row must provide
+        optional (tuple): Columns filled with None when missing
+        
+    Yields:
+        dict: Row with exactly the required and optional columns
+        
+    Raises:
+        ValueError: If a row misses a required column or has an unknown one
+    """
+    allowed = set(required) | set(optional)
+    for index, row in enumerate(rows):
+        missing = [column for column in required if column not in row]
+        unknown = [column for column in row if column not in allowed]
+        if missing or unknown:
+            raise ValueError(f"Row {index}: missing columns {missing}, unknown columns {unknown}")
+        
+        normalized = {column: row[column] for column in required}
+        for column in optional:
+            normalized[column] = row.get(column)
+        yield normalized
+
+def read_records(table, columns="*", where=None, params=None, db_name="g12", limit=None, order_by=None,
+                 stream=False, chunk_size=None):
     """
     Read records from a table
     
@@ -178,9 +410,12 @@ def read_records(table, columns="*", where=None, params=None, db_name="g12", lim
         db_name (str): Database to use
         limit (int, optional): Limit number of records
         order_by (str, optional): ORDER BY clause
+        stream (bool): Return a generator instead of a list; errors are
+            raised while iterating
+        chunk_size (int, optional): With stream, yield lists of this many records
         
     Returns:
-        list: List of records as dictionaries
+        list or generator: Records as dictionaries
     """
     try:
         query = f"SELECT {columns} FROM {table}"
@@ -194,6 +429,9 @@ def read_records(table, columns="*", where=None, params=None, db_name="g12", lim
         if limit:
             query += f" LIMIT {limit}"
             
+        if stream:
+            return stream_query(query, params, db_name, chunk_size)
+        
         records = execute_query(query, params, db_name, fetch=True)
         return records
         
@@ -201,6 +439,82 @@ def read_records(table, columns="*", where=None, params=None, db_name="g12", lim
         logger.error(f"Error reading records from {table}: {e}")
         return []
 
+def read_page(table, order_by, columns="*", where=None, params=None, db_name="g12",
+              cursor=None, per_page=pagination.DEFAULT_PER_PAGE, include_total=False):
+    """
+    Read one page of records using keyset pagination
+    
+    Args:
+        table (str): Table name
+        order_by (list): (column, descending) pairs; the last column must be unique
+        columns (str): Columns to select (default "*"); must include the order_by columns
+        where (str, optional): WHERE clause
+        params (tuple, optional): Parameters for WHERE clause
+        db_name (str): Database to use
+        cursor (str, optional): Cursor returned with the previous page
+        per_page (int): Records per page
+        include_total (bool): Add an approximate total record count
+        
+    Returns:
+        dict: items, per_page, next_cursor, prev_cursor, has_next, has_prev and total
+        
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    keys = [pagination.KeysetKey(column, descending=descending) for column, descending in order_by]
+    per_page = pagination.clamp_per_page(per_page)
+    seek_condition, seek_params, backward = pagination.resolve_cursor(keys, cursor)
+    
+    conditions = [f"({where})"] if where else []
+    query_params = list(params or [])
+    
+    total = None
+    if include_total:
+        total = estimate_record_count(table, where, params, db_name)
+    
+    if seek_condition:
+        conditions.append(seek_condition)
+        query_params.extend(seek_params)
+    
+    records = read_records(
+        table,
+        columns=columns,
+        where=" AND ".join(conditions) or None,
+        params=tuple(query_params),
+        db_name=db_name,
+        limit=per_page + 1,
+        order_by=pagination.order_clause(keys, backward)
+    )
+    
+    return pagination.make_page(records, keys, per_page, cursor, backward, total)
+
+def estimate_record_count(table, where=None, params=None, db_name="g12"):
+    """
+    Estimate the number of records matching a filter without scanning them
+    
+    Args:
+        table (str): Table name
+        where (str, optional): WHERE clause
+        params (tuple, optional): Parameters for WHERE clause
+        db_name (str): Database to use
+        
+    Returns:
+        int: Optimizer row estimate, or None if unavailable
+    """
+    query = f"EXPLAIN SELECT * FROM {table}"
+    if where:
+        query += f" WHERE {where}"
+    
+    try:
+        plan = execute_query(query, params, db_name, fetch=True)
+    except Error as e:
+        logger.error(f"Error estimating records in {table}: {e}")
+        return None
+    
+    if not plan or plan[0].get('rows') is None:
+        return None
+    return int(plan[0]['rows'])
+
 def update_record(table, data, where_clause, where_params, db_name="g12"):
     """
     Update records in a table
@@ -237,7 +551,7 @@ def update_record(table, data, where_clause, where_params, db_name="g12"):
         logger.error(f"Error updating records in {table}: {e}")
         return 0
     finally:
-        if 'connection' in locals() and connection.is_connected():
+        if 'connection' in locals():
             cursor.close()
             connection.close()
 
@@ -272,7 +586,7 @@ def delete_record(table, where_clause, where_params, db_name="g12"):
         logger.error(f"Error deleting records from {table}: {e}")
         return 0
     finally:
-        if 'connection' in locals() and connection.is_connected():
+        if 'connection' in locals():
             cursor.close()
             connection.close()
 
@@ -305,18 +619,20 @@ def create_doctor(name, specialization, email, contact_number, image=None):
         
     return create_record("G12_Doctors", data, "cims")
 
-def get_doctors(where=None, params=None):
+def get_doctors(where=None, params=None, include_image=False):
     """
     Get doctor records with optional filtering
     
     Args:
         where (str, optional): WHERE clause
         params (tuple, optional): Parameters for WHERE clause
+        include_image (bool): Also fetch the Image BLOB
         
     Returns:
         list: List of doctor records
     """
-    return read_records("G12_Doctors", where=where, params=params, db_name="cims")
+    columns = "*" if include_image else "DoctorID, Name, Specialization, Email, ContactNumber"
+    return read_records("G12_Doctors", columns=columns, where=where, params=params, db_name="cims")
 
 def update_doctor(doctor_id, data):
     """
@@ -367,6 +683,39 @@ def create_appointment(student_id, doctor_id, appointment_date, appointment_time
     }
     return create_record("Appointments", data)
 
+def create_appointments_bulk(appointments, batch_size=BULK_BATCH_SIZE):
+    """
+    Create many appointment records in one transaction
+    
+    The dashboard counters and the timelines of students with completed
+    appointments are updated in the same transaction, and the cached
+    availability of the booked days is dropped after the commit.
+    
+    Args:
+        appointments (iterable): Dicts with StudentID, DoctorID, AppointmentDate,
+            AppointmentTime and Status
+        batch_size (int): Rows per INSERT statement
+        
+    Returns:
+        dict: Result of create_records_bulk, or None if the insert failed
+    """
+    touched = set()
+    days = set()
+    
+    def on_batch(cursor, batch):
+        touched.update(counters.apply(cursor, counters.merge(*map(counters.appointment_deltas, batch))))
+        for student_id in {row["StudentID"] for row in batch if row["Status"] == "Completed"}:
+            timeline.sync_student_appointments(cursor, student_id)
+        days.update((row["DoctorID"], row["AppointmentDate"]) for row in batch)
+    
+    rows = _bulk_rows(appointments, ("StudentID", "DoctorID", "AppointmentDate", "AppointmentTime", "Status"))
+    result = create_records_bulk("Appointments", rows, batch_size=batch_size, on_batch=on_batch)
+    if result is not None:
+        counters.invalidate(touched)
+        for doctor_id, appointment_date in days:
+            DoctorAvailability.invalidate_cache(doctor_id, appointment_date)
+    return result
+
 def get_appointments(where=None, params=None):
     """
     Get appointment records with optional filtering
@@ -429,6 +778,32 @@ def create_doctor_availability(doctor_id, availability_date, start_time, end_tim
     }
     return create_record("DoctorAvailability", data)
 
+def create_doctor_availability_bulk(availabilities, batch_size=BULK_BATCH_SIZE):
+    """
+    Create many doctor availability records in one transaction
+    
+    The cached slot bitmaps of the days written are dropped after the commit.
+    
+    Args:
+        availabilities (iterable): Dicts with DoctorID, AvailabilityDate,
+            StartTime, EndTime and Status
+        batch_size (int): Rows per INSERT statement
+        
+    Returns:
+        dict: Result of create_records_bulk, or None if the insert failed
+    """
+    days = set()
+    
+    def on_batch(cursor, batch):
+        days.update((row["DoctorID"], row["AvailabilityDate"]) for row in batch)
+    
+    rows = _bulk_rows(availabilities, ("DoctorID", "AvailabilityDate", "StartTime", "EndTime", "Status"))
+    result = create_records_bulk("DoctorAvailability", rows, batch_size=batch_size, on_batch=on_batch)
+    if result is not None:
+        for doctor_id, availability_date in days:
+            DoctorAvailability.invalidate_cache(doctor_id, availability_date)
+    return result
+
 def get_doctor_availability(where=None, params=None):
     """
     Get doctor availability records with optional filtering
@@ -625,6 +1000,21 @@ def create_medication(name, dosage_form, quantity_in_stock, expiry_date=None):
         
     return create_record("Medications", data)
 
+def create_medications_bulk(medications, batch_size=BULK_BATCH_SIZE):
+    """
+    Create many medication records in one transaction
+    
+    Args:
+        medications (iterable): Dicts with Name, DosageForm, QuantityInStock
+            and optionally ExpiryDate
+        batch_size (int): Rows per INSERT statement
+        
+    Returns:
+        dict: Result of create_records_bulk, or None if the insert failed
+    """
+    rows = _bulk_rows(medications, ("Name", "DosageForm", "QuantityInStock"), ("ExpiryDate",))
+    return create_records_bulk("Medications", rows, batch_size=batch_size)
+
 def get_medications(where=None, params=None):
     """
     Get medication records with optional filtering
@@ -822,6 +1212,21 @@ def create_staff(first_name, last_name, role, email=None, contact_number=None):
         
     return create_record("Staff", data)
 
+def create_staff_bulk(staff_members, batch_size=BULK_BATCH_SIZE):
+    """
+    Create many staff records in one transaction
+    
+    Args:
+        staff_members (iterable): Dicts with FirstName, LastName, Role and
+            optionally Email and ContactNumber
+        batch_size (int): Rows per INSERT statement
+        
+    Returns:
+        dict: Result of create_records_bulk, or None if the insert failed
+    """
+    rows = _bulk_rows(staff_members, ("FirstName", "LastName", "Role"), ("Email", "ContactNumber"))
+    return create_records_bulk("Staff", rows, batch_size=batch_size)
+
 def get_staff(where=None, params=None):
     """
     Get staff records with optional filtering
@@ -897,6 +1302,26 @@ def create_student(first_name, last_name, gender, dob=None, email=None, address=
         
     return create_record("Students", data)
 
+def create_students_bulk(students, batch_size=BULK_BATCH_SIZE, upsert=False, update_columns=None):
+    """
+    Create many student records in one transaction
+    
+    Args:
+        students (iterable): Dicts with FirstName, LastName, Gender and
+            optionally DateOfBirth, Email, Address and ContactNumber
+        batch_size (int): Rows per INSERT statement
+        upsert (bool): Update students whose unique keys already exist
+        update_columns (list, optional): Columns overwritten by an upsert;
+            by default every column, so missing optional values become NULL
+        
+    Returns:
+        dict: Result of create_records_bulk, or None if the insert failed
+    """
+    rows = _bulk_rows(students, ("FirstName", "LastName", "Gender"),
+                      ("DateOfBirth", "Email", "Address", "ContactNumber"))
+    return create_records_bulk("Students", rows, batch_size=batch_size, upsert=upsert,
+                               update_columns=update_columns)
+
 def get_students(where=None, params=None):
     """
     Get student records with optional filtering
@@ -6,9 +6,12 @@ from app.models.doctors import Doctor, DoctorAvailability
 from app.models.appointments import Appointment
 from app.models.prescriptions import Prescription
 from app.models.students import Student
+from app.models.timeline import StudentTimeline
 from app.models.medications import Medication
+from app.models.stats import DashboardStats
 from app.utils.helpers import log_activity, check_permission
 from app.utils.database import get_db_connection
+from app.utils.pagination import get_page_params
 
 doctor = Blueprint('doctor', __name__)
 
@@ -27,16 +30,8 @@ def dashboard():
     # Get doctor details
     doctor_details = Doctor.get_by_id(doctor_id)
     
-    # Get today's date
-    current_date = datetime.now().strftime('%Y-%m-%d')
-    
     # Get statistics for dashboard
-    stats = {
-        'appointments_today': len(Appointment.get_by_doctor(doctor_id, date=current_date)),
-        'pending_appointments': len(Appointment.get_by_doctor(doctor_id, status='Scheduled')),
-        'prescriptions_issued': len(Prescription.get_by_doctor(doctor_id)),
-        'patients_seen': len(set([appt['StudentID'] for appt in Appointment.get_by_doctor(doctor_id, status='Completed')]))
-    }
+    stats = DashboardStats.get_doctor_stats(doctor_id)
     
     # Get recent activities
     activities = []
@@ -61,13 +56,19 @@ def appointments():
     # Get doctor details
     doctor_details = Doctor.get_by_id(doctor_id)
     
-    # Get all appointments for this doctor
-    appointments_list = Appointment.get_by_doctor(doctor_id)
+    # Get one page of appointments for this doctor
+    cursor, per_page = get_page_params(request)
+    try:
+        page = Appointment.get_page(doctor_id=doctor_id, cursor=cursor, per_page=per_page)
+    except ValueError:
+        flash('Invalid page requested.', 'danger')
+        return redirect(url_for('doctor.appointments'))
     
     return render_template(
         'doctor/appointments.html',
         doctor=doctor_details,
-        appointments=appointments_list
+        appointments=page['items'],
+        page=page
     )
 
 @doctor.route('/view_appointment/<int:appointment_id>')
@@ -100,6 +101,32 @@ def view_appointment(appointment_id):
         medications=medications
     )
 
+@doctor.route('/api/students/<int:student_id>/timeline')
+def api_student_timeline(student_id):
+    """
+    API endpoint to get a patient's medical history, newest first.
+    
+    Only doctors who have an appointment with the student may read it.
+    Older entries are fetched by passing back next_cursor.
+    """
+    doctor_id = session.get('user_id')
+    
+    if not Appointment.get_page(doctor_id=doctor_id, student_id=student_id, per_page=1)['items']:
+        return jsonify({'success': False, 'message': 'Not authorized.'}), 403
+    
+    cursor, per_page = get_page_params(request)
+    try:
+        page = StudentTimeline.get_page(student_id, cursor=cursor, per_page=per_page)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'events': [StudentTimeline.to_dict(row) for row in page['items']],
+        'next_cursor': page['next_cursor'],
+        'has_next': page['has_next']
+    })
+
 @doctor.route('/update_appointment/<int:appointment_id>', methods=['POST'])
 def update_appointment(appointment_id):
     """Update appointment status."""
@@ -247,8 +274,13 @@ def prescriptions():
     # Get doctor details
     doctor_details = Doctor.get_by_id(doctor_id)
     
-    # Get all prescriptions by this doctor
-    prescriptions_list = Prescription.get_by_doctor(doctor_id)
+    # Get one page of prescriptions by this doctor
+    cursor, per_page = get_page_params(request)
+    try:
+        page = Prescription.get_page(doctor_id=doctor_id, cursor=cursor, per_page=per_page)
+    except ValueError:
+        flash('Invalid page requested.', 'danger')
+        return redirect(url_for('doctor.prescriptions'))
     
     # Get all students and medications for the form
     students = Student.get_all()
@@ -260,7 +292,8 @@ def prescriptions():
     return render_template(
         'doctor/prescriptions.html',
         doctor=doctor_details,
-        prescriptions=prescriptions_list,
+        prescriptions=page['items'],
+        page=page,
         students=students,
         medications=medications,
         appointments=appointments
@@ -1,10 +1,20 @@
-from flask import Blueprint, render_template, redirect, url_for, session, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, session, request, jsonify, send_file, abort, current_app
+import os
+import ipaddress
 from datetime import datetime, timedelta
 
 from app.models.appointments import Appointment
-from app.models.prescriptions import Prescription, MedicineGiven
+from app.models.doctors import Doctor
+from app.models.prescriptions import Prescription, MedicineGiven, DispensingQueue
 from app.models.medications import Medication
+from app.models.stats import DashboardStats
+from app.models.activity import ActivityLog
+from app.models.notifications import Notification
 from app.utils.helpers import log_activity, get_current_date
+from app.utils import images, events
+from app.utils.events import broker
+from app.utils.metrics import metrics
+from app.utils.pagination import get_page_params
 
 main = Blueprint('main', __name__)
 
@@ -52,6 +62,72 @@ def faq():
     """FAQ page route."""
     return render_template('faq.html')
 
+@main.route('/doctors/<int:doctor_id>/image')
+def doctor_image(doctor_id):
+    """Serve a doctor's image, resized and cached on disk."""
+    size = request.args.get('size', 'thumb')
+    if size not in images.IMAGE_SIZES:
+        abort(404)
+    
+    digest = Doctor.get_image_digest(doctor_id)
+    if not digest:
+        abort(404)
+    
+    etag = f'{digest}-{size}'
+    
+    # Revalidation needs neither the BLOB nor the cached file
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        path = images.cached_image_path(current_app.config['IMAGE_CACHE_FOLDER'], doctor_id, digest, size)
+        if not os.path.exists(path):
+            data = Doctor.get_image(doctor_id)
+            if not data:
+                abort(404)
+            images.store_image(path, data, size)
+        
+        with open(path, 'rb') as image_file:
+            mimetype = images.sniff_mimetype(image_file.read(16))
+        response = send_file(os.path.abspath(path), mimetype=mimetype, conditional=False)
+    
+    # The URL stays the same when the image changes, so browsers revalidate
+    # every time; with the digest cached a 304 usually costs no database query
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+def _is_loopback(address):
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+@main.route('/metrics')
+def prometheus_metrics():
+    """
+    Expose application metrics in the Prometheus text format.
+    
+    Scrapers authenticate with METRICS_TOKEN; without a token configured
+    only requests from the loopback interface are served.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+    elif not _is_loopback(request.remote_addr):
+        abort(403)
+    
+    try:
+        depth = DispensingQueue.get_depth()
+        metrics.set_gauge('cims_dispense_queue_depth', {'state': 'pending'}, depth['pending'])
+        metrics.set_gauge('cims_dispense_queue_depth', {'state': 'claimed'}, depth['claimed'])
+    except Exception as e:
+        current_app.logger.error(f"Error reading dispensing queue depth: {e}")
+    
+    metrics.flush(force=True)
+    return current_app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @main.route('/api/dashboard/stats')
 def api_dashboard_stats():
     """API endpoint to get dashboard statistics."""
@@ -61,77 +137,110 @@ def api_dashboard_stats():
     user_id = session.get('user_id')
     role = session.get('role')
     
-    stats = {}
-    
-    if role == 'doctor':
-        # Get today's date
-        current_date = datetime.now().strftime('%Y-%m-%d')
-        
-        stats = {
-            'appointments_today': len(Appointment.get_by_doctor(user_id, date=current_date)),
-            'pending_appointments': len(Appointment.get_by_doctor(user_id, status='Scheduled')),
-            'prescriptions_issued': len(Prescription.get_by_doctor(user_id)),
-            'patients_seen': len(set([appt['StudentID'] for appt in Appointment.get_by_doctor(user_id, status='Completed')]))
-        }
-    elif role == 'staff':
-        # Get today's date
-        current_date = datetime.now().strftime('%Y-%m-%d')
-        
-        stats = {
-            'pending_prescriptions': len(Prescription.get_unfulfilled()),
-            'low_stock_medications': len(Medication.get_low_stock()),
-            'medicines_dispensed_today': len(MedicineGiven.get_by_date(current_date)),
-            'total_students_served': len(set([p['StudentID'] for p in Prescription.get_all()]))
-        }
-    elif role == 'student':
-        stats = {
-            'upcoming_appointments': len(Appointment.get_by_student(user_id)),
-            'pending_prescriptions': len([p for p in Prescription.get_by_student(user_id) if not p.get('DateGiven')]),
-            'total_appointments': len(Appointment.get_by_student(user_id)),
-            'total_prescriptions': len(Prescription.get_by_student(user_id))
-        }
+    # Counters are primary-key reads of DashboardCounters
+    stats = DashboardStats.get_for_role(role, user_id)
     
     return jsonify({'success': True, 'stats': stats})
 
 @main.route('/api/dashboard/activity')
 def api_dashboard_activity():
-    """API endpoint to get dashboard activity."""
+    """
+    API endpoint to get dashboard activity.
+    
+    Returns the user's own activity, or with scope=role the activity of
+    everyone with the same role (doctors and staff only). Older entries
+    are fetched by passing back next_cursor.
+    """
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated.'})
     
     user_id = session.get('user_id')
     role = session.get('role')
+    cursor, per_page = get_page_params(request)
     
-    # Get activity logs
-    activities = []
+    if request.args.get('scope') == 'role':
+        if role not in ActivityLog.SHARED_ROLES:
+            return jsonify({'success': False, 'message': 'Not authorized.'}), 403
+        filters = {'role': role}
+    else:
+        filters = {'user_id': user_id}
     
-    # This would typically come from an ActivityLog table
-    # For now, we'll return an empty list
+    try:
+        page = ActivityLog.get_feed(cursor=cursor, per_page=per_page, **filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    return jsonify({'success': True, 'activities': activities})
+    return jsonify({
+        'success': True,
+        'activities': [ActivityLog.to_dict(row) for row in page['items']],
+        'next_cursor': page['next_cursor'],
+        'has_next': page['has_next']
+    })
 
 @main.route('/api/notifications')
 def api_notifications():
-    """API endpoint to get notifications."""
+    """
+    API endpoint to get notifications.
+    
+    Used on page load, after a stream reset and by dashboards that cannot
+    keep an event stream open. Pass the last_id of the previous response
+    as since to count new ones.
+    """
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated.'})
     
     user_id = session.get('user_id')
     role = session.get('role')
     
-    # Get notifications
-    notifications = []
-    new_notifications = 0
+    # Stored notifications, so every worker returns the same list
+    notifications = [Notification.to_dict(row) for row in Notification.get_recent(role, user_id)]
     
-    # This would typically come from a Notifications table
-    # For now, we'll return an empty list
+    since = request.args.get('since', type=int)
+    new_notifications = 0
+    if since is not None:
+        new_notifications = sum(1 for notification in notifications if notification['id'] > since)
     
     return jsonify({
         'success': True, 
         'notifications': notifications,
-        'new_notifications': new_notifications
+        'new_notifications': new_notifications,
+        'last_id': notifications[0]['id'] if notifications else since
     })
 
+@main.route('/api/events/stream')
+def api_event_stream():
+    """
+    Server-Sent Events stream of dashboard stats, activity and notifications.
+    
+    The generator does not run inside the request context, so the
+    request's database connections are released before streaming starts
+    and an idle stream only holds a worker thread.
+    """
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated.'}), 401
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription = broker.subscribe(session.get('role'), session.get('user_id'), last_event_id)
+    
+    if subscription is None:
+        # The client falls back to polling
+        response = jsonify({'success': False, 'message': 'Too many open event streams.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    
+    response = current_app.response_class(
+        events.stream(
+            subscription,
+            heartbeat=current_app.config['SSE_HEARTBEAT'],
+            max_duration=current_app.config['SSE_MAX_DURATION']
+        ),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @main.route('/api/medications')
 def api_medications():
     """API endpoint to get medications."""
@@ -349,13 +458,18 @@ def api_dispense_medicine():
     date_given = get_current_date()
     
     result = MedicineGiven.create(
-        prescription_id, medication_id, date_given, quantity_given
+        prescription_id, medication_id, date_given, quantity_given,
+        staff_id=session.get('user_id')
     )
     
     if result > 0:
         log_activity('dispense_medicine', f'Dispensed medicine for prescription {prescription_id}')
         return jsonify({'success': True, 'message': 'Medicine dispensed successfully.'})
-    elif result == -1:
+    elif result == MedicineGiven.NOT_ENOUGH_STOCK:
         return jsonify({'success': False, 'message': 'Failed to dispense medicine. Not enough stock available.'})
+    elif result == MedicineGiven.CLAIMED_BY_OTHER:
+        return jsonify({'success': False, 'message': 'Another staff member is dispensing this prescription.'})
+    elif result == MedicineGiven.ALREADY_DISPENSED:
+        return jsonify({'success': False, 'message': 'This prescription has already been dispensed.'})
     else:
         return jsonify({'success': False, 'message': 'Failed to dispense medicine.'})
@@ -1,12 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, Response,
+                   stream_with_context, current_app)
 from datetime import datetime, timedelta
+import csv
+import io
 
 from app.models.staff import Staff
-from app.models.prescriptions import Prescription, MedicineGiven
+from app.models.prescriptions import Prescription, MedicineGiven, DispensingQueue
 from app.models.medications import Medication
 from app.models.students import Student
+from app.models.stats import DashboardStats
 from app.utils.helpers import log_activity, check_permission
 from app.utils.database import get_db_connection
+from app.utils.pagination import get_page_params
 
 staff = Blueprint('staff', __name__)
 
@@ -25,22 +30,14 @@ def dashboard():
     # Get staff details
     staff_details = Staff.get_by_id(staff_id)
     
-    # Get today's date
-    current_date = datetime.now().strftime('%Y-%m-%d')
-    
     # Get statistics for dashboard
-    stats = {
-        'pending_prescriptions': len(Prescription.get_unfulfilled()),
-        'low_stock_medications': len(Medication.get_low_stock()),
-        'medicines_dispensed_today': len(MedicineGiven.get_by_date(current_date)),
-        'total_students_served': len(set([p['StudentID'] for p in Prescription.get_all()]))
-    }
+    stats = DashboardStats.get_staff_stats()
     
     # Get recent activities
     activities = []
     
-    # Get pending prescriptions
-    pending_prescriptions = Prescription.get_unfulfilled()
+    # Get the oldest pending prescriptions
+    pending_prescriptions = Prescription.get_unfulfilled(limit=10)
     
     return render_template(
         'staff/dashboard.html',
@@ -198,17 +195,52 @@ def prescriptions():
     # Get staff details
     staff_details = Staff.get_by_id(staff_id)
     
-    # Get pending prescriptions
+    # Get pending prescriptions and the queue size
     pending_prescriptions = Prescription.get_unfulfilled()
+    queue_depth = DispensingQueue.get_depth()
     
-    # Get dispensed medications
-    dispensed_medications = MedicineGiven.get_all()
+    # Get one page of dispensed medications
+    cursor, per_page = get_page_params(request)
+    try:
+        page = MedicineGiven.get_page(cursor=cursor, per_page=per_page)
+    except ValueError:
+        flash('Invalid page requested.', 'danger')
+        return redirect(url_for('staff.prescriptions'))
     
     return render_template(
         'staff/prescriptions.html',
         staff=staff_details,
         pending_prescriptions=pending_prescriptions,
-        dispensed_medications=dispensed_medications
+        queue_depth=queue_depth,
+        dispensed_medications=page['items'],
+        page=page
+    )
+
+@staff.route('/prescriptions/export')
+def export_dispensed():
+    """Download the full dispensing history as CSV, streamed row by row."""
+    columns = ['MedicineGivenID', 'DateGiven', 'StudentFirstName', 'StudentLastName',
+               'MedicationName', 'QuantityGiven', 'DoctorName']
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        
+        for rows in MedicineGiven.iter_all(chunk_size=500):
+            for row in rows:
+                writer.writerow([row[column] for column in columns])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        yield buffer.getvalue()
+    
+    filename = f"dispensed_medications_{datetime.now().strftime('%Y%m%d')}.csv"
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
 
 @staff.route('/dispense_medicine/<int:prescription_id>', methods=['GET', 'POST'])
@@ -221,6 +253,11 @@ def dispense_medicine(prescription_id):
         flash('Prescription not found.', 'danger')
         return redirect(url_for('staff.prescriptions'))
     
+    # Opening the prescription claims it (or extends our claim) so nobody else works on it
+    if not DispensingQueue.claim_one(prescription_id, session.get('user_id'), current_app.config['DISPENSE_CLAIM_SECONDS']):
+        flash('This prescription is already dispensed or being dispensed by another staff member.', 'warning')
+        return redirect(url_for('staff.prescriptions'))
+    
     if request.method == 'POST':
         # Get form data
         quantity_given = request.form.get('quantity_given')
@@ -246,15 +283,19 @@ def dispense_medicine(prescription_id):
             prescription_id, 
             prescription['MedicationID'], 
             date_given, 
-            quantity_given
+            quantity_given,
+            staff_id=session.get('user_id')
         )
         
         if result > 0:
             flash('Medicine dispensed successfully.', 'success')
             log_activity('dispense_medicine', f'Dispensed medication for prescription {prescription_id}')
             return redirect(url_for('staff.prescriptions'))
-        elif result == -1:
+        elif result == MedicineGiven.NOT_ENOUGH_STOCK:
             flash('Failed to dispense medicine. Not enough stock available.', 'danger')
+        elif result in (MedicineGiven.CLAIMED_BY_OTHER, MedicineGiven.ALREADY_DISPENSED):
+            flash('This prescription is already dispensed or being dispensed by another staff member.', 'warning')
+            return redirect(url_for('staff.prescriptions'))
         else:
             flash('Failed to dispense medicine.', 'danger')
     
@@ -295,14 +336,56 @@ def api_dispense_medicine():
         prescription_id, 
         medication_id, 
         date_given, 
-        quantity_given
+        quantity_given,
+        staff_id=session.get('user_id')
     )
     
     if result > 0:
         log_activity('dispense_medicine', f'Dispensed medication for prescription {prescription_id}')
         return jsonify({'success': True, 'message': 'Medicine dispensed successfully.'})
-    elif result == -1:
+    elif result == MedicineGiven.NOT_ENOUGH_STOCK:
         return jsonify({'success': False, 'message': 'Failed to dispense medicine. Not enough stock available.'})
+    elif result == MedicineGiven.CLAIMED_BY_OTHER:
+        return jsonify({'success': False, 'message': 'Another staff member is dispensing this prescription.'})
+    elif result == MedicineGiven.ALREADY_DISPENSED:
+        return jsonify({'success': False, 'message': 'This prescription has already been dispensed.'})
     else:
         return jsonify({'success': False, 'message': 'Failed to dispense medicine.'})
 
+@staff.route('/queue/next', methods=['POST'])
+def claim_next_prescription():
+    """Claim the oldest unclaimed prescription and open it."""
+    claimed = DispensingQueue.claim(session.get('user_id'), 1, current_app.config['DISPENSE_CLAIM_SECONDS'])
+    
+    if not claimed:
+        flash('No prescriptions are waiting to be dispensed.', 'info')
+        return redirect(url_for('staff.prescriptions'))
+    
+    return redirect(url_for('staff.dispense_medicine', prescription_id=claimed[0]))
+
+@staff.route('/api/queue/claim', methods=['POST'])
+def api_claim_prescriptions():
+    """API endpoint to claim the next prescriptions of the dispensing queue."""
+    try:
+        count = min(max(int(request.form.get('count', 1)), 1), 20)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'count must be a number.'})
+    
+    claimed = DispensingQueue.claim(session.get('user_id'), count, current_app.config['DISPENSE_CLAIM_SECONDS'])
+    
+    return jsonify({'success': True, 'prescription_ids': claimed})
+
+@staff.route('/api/queue/<int:prescription_id>/claim', methods=['POST'])
+def api_claim_prescription(prescription_id):
+    """API endpoint to claim a specific prescription before dispensing it."""
+    if not DispensingQueue.claim_one(prescription_id, session.get('user_id'), current_app.config['DISPENSE_CLAIM_SECONDS']):
+        return jsonify({'success': False, 'message': 'Already dispensed or being dispensed by another staff member.'})
+    
+    return jsonify({'success': True})
+
+@staff.route('/api/queue/<int:prescription_id>/release', methods=['POST'])
+def api_release_prescription(prescription_id):
+    """API endpoint to give up a claim without dispensing."""
+    released = DispensingQueue.release(prescription_id, session.get('user_id'))
+    
+    return jsonify({'success': released})
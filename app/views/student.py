@@ -5,7 +5,9 @@ from app.models.students import Student
 from app.models.doctors import Doctor, DoctorAvailability
 from app.models.appointments import Appointment
 from app.models.prescriptions import Prescription
+from app.models.stats import DashboardStats
 from app.utils.helpers import log_activity, check_permission
+from app.utils.slots import serialize_slots
 from app.utils.database import get_db_connection
 # from app.views.crud import get_doctor_availability
 student = Blueprint('student', __name__)
@@ -25,20 +27,11 @@ def dashboard():
     # Get student details
     student_details = Student.get_by_id(student_id)
     
-    # Get today's date
-    current_date = datetime.now().strftime('%Y-%m-%d')
-    appointments = Appointment.get_by_student(student_id)
-    upcoming_appointments = [a for a in appointments if a.status == 'Scheduled']
     # Get statistics for dashboard
-    stats = {
-        'upcoming_appointments': len(upcoming_appointments),
-        'pending_prescriptions': len([p for p in Prescription.get_by_student(student_id) if not p.get('DateGiven')]),
-        'total_appointments': len(Appointment.get_by_student(student_id)),
-        'total_prescriptions': len(Prescription.get_by_student(student_id))
-    }
+    stats = DashboardStats.get_student_stats(student_id)
     
     # Get upcoming appointments
-    upcoming_appointments = [a for a in appointments if a.status == 'Scheduled']
+    upcoming_appointments = Appointment.get_upcoming_by_student(student_id)
     
     # Get recent prescriptions
     recent_prescriptions = Prescription.get_by_student(student_id)[:5]  # Get only the 5 most recent
@@ -58,9 +51,10 @@ def doctors():
     # Get all doctors
     doctors_list = Doctor.get_all()
     
-    # Get availability for each doctor
+    # Get availability for all doctors in one query
+    availability = DoctorAvailability.get_by_doctors(doctor['DoctorID'] for doctor in doctors_list)
     for doctor in doctors_list:
-        doctor['availability'] = DoctorAvailability.get_by_doctor(doctor['DoctorID'])
+        doctor['availability'] = availability[doctor['DoctorID']]
     
     return render_template(
         'student/doctors.html',
@@ -112,31 +106,16 @@ def book_appointment():
             flash('Please fill all required fields.', 'danger')
             return redirect(url_for('student.appointments'))
     
-    # Check if slot is available
-    available_slots = DoctorAvailability.get_available_slots(doctor_id, appointment_date)
-    slot_available = False
-    
-    for slot in available_slots:
-        if slot['time'] == appointment_time and slot['status'] == 'Available':
-            slot_available = True
-            break
+    # Reserve the slot; the insert itself rejects concurrent bookings
+    result = Appointment.book(student_id, doctor_id, appointment_date, appointment_time)
     
-    if not slot_available:
+    if result in (Appointment.SLOT_TAKEN, Appointment.SLOT_UNAVAILABLE):
         if request.is_json:
             return jsonify({'success': False, 'message': 'Selected time slot is not available.'})
         else:
             flash('Selected time slot is not available.', 'danger')
             return redirect(url_for('student.appointments'))
     
-    # Create new appointment
-    result = Appointment.create(
-        student_id, 
-        doctor_id, 
-        appointment_date, 
-        appointment_time, 
-        'Scheduled'
-    )
-    
     if result > 0:
         if request.is_json:
             return jsonify({'success': True, 'message': 'Appointment booked successfully.'})
@@ -182,19 +161,15 @@ def book_appointment_for_doctor(doctor_id):
                 today=today
             )
         
-        # Create new appointment
-        result = Appointment.create(
-            student_id, 
-            doctor_id, 
-            appointment_date, 
-            time_slot, 
-            'Scheduled'
-        )
+        # Reserve the slot; the insert itself rejects concurrent bookings
+        result = Appointment.book(student_id, doctor_id, appointment_date, time_slot)
         
         if result > 0:
             flash('Appointment booked successfully.', 'success')
             log_activity('book_appointment', f'Booked appointment with doctor {doctor_id} on {appointment_date} at {time_slot}')
             return redirect(url_for('student.appointments'))
+        elif result in (Appointment.SLOT_TAKEN, Appointment.SLOT_UNAVAILABLE):
+            flash('Selected time slot is not available.', 'danger')
         else:
             flash('Failed to book appointment.', 'danger')
             
@@ -232,21 +207,7 @@ def get_available_slots(doctor_id, date):
         )
         
         # Transform the data into the format expected by the frontend
-        slots = []
-        for slot in availability_slots:
-            # Check if we have the expected keys
-            if 'time' not in slot or 'status' not in slot:
-                continue
-                
-            # Format the time value
-            time_str = slot['time']
-            time_parts = time_str.split(':')  # Split HH:MM:SS
-            start_time = f"{time_parts[0]}:{time_parts[1]}"  # HH:MM
-            
-            slots.append({
-                "StartTime": start_time,
-                "Status": slot['status'].capitalize()  # Convert 'available' to 'Available'
-            })
+        slots = serialize_slots(availability_slots, 'StartTime', 'Status')
             
         return jsonify({"slots": slots})
     except Exception as e:
@@ -323,20 +284,7 @@ def api_appointments_availability():
         slots = DoctorAvailability.get_available_slots(doctor_id, date)
         
         # Format slots for frontend display
-        formatted_slots = []
-        for slot in slots:
-            if 'time' not in slot or 'status' not in slot:
-                continue
-                
-            # Format the time value
-            time_str = slot['time']
-            time_parts = time_str.split(':')  # Split HH:MM:SS
-            start_time = f"{time_parts[0]}:{time_parts[1]}"  # HH:MM
-            
-            formatted_slots.append({
-                "StartTime": start_time,
-                "Status": slot['status'].capitalize()  # Convert 'available' to 'Available'
-            })
+        formatted_slots = serialize_slots(slots, 'StartTime', 'Status')
         
         return jsonify({
             'success': True,
@@ -0,0 +1,125 @@
+"""
+Contention benchmark for Appointment.book.
+
+Fires concurrent booking attempts at a single slot and reports throughput,
+latency and how many live appointments ended up in the slot. Anything
+above one is a double booking.
+
+Usage:
+    python -m benchmarks.booking_contention --doctor-id 1 --date 2026-11-02 \
+        --time 09:00 --students 1,2,3,4 --attempts 500 --concurrency 32
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app
+from app.config import Config
+from app.models.appointments import Appointment
+from app.utils.database import get_db
+
+
+def percentile(values, fraction):
+    """Get a percentile from a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def count_live_bookings(app, doctor_id, date, time_slot):
+    """Count appointments that still occupy the slot."""
+    with app.app_context():
+        cursor = get_db().cursor(dictionary=True)
+        cursor.execute(
+            "SELECT COUNT(*) AS Total FROM Appointments "
+            "WHERE DoctorID = %s AND AppointmentDate = %s AND AppointmentTime = %s "
+            "AND Status != 'Cancelled'",
+            (doctor_id, date, time_slot)
+        )
+        total = cursor.fetchone()['Total']
+        cursor.close()
+        return total
+
+
+def delete_appointments(app, appointment_ids):
+    """Remove the appointments created by the benchmark."""
+    with app.app_context():
+        for appointment_id in appointment_ids:
+            Appointment.delete(appointment_id)
+
+
+def run(args):
+    class BenchmarkConfig(Config):
+        DB_POOL_MAX_SIZE = args.concurrency
+
+    app = create_app(BenchmarkConfig)
+    students = [student.strip() for student in args.students.split(',') if student.strip()]
+    time_slot = args.time if args.time.count(':') == 2 else f'{args.time}:00'
+
+    results = {'booked': [], 'taken': 0, 'unavailable': 0, 'errors': 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def attempt(number):
+        student_id = students[number % len(students)]
+        started = time.perf_counter()
+        with app.app_context():
+            result = Appointment.book(student_id, args.doctor_id, args.date, time_slot)
+        elapsed = time.perf_counter() - started
+
+        with lock:
+            latencies.append(elapsed)
+            if result > 0:
+                results['booked'].append(result)
+            elif result == Appointment.SLOT_TAKEN:
+                results['taken'] += 1
+            elif result == Appointment.SLOT_UNAVAILABLE:
+                results['unavailable'] += 1
+            else:
+                results['errors'] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(attempt, range(args.attempts)))
+    elapsed = time.perf_counter() - started
+
+    live = count_live_bookings(app, args.doctor_id, args.date, time_slot)
+
+    print(f"Attempts:         {args.attempts} ({args.concurrency} concurrent)")
+    print(f"Booked:           {len(results['booked'])}")
+    print(f"Conflicts:        {results['taken']}")
+    print(f"Unavailable:      {results['unavailable']}")
+    print(f"Errors:           {results['errors']}")
+    print(f"Elapsed:          {elapsed:.3f} s")
+    print(f"Throughput:       {args.attempts / elapsed:.1f} attempts/s")
+    print(f"Latency p50:      {percentile(latencies, 0.50) * 1000:.2f} ms")
+    print(f"Latency p99:      {percentile(latencies, 0.99) * 1000:.2f} ms")
+    print(f"Latency mean:     {statistics.mean(latencies) * 1000:.2f} ms")
+    print(f"Live bookings:    {live}")
+    print(f"Double bookings:  {max(0, live - 1)}")
+
+    if not args.keep:
+        delete_appointments(app, results['booked'])
+
+    return 1 if live > 1 else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent booking benchmark for a single slot')
+    parser.add_argument('--doctor-id', type=int, required=True, help='Doctor to book')
+    parser.add_argument('--date', required=True, help='Appointment date (YYYY-MM-DD)')
+    parser.add_argument('--time', required=True, help='Slot start time (HH:MM)')
+    parser.add_argument('--students', required=True, help='Comma separated student IDs to book as')
+    parser.add_argument('--attempts', type=int, default=500, help='Total booking attempts')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent workers')
+    parser.add_argument('--keep', action='store_true', help='Keep the booked appointments')
+    raise SystemExit(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
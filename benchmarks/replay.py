@@ -0,0 +1,341 @@
+"""
+Replay recorded request traces as load.
+
+Reads the JSON lines traces written when TRACE_LOG is set (see
+app/utils/tracing.py) and sends the same requests, as the same roles and
+users, against a running server or an in-process app. Requests are sent
+at the recorded pace, scaled by --speed, or as fast as the workers allow
+with --speed 0. The report gives throughput, error rate and latency
+percentiles per endpoint, plus how far the sender fell behind schedule
+when it could not keep up.
+
+Sessions are recreated by signing a session cookie with the app's
+SECRET_KEY, so the recorded user IDs must exist in the target database.
+A request counts as an error when it fails, or when it returns a 4xx or
+5xx status that differs from the recorded one. Redirects are not followed.
+
+Usage:
+    TRACE_LOG=instance/traces.jsonl flask --app run run
+    python -m benchmarks.replay instance/traces.jsonl --target http://127.0.0.1:5000 \
+        --speed 4 --concurrency 32
+    python -m benchmarks.replay instance/traces.jsonl --in-process --speed 0 --endpoints book_appointment
+    python -m benchmarks.replay instance/traces.jsonl --window 08:55-09:30 --speed 1 --concurrency 64
+"""
+
+import argparse
+import datetime
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.booking_contention import percentile
+
+
+def load_traces(path, endpoints=None, roles=None, window=None, limit=None):
+    """
+    Read traces in start order.
+
+    Args:
+        path (str): JSON lines trace file
+        endpoints (list, optional): Keep endpoints containing one of these substrings
+        roles (list, optional): Keep requests made with these session roles
+        window (tuple, optional): Keep requests started between these local
+            times of day, as ('HH:MM', 'HH:MM')
+        limit (int, optional): Keep the first this many requests
+
+    Returns:
+        list: Trace dicts
+    """
+    traces = []
+    with open(path, encoding='utf-8') as trace_file:
+        for line in trace_file:
+            if not line.strip():
+                continue
+            trace = json.loads(line)
+            if endpoints and not any(pattern in (trace.get('endpoint') or trace['path']) for pattern in endpoints):
+                continue
+            if roles and trace.get('role') not in roles:
+                continue
+            if window:
+                time_of_day = datetime.datetime.fromtimestamp(trace['ts']).strftime('%H:%M')
+                if not window[0] <= time_of_day < window[1]:
+                    continue
+            traces.append(trace)
+    traces.sort(key=lambda trace: trace['ts'])
+    return traces[:limit] if limit else traces
+
+
+def session_signer(secret_key):
+    """Get a function that signs a session cookie for (user, role)."""
+    from flask import Flask
+    from flask.sessions import SecureCookieSessionInterface
+
+    signing_app = Flask(__name__)
+    signing_app.secret_key = secret_key
+    serializer = SecureCookieSessionInterface().get_signing_serializer(signing_app)
+    cookies = {}
+    lock = threading.Lock()
+
+    def sign(user, role):
+        if user is None or role is None:
+            return None
+        with lock:
+            if (user, role) not in cookies:
+                cookies[(user, role)] = serializer.dumps({'user_id': user, 'role': role})
+            return cookies[(user, role)]
+
+    return sign
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def http_sender(target, sign, cookie_name='session', timeout=30):
+    """
+    Get a function that sends a trace to a server over HTTP.
+
+    Returns:
+        callable: trace -> (status, query count or None)
+    """
+    opener = urllib.request.build_opener(_NoRedirect)
+
+    def send(trace):
+        url = target.rstrip('/') + trace['path']
+        if trace.get('args'):
+            url += '?' + urllib.parse.urlencode(trace['args'], doseq=True)
+
+        headers = {}
+        data = None
+        if trace.get('json') is not None:
+            data = json.dumps(trace['json']).encode()
+            headers['Content-Type'] = 'application/json'
+        elif trace.get('form'):
+            data = urllib.parse.urlencode(trace['form'], doseq=True).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        cookie = sign(trace.get('user'), trace.get('role'))
+        if cookie:
+            headers['Cookie'] = f'{cookie_name}={cookie}'
+
+        request = urllib.request.Request(url, data=data, headers=headers, method=trace['method'])
+        try:
+            with opener.open(request, timeout=timeout) as response:
+                response.read()
+                return response.status, response.headers.get('X-DB-Query-Count')
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get('X-DB-Query-Count')
+
+    return send
+
+
+def in_process_sender(app, sign, cookie_name='session'):
+    """
+    Get a function that sends a trace to an app through Flask test clients.
+
+    Returns:
+        callable: trace -> (status, query count or None)
+    """
+    local = threading.local()
+
+    def send(trace):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client(use_cookies=False)
+
+        cookie = sign(trace.get('user'), trace.get('role'))
+        kwargs = {'query_string': trace.get('args') or None,
+                  'headers': {'Cookie': f'{cookie_name}={cookie}'} if cookie else {}}
+        if trace.get('json') is not None:
+            kwargs['json'] = trace['json']
+        elif trace.get('form'):
+            kwargs['data'] = trace['form']
+
+        response = local.client.open(trace['path'], method=trace['method'], **kwargs)
+        response.get_data()
+        status, queries = response.status_code, response.headers.get('X-DB-Query-Count')
+        response.close()
+        return status, queries
+
+    return send
+
+
+def replay(traces, send, speed=1.0, concurrency=16):
+    """
+    Send the traces, keeping their recorded spacing divided by speed.
+
+    Args:
+        traces (list): Traces in start order
+        send (callable): trace -> (status, query count)
+        speed (float): Pace multiplier; 0 sends as fast as possible
+        concurrency (int): Requests in flight at most
+
+    Returns:
+        tuple: Per-request results and elapsed seconds
+    """
+    results = []
+    lock = threading.Lock()
+
+    def run(trace, due):
+        started = time.perf_counter()
+        result = {'key': f"{trace['method']} {trace.get('endpoint') or trace['path']}",
+                  'lag': started - due if due is not None else 0.0, 'queries': None}
+        try:
+            status, queries = send(trace)
+            result['status'] = status
+            result['queries'] = int(queries) if queries is not None else None
+            result['error'] = status >= 400 and status != trace.get('status')
+        except Exception as e:
+            result['status'] = None
+            result['error'] = True
+            result['exception'] = type(e).__name__
+        result['latency'] = time.perf_counter() - started
+        with lock:
+            results.append(result)
+
+    # The pool's queue is bounded so a slow target makes the sender fall behind instead of buffering everything
+    slots = threading.Semaphore(concurrency * 2)
+    started = time.perf_counter()
+    first = traces[0]['ts'] if traces else 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for trace in traces:
+            due = None
+            if speed > 0:
+                due = started + (trace['ts'] - first) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            slots.acquire()
+            future = executor.submit(run, trace, due)
+            future.add_done_callback(lambda _: slots.release())
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    """
+    Aggregate request results per endpoint.
+
+    Returns:
+        dict: Overall totals and per endpoint statistics
+    """
+    def stats(rows):
+        latencies = [row['latency'] for row in rows]
+        queries = [row['queries'] for row in rows if row['queries'] is not None]
+        errors = sum(1 for row in rows if row['error'])
+        return {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': round(errors / len(rows), 4) if rows else 0.0,
+            'throughput': round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'mean_ms': round(statistics.mean(latencies) * 1000, 3) if latencies else 0.0,
+            'queries': round(statistics.mean(queries), 2) if queries else None
+        }
+
+    by_endpoint = {}
+    for row in results:
+        by_endpoint.setdefault(row['key'], []).append(row)
+
+    lags = [row['lag'] for row in results]
+    exceptions = {}
+    for row in results:
+        if 'exception' in row:
+            exceptions[row['exception']] = exceptions.get(row['exception'], 0) + 1
+
+    return {
+        'elapsed': round(elapsed, 3),
+        'total': stats(results),
+        'lag_p95_ms': round(percentile(lags, 0.95) * 1000, 3),
+        'lag_max_ms': round(max(lags, default=0.0) * 1000, 3),
+        'exceptions': exceptions,
+        'endpoints': {key: stats(rows) for key, rows in sorted(by_endpoint.items())}
+    }
+
+
+def print_summary(summary):
+    total = summary['total']
+    print(f"Requests:         {total['requests']} in {summary['elapsed']:.1f} s")
+    print(f"Throughput:       {total['throughput']:.1f} requests/s")
+    print(f"Errors:           {total['errors']} ({total['error_rate']:.2%})")
+    print(f"Latency p50/p95/p99: {total['p50_ms']:.2f} / {total['p95_ms']:.2f} / {total['p99_ms']:.2f} ms")
+    print(f"Schedule lag p95: {summary['lag_p95_ms']:.2f} ms (max {summary['lag_max_ms']:.2f} ms)")
+    for name, count in summary['exceptions'].items():
+        print(f"Exception {name}: {count}")
+    print()
+    print(f"{'Endpoint':50} {'Requests':>8} {'Errors':>7} {'Req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'Queries':>7}")
+    for key, stats in summary['endpoints'].items():
+        queries = f"{stats['queries']:.1f}" if stats['queries'] is not None else '-'
+        print(f"{key[:50]:50} {stats['requests']:8} {stats['errors']:7} {stats['throughput']:8.1f} "
+              f"{stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f} {queries:>7}")
+
+
+def run(args):
+    from app.config import Config
+
+    traces = load_traces(
+        args.trace,
+        endpoints=[pattern for pattern in (args.endpoints or '').split(',') if pattern],
+        roles=[role for role in (args.roles or '').split(',') if role],
+        window=tuple(args.window.split('-', 1)) if args.window else None,
+        limit=args.limit
+    )
+    if not traces:
+        raise SystemExit(f"No requests to replay in {args.trace}")
+
+    sign = session_signer(args.secret_key or Config.SECRET_KEY)
+    cookie_name = getattr(Config, 'SESSION_COOKIE_NAME', 'session')
+    if args.in_process:
+        from app import create_app
+        send = in_process_sender(create_app(), sign, cookie_name)
+    else:
+        send = http_sender(args.target, sign, cookie_name, timeout=args.timeout)
+
+    recorded = traces[-1]['ts'] - traces[0]['ts']
+    pace = f"{args.speed}x the recorded pace" if args.speed > 0 else 'maximum speed'
+    print(f"Replaying {len(traces)} requests recorded over {recorded:.1f} s at {pace} "
+          f"with {args.concurrency} workers")
+
+    results, elapsed = replay(traces, send, speed=args.speed, concurrency=args.concurrency)
+    summary = summarize(results, elapsed)
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(summary, output, indent=2)
+        print(f"Results written to {args.output}")
+
+    return 1 if summary['total']['error_rate'] > args.max_error_rate else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded request traces as load')
+    parser.add_argument('trace', help='JSON lines trace file written with TRACE_LOG')
+    parser.add_argument('--target', default='http://127.0.0.1:5000', help='Base URL of the server')
+    parser.add_argument('--in-process', action='store_true',
+                        help='Send requests to an app created in this process instead of --target')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Pace multiplier: 1 is the recorded pace, 2 twice as fast, 0 as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at most')
+    parser.add_argument('--endpoints', default=None, help='Comma separated endpoint substrings to replay')
+    parser.add_argument('--roles', default=None, help='Comma separated session roles to replay')
+    parser.add_argument('--window', default=None,
+                        help='Replay requests started between these local times only, e.g. 08:55-09:30')
+    parser.add_argument('--limit', type=int, default=None, help='Replay only the first this many requests')
+    parser.add_argument('--timeout', type=float, default=30, help='Request timeout in seconds')
+    parser.add_argument('--secret-key', default=None, help="Target's SECRET_KEY (default: from the config)")
+    parser.add_argument('--output', default=None, help='Write the summary to this JSON file')
+    parser.add_argument('--max-error-rate', type=float, default=0.01,
+                        help='Exit non-zero when the error rate is above this fraction')
+    raise SystemExit(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
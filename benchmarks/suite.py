@@ -0,0 +1,459 @@
+"""
+Benchmark suite for the hot model and view paths.
+
+Times the model reads behind the booking and dispensing pages, the three
+dashboards and the booking and dispense POST endpoints (through the Flask
+test client) at several dataset sizes. Each case reports p50/p95/p99
+latency, queries per call and peak Python memory allocated during a
+call. Results are written as JSON; pass an earlier file with --compare
+to fail the run when a case got slower than the threshold or started
+running more queries.
+
+Datasets are generated with app.utils.datagen into SQLite files under
+--data-dir the first time a size is used and reused afterwards. Each size
+runs in its own process, so caches and pools start cold for every size.
+With --backend mysql the configured database is benchmarked as it is.
+
+The POST cases book and dispense for real; the appointments and
+dispenses they create are deleted again once the case finishes.
+
+Usage:
+    python -m benchmarks.suite --sizes small,medium --output bench.json
+    python -m benchmarks.suite --sizes small --compare bench.json --threshold 0.2
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from benchmarks.booking_contention import percentile
+
+
+# Dataset sizes, passed to DatasetGenerator
+SIZES = {
+    'small': {'students': 1000, 'doctors': 20, 'staff': 10, 'medications': 50, 'appointments': 20000,
+              'prescriptions': 10000, 'activity': 10000, 'days': 180},
+    'medium': {'students': 10000, 'doctors': 100, 'staff': 25, 'medications': 150, 'appointments': 200000,
+               'prescriptions': 100000, 'activity': 100000, 'days': 365},
+    'large': {'students': 50000, 'doctors': 200, 'staff': 50, 'medications': 300, 'appointments': 2000000,
+              'prescriptions': 1000000, 'activity': 500000, 'days': 730}
+}
+
+# Doctors, students and dates the read cases cycle through
+SAMPLE_SIZE = 20
+
+
+def git_commit():
+    """Get the current commit, if the suite runs from a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def create_benchmark_app(size, options):
+    """
+    Create the application for a dataset size, generating the dataset if needed.
+
+    Returns:
+        Flask application instance
+    """
+    from app import create_app
+    from app.config import Config
+
+    overrides = {'SLOW_QUERY_EXPLAIN': False}
+    ready_path = None
+    if options['backend'] == 'sqlite':
+        os.makedirs(options['data_dir'], exist_ok=True)
+        prefix = os.path.join(options['data_dir'], f"{size}-seed{options['seed']}")
+        ready_path = f'{prefix}.ready'
+        if not os.path.exists(ready_path):
+            # Start over from a half-written dataset
+            for path in (f'{prefix}.db', f'{prefix}-cims.db'):
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+        overrides.update(DB_BACKEND='sqlite', SQLITE_PATH=f'{prefix}.db', SQLITE_CIMS_PATH=f'{prefix}-cims.db')
+
+    app = create_app(type('BenchmarkConfig', (Config,), overrides))
+
+    if ready_path and not os.path.exists(ready_path):
+        from app.utils.datagen import DatasetGenerator
+
+        print(f"[{size}] Generating dataset...", flush=True)
+        with app.app_context():
+            stats = DatasetGenerator(seed=options['seed'], **SIZES[size]).run()
+        print(f"[{size}] Generated {sum(v for k, v in stats.items() if k != 'elapsed')} rows "
+              f"in {stats['elapsed']:.1f}s", flush=True)
+        with open(ready_path, 'w') as ready_file:
+            json.dump(stats, ready_file)
+
+    return app
+
+
+def load_fixtures(app, seed, needed):
+    """
+    Pick the IDs, dates and free slots the cases run against.
+
+    Args:
+        app: Flask application instance
+        seed (int): Random seed
+        needed (int): Calls per write case, including warmup
+
+    Returns:
+        dict: Fixture lists
+    """
+    from app.models.doctors import DoctorAvailability
+    from app.models.prescriptions import Prescription
+    from app.utils.database import get_db
+
+    rng = random.Random(seed)
+    with app.app_context():
+        cursor = get_db().cursor(dictionary=True)
+        cursor.execute("SELECT DoctorID FROM Appointments GROUP BY DoctorID ORDER BY COUNT(*) DESC")
+        doctors = [row['DoctorID'] for row in cursor.fetchall()]
+        cursor.execute("SELECT StudentID FROM Appointments GROUP BY StudentID ORDER BY COUNT(*) DESC")
+        students = [row['StudentID'] for row in cursor.fetchall()]
+        cursor.execute("SELECT StaffID FROM Staff ORDER BY StaffID LIMIT 1")
+        staff = cursor.fetchone()
+        cursor.close()
+
+        # The busiest doctor and student are always part of the sample
+        doctors = doctors[:1] + rng.sample(doctors[1:], min(SAMPLE_SIZE - 1, max(0, len(doctors) - 1)))
+        students = students[:1] + rng.sample(students[1:], min(SAMPLE_SIZE - 1, max(0, len(students) - 1)))
+
+        today = datetime.date.today()
+        dates = [
+            (today + datetime.timedelta(days=offset)).isoformat()
+            for offset in range(1, SAMPLE_SIZE + 1)
+            if (today + datetime.timedelta(days=offset)).weekday() < 6
+        ]
+
+        # Free slots for the booking case, least popular doctors first
+        free_slots = []
+        for doctor_id in reversed(doctors):
+            for date in dates:
+                for slot in DoctorAvailability.get_available_slots(doctor_id, date):
+                    if slot['status'] == 'Available':
+                        free_slots.append((doctor_id, date, slot['time']))
+            if len(free_slots) >= needed:
+                break
+
+        pending = [row for row in Prescription.get_unfulfilled(limit=needed) if not row['Claimed']]
+
+    return {
+        'doctors': doctors,
+        'students': students,
+        'staff_id': staff['StaffID'] if staff else None,
+        'dates': dates,
+        'free_slots': free_slots[:needed],
+        'pending': pending
+    }
+
+
+def max_ids(app):
+    """Get the newest appointment and dispense IDs, to clean up after the write cases."""
+    from app.utils.database import get_db
+
+    with app.app_context():
+        cursor = get_db().cursor(dictionary=True)
+        cursor.execute("SELECT COALESCE(MAX(AppointmentID), 0) AS LastID FROM Appointments")
+        appointment_id = cursor.fetchone()['LastID']
+        cursor.execute("SELECT COALESCE(MAX(MedicineGivenID), 0) AS LastID FROM MedicinesGiven")
+        given_id = cursor.fetchone()['LastID']
+        cursor.close()
+    return appointment_id, given_id
+
+
+def clean_up(app, since):
+    """Delete the appointments and dispenses created after the IDs returned by max_ids."""
+    from app.models.appointments import Appointment
+    from app.models.prescriptions import MedicineGiven
+    from app.utils.database import get_db
+
+    with app.app_context():
+        cursor = get_db().cursor(dictionary=True)
+        cursor.execute("SELECT AppointmentID FROM Appointments WHERE AppointmentID > %s", (since[0],))
+        appointment_ids = [row['AppointmentID'] for row in cursor.fetchall()]
+        cursor.execute("SELECT MedicineGivenID FROM MedicinesGiven WHERE MedicineGivenID > %s", (since[1],))
+        given_ids = [row['MedicineGivenID'] for row in cursor.fetchall()]
+        cursor.close()
+
+        for medicine_given_id in given_ids:
+            MedicineGiven.delete(medicine_given_id)
+        for appointment_id in appointment_ids:
+            Appointment.delete(appointment_id)
+
+
+def build_cases(fixtures):
+    """
+    Get the benchmark cases.
+
+    Model cases are called as call(number) inside an app context; view
+    cases as call(client, number) and return the response.
+
+    Returns:
+        list: (name, kind, call) tuples
+    """
+    from app.models.appointments import Appointment
+    from app.models.doctors import DoctorAvailability
+    from app.models.prescriptions import Prescription
+    from app.models.timeline import StudentTimeline
+
+    doctors, students, dates = fixtures['doctors'], fixtures['students'], fixtures['dates']
+
+    def pick(values, number):
+        return values[number % len(values)]
+
+    def login(client, user_id, role):
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+            session['role'] = role
+
+    def student_dashboard(client, number):
+        login(client, pick(students, number), 'student')
+        return client.get('/student/dashboard')
+
+    def doctor_dashboard(client, number):
+        login(client, pick(doctors, number), 'doctor')
+        return client.get('/doctor/dashboard')
+
+    def staff_dashboard(client, number):
+        login(client, fixtures['staff_id'], 'staff')
+        return client.get('/staff/dashboard')
+
+    def book_appointment(client, number):
+        doctor_id, date, slot_time = fixtures['free_slots'][number]
+        login(client, pick(students, number), 'student')
+        return client.post('/student/book_appointment', data={
+            'doctor_id': doctor_id, 'appointment_date': date, 'appointment_time': slot_time
+        })
+
+    def dispense(client, number):
+        prescription = fixtures['pending'][number]
+        login(client, fixtures['staff_id'], 'staff')
+        return client.post('/staff/api/medicines/dispense', data={
+            'prescription_id': prescription['PrescriptionID'],
+            'medication_id': prescription['MedicationID'],
+            'quantity_given': prescription['Quantity']
+        })
+
+    return [
+        ('DoctorAvailability.get_available_slots', 'model',
+         lambda number: DoctorAvailability.get_available_slots(pick(doctors, number),
+                                                               pick(dates, number // len(doctors)))),
+        ('Appointment.get_by_student', 'model', lambda number: Appointment.get_by_student(pick(students, number))),
+        ('Appointment.get_by_doctor', 'model', lambda number: Appointment.get_by_doctor(pick(doctors, number))),
+        ('Prescription.get_unfulfilled', 'model', lambda number: Prescription.get_unfulfilled()),
+        ('StudentTimeline.get_page', 'model', lambda number: StudentTimeline.get_page(pick(students, number))),
+        ('GET /student/dashboard', 'view', student_dashboard),
+        ('GET /doctor/dashboard', 'view', doctor_dashboard),
+        ('GET /staff/dashboard', 'view', staff_dashboard),
+        ('POST /student/book_appointment', 'write', book_appointment),
+        ('POST /staff/api/medicines/dispense', 'write', dispense)
+    ]
+
+
+def measure(app, kind, call, iterations, warmup, memory_iterations):
+    """
+    Time a case.
+
+    Returns:
+        dict: Latency percentiles (ms), mean queries per call and peak memory (KiB)
+    """
+    from app.utils.instrumentation import request_totals
+
+    client = app.test_client() if kind != 'model' else None
+
+    def once(number):
+        if client is not None:
+            started = time.perf_counter()
+            response = call(client, number)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            return elapsed, int(response.headers.get('X-DB-Query-Count', 0))
+        with app.app_context():
+            started = time.perf_counter()
+            call(number)
+            elapsed = time.perf_counter() - started
+            return elapsed, request_totals()['count']
+
+    for number in range(warmup):
+        once(number)
+
+    latencies = []
+    queries = []
+    for number in range(warmup, warmup + iterations):
+        elapsed, count = once(number)
+        latencies.append(elapsed)
+        queries.append(count)
+
+    # Tracing slows every allocation down, so memory is measured in a separate pass
+    peak = 0
+    tracemalloc.start()
+    try:
+        for number in range(warmup + iterations, warmup + iterations + memory_iterations):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            once(number)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'queries': round(statistics.mean(queries), 2),
+        'peak_kib': round(peak / 1024, 1)
+    }
+
+
+def run_size(size, options):
+    """
+    Run every case against one dataset size.
+
+    Returns:
+        dict: Case name -> result
+    """
+    app = create_benchmark_app(size, options)
+    iterations, warmup, memory_iterations = options['iterations'], options['warmup'], options['memory_iterations']
+    needed = iterations + warmup + memory_iterations
+    fixtures = load_fixtures(app, options['seed'], needed)
+
+    results = {}
+    for name, kind, call in build_cases(fixtures):
+        if options['cases'] and not any(pattern in name for pattern in options['cases']):
+            continue
+        if kind == 'write':
+            available = len(fixtures['free_slots'] if 'book' in name else fixtures['pending'])
+            if available < needed:
+                print(f"[{size}] {name}: skipped, only {available} of {needed} targets in the dataset", flush=True)
+                continue
+
+        since = max_ids(app) if kind == 'write' else None
+        try:
+            results[name] = measure(app, kind, call, iterations, warmup, memory_iterations)
+        finally:
+            if since:
+                clean_up(app, since)
+
+        result = results[name]
+        print(f"[{size}] {name:42} p50 {result['p50_ms']:9.3f} ms  p95 {result['p95_ms']:9.3f} ms  "
+              f"p99 {result['p99_ms']:9.3f} ms  {result['queries']:6.1f} queries  "
+              f"{result['peak_kib']:9.1f} KiB", flush=True)
+
+    return results
+
+
+def compare(current, baseline, threshold, min_delta_ms):
+    """
+    Find cases that regressed against a baseline run.
+
+    A case regresses when its p95 grew by more than the threshold fraction
+    and by at least min_delta_ms, or when it runs more queries per call.
+
+    Returns:
+        list: Descriptions of the regressions
+    """
+    regressions = []
+    for size, cases in current['results'].items():
+        for name, result in cases.items():
+            before = baseline.get('results', {}).get(size, {}).get(name)
+            if not before:
+                continue
+            change = result['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0.0
+            print(f"[{size}] {name:42} p95 {before['p95_ms']:9.3f} -> {result['p95_ms']:9.3f} ms "
+                  f"({change:+.1%}), queries {before['queries']} -> {result['queries']}")
+            if change > threshold and result['p95_ms'] - before['p95_ms'] >= min_delta_ms:
+                regressions.append(f"[{size}] {name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms ({change:+.1%})")
+            if result['queries'] > before['queries']:
+                regressions.append(f"[{size}] {name}: queries {before['queries']} -> {result['queries']}")
+    return regressions
+
+
+def run(args):
+    options = {
+        'backend': args.backend,
+        'data_dir': args.data_dir,
+        'seed': args.seed,
+        'iterations': args.iterations,
+        'warmup': args.warmup,
+        'memory_iterations': args.memory_iterations,
+        'cases': [pattern for pattern in (args.cases or '').split(',') if pattern]
+    }
+    if args.backend == 'mysql':
+        sizes = ['mysql']
+    else:
+        sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+        unknown = [size for size in sizes if size not in SIZES]
+        if unknown:
+            raise SystemExit(f"Unknown sizes: {', '.join(unknown)} (choose from {', '.join(SIZES)})")
+
+    report = {
+        'commit': git_commit(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'backend': args.backend,
+        'seed': args.seed,
+        'iterations': args.iterations,
+        'results': {}
+    }
+
+    # A fresh process per size: the caches, pools and writers are module-level singletons
+    for size in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            report['results'][size] = executor.submit(run_size, size, options).result()
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        print(f"Compared with {args.compare} (commit {baseline.get('commit')}):")
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the hot model and view paths')
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite',
+                        help='sqlite generates a dataset per size; mysql uses the configured database as it is')
+    parser.add_argument('--sizes', default='small,medium', help=f"Comma separated dataset sizes ({', '.join(SIZES)})")
+    parser.add_argument('--data-dir', default=os.path.join('instance', 'benchmarks'), help='Where datasets are kept')
+    parser.add_argument('--seed', type=int, default=42, help='Dataset and sampling seed')
+    parser.add_argument('--iterations', type=int, default=200, help='Timed calls per case')
+    parser.add_argument('--warmup', type=int, default=20, help='Untimed calls per case before timing')
+    parser.add_argument('--memory-iterations', type=int, default=5, help='Calls per case traced for peak memory')
+    parser.add_argument('--cases', default=None, help='Comma separated substrings of the case names to run')
+    parser.add_argument('--output', default=None, help='Write the results to this JSON file')
+    parser.add_argument('--compare', default=None, help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p95 slowdown as a fraction')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='Ignore p95 slowdowns smaller than this many milliseconds')
+    raise SystemExit(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+-- At most one active appointment per doctor, date and time.
+--
+-- ActiveSlot is 1 for every appointment that still occupies its slot and
+-- NULL once it is cancelled. NULLs never collide in a unique index, so a
+-- cancelled slot can be booked again while two live bookings of the same
+-- slot are rejected with a duplicate-key error (1062).
+--
+-- Existing double bookings must be resolved before the index can be built:
+--
+--   SELECT DoctorID, AppointmentDate, AppointmentTime, COUNT(*)
+--   FROM Appointments
+--   WHERE Status != 'Cancelled'
+--   GROUP BY DoctorID, AppointmentDate, AppointmentTime
+--   HAVING COUNT(*) > 1;
+
+ALTER TABLE Appointments
+    ADD COLUMN ActiveSlot TINYINT AS (IF(Status = 'Cancelled', NULL, 1)) STORED,
+    ADD UNIQUE INDEX uq_appointments_active_slot
+        (DoctorID, AppointmentDate, AppointmentTime, ActiveSlot);
@@ -0,0 +1,19 @@
+-- Indexes matching the keyset pagination sort orders.
+--
+-- Each list page seeks to the last row of the previous page and reads the
+-- next rows in index order, so the sort columns (ending with the primary
+-- key) must be indexed for page N to cost the same as page 1. The filtered
+-- lists lead with their filter column.
+
+ALTER TABLE Appointments
+    ADD INDEX idx_appointments_date_time (AppointmentDate, AppointmentTime, AppointmentID),
+    ADD INDEX idx_appointments_doctor_date_time (DoctorID, AppointmentDate, AppointmentTime, AppointmentID),
+    ADD INDEX idx_appointments_student_date_time (StudentID, AppointmentDate, AppointmentTime, AppointmentID);
+
+ALTER TABLE Prescription
+    ADD INDEX idx_prescription_date (PrescriptionDate, PrescriptionID),
+    ADD INDEX idx_prescription_doctor_date (DoctorID, PrescriptionDate, PrescriptionID),
+    ADD INDEX idx_prescription_student_date (StudentID, PrescriptionDate, PrescriptionID);
+
+ALTER TABLE MedicinesGiven
+    ADD INDEX idx_medicines_given_date (DateGiven, MedicineGivenID);
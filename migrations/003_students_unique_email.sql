@@ -0,0 +1,12 @@
+-- One student per email address.
+--
+-- The roster importer upserts students keyed on their email, which needs
+-- a unique index to turn re-imports into updates instead of duplicates.
+-- Existing duplicates must be merged before the index can be built:
+--
+--   SELECT Email, COUNT(*) FROM Students
+--   WHERE Email IS NOT NULL
+--   GROUP BY Email HAVING COUNT(*) > 1;
+
+ALTER TABLE Students
+    ADD UNIQUE INDEX uq_students_email (Email);
@@ -0,0 +1,13 @@
+-- Activity feed support.
+--
+-- Events now record the role of the user who caused them so doctors and
+-- staff can follow their colleagues' activity. Both feeds read the newest
+-- rows first and page on ActivityID, so each filter column is indexed
+-- together with ActivityID and a page is a short backward index range
+-- scan however large ActivityLog grows. Rows logged before this migration
+-- have no role and only appear in their user's own feed.
+
+ALTER TABLE ActivityLog
+    ADD COLUMN Role VARCHAR(20) NULL AFTER UserID,
+    ADD INDEX idx_activity_log_user (UserID, ActivityID),
+    ADD INDEX idx_activity_log_role (Role, ActivityID);
@@ -0,0 +1,16 @@
+-- Materialized dashboard counters.
+--
+-- One row per counter, maintained incrementally by the model writes in
+-- the same transaction as the source rows. Keys look like
+-- 'doctor:<id>:pending_appointments', 'student:<id>:prescriptions' or
+-- 'staff:dispensed:<YYYY-MM-DD>'. Populate the table after creating it
+-- (and check it periodically, e.g. from cron) with:
+--
+--   flask --app run reconcile-counters --fix
+
+CREATE TABLE DashboardCounters (
+    CounterKey VARCHAR(100) NOT NULL,
+    Value BIGINT NOT NULL DEFAULT 0,
+    UpdatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (CounterKey)
+);
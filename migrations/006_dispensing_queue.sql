@@ -0,0 +1,18 @@
+-- Dispensing queue.
+--
+-- DispenseStatus replaces the MedicinesGiven anti-join for finding
+-- unfulfilled prescriptions: the pending list is a range of the
+-- (DispenseStatus, PrescriptionDate, PrescriptionID) index, oldest first.
+-- A staff member claims a pending prescription by setting ClaimedBy and
+-- ClaimExpiresAt; an expired claim can be taken by anyone. Claims of the
+-- next N prescriptions use FOR UPDATE SKIP LOCKED (MySQL 8.0+).
+
+ALTER TABLE Prescription
+    ADD COLUMN DispenseStatus ENUM('Pending', 'Dispensed') NOT NULL DEFAULT 'Pending',
+    ADD COLUMN ClaimedBy VARCHAR(50) NULL,
+    ADD COLUMN ClaimExpiresAt DATETIME NULL,
+    ADD INDEX idx_prescription_queue (DispenseStatus, PrescriptionDate, PrescriptionID);
+
+UPDATE Prescription p
+SET p.DispenseStatus = 'Dispensed'
+WHERE EXISTS (SELECT 1 FROM MedicinesGiven mg WHERE mg.PrescriptionID = p.PrescriptionID);
@@ -0,0 +1,33 @@
+-- Materialized per-student medical timeline.
+--
+-- One row per completed appointment, prescription and dispense, with the
+-- doctor and medication details copied in, so a patient's history is a
+-- single range scan of (StudentID, EventDate, TimelineID) instead of a
+-- join across Appointments, G12_Doctors, Prescription, Medications and
+-- MedicinesGiven. The model writes keep it current in the same
+-- transaction as the source rows. Fill it after creating it (and after
+-- renaming doctors or medications) with:
+--
+--   flask --app run rebuild-timeline
+
+CREATE TABLE StudentTimeline (
+    TimelineID BIGINT NOT NULL AUTO_INCREMENT,
+    StudentID INT NOT NULL,
+    EventDate DATE NOT NULL,
+    EventTime TIME NULL,
+    EventType ENUM('appointment', 'prescription', 'dispense') NOT NULL,
+    SourceID INT NOT NULL,
+    AppointmentID INT NULL,
+    PrescriptionID INT NULL,
+    DoctorID INT NULL,
+    DoctorName VARCHAR(100) NULL,
+    Specialization VARCHAR(100) NULL,
+    MedicationName VARCHAR(100) NULL,
+    DosageForm VARCHAR(50) NULL,
+    Quantity INT NULL,
+    Instructions TEXT NULL,
+    PRIMARY KEY (TimelineID),
+    UNIQUE KEY uq_student_timeline_source (EventType, SourceID),
+    KEY idx_student_timeline_student_date (StudentID, EventDate, TimelineID),
+    KEY idx_student_timeline_prescription (EventType, PrescriptionID)
+);
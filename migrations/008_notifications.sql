@@ -0,0 +1,19 @@
+-- Stored notifications.
+--
+-- Notifications used to exist only in the event history of the worker
+-- process that published them, so a restart lost them and a dashboard
+-- polling another worker never saw them. They are now written here and
+-- /api/notifications reads them back. UserID is NULL for a notification
+-- addressed to every user of a role; a user's notifications are the
+-- newest rows of the (Role, UserID, NotificationID) index for their own
+-- ID and for NULL.
+
+CREATE TABLE Notifications (
+    NotificationID BIGINT NOT NULL AUTO_INCREMENT,
+    Role VARCHAR(20) NOT NULL,
+    UserID VARCHAR(50) NULL,
+    Message VARCHAR(255) NOT NULL,
+    CreatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (NotificationID),
+    KEY idx_notifications_recipient (Role, UserID, NotificationID)
+);